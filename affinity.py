@@ -0,0 +1,184 @@
+import atexit
+import threading
+import time
+from collections import defaultdict
+from datetime import datetime, timedelta
+from sqlalchemy import delete, insert, select
+from models import db, Genre, GenreAffinity, JobState, WatchEvent, anime_genres
+
+JOB_NAME = 'genre_affinity'
+PROCESS_CHUNK_SIZE = 5000
+# İzleme olaylarının ve anonim ziyaretçi eğilimlerinin saklanacağı süre (gün); 14 günlük yarı ömürle bu sürede
+# katkı ~%1'e iner. Trend listesi yeniden hesaplanırken LEADERBOARD_RETENTION_DAYS kadar görüntüleme okunur, ondan kısa olmamalı.
+RETENTION_DAYS = 90
+
+def decayed(score, since, now, half_life):
+    return score * 0.5 ** ((now - since).total_seconds() / half_life)
+
+class WatchHistory:
+    # Bölüm görüntülemeleri bellekte biriktirilip toplu yazılır; tür eğilimleri arka planda
+    # bu olaylardan hesaplanır. Oturum çerezinde sadece anonim ziyaretçi id'si tutulur.
+    def __init__(self, app=None):
+        self.app = None
+        self.excluded_genres = ()
+        self._buffer = []
+        self._buffer_started = None
+        self._lock = threading.Lock()
+        self._thread = None
+        self._thread_lock = threading.Lock()
+        self._wake = threading.Event()
+        self._stop = threading.Event()
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        app.config.setdefault('WATCH_FLUSH_SIZE', 200)
+        app.config.setdefault('WATCH_FLUSH_INTERVAL', 10)
+        app.config.setdefault('AFFINITY_HALF_LIFE_DAYS', 14)
+        app.config.setdefault('WATCH_HISTORY_WORKER_ENABLED', True)
+        self.app = app
+        app.extensions['watch_history'] = self
+        atexit.register(self._flush_at_exit)
+
+    @property
+    def half_life(self):
+        return self.app.config['AFFINITY_HALF_LIFE_DAYS'] * 86400
+
+    def record(self, owner, anime_id, episode_id=None):
+        config = self.app.config
+        with self._lock:
+            if not self._buffer:
+                self._buffer_started = time.monotonic()
+            self._buffer.append({'owner': owner, 'anime_id': anime_id, 'episode_id': episode_id, 'created_at': datetime.utcnow()})
+            due = len(self._buffer) >= config['WATCH_FLUSH_SIZE'] or time.monotonic() - self._buffer_started >= config['WATCH_FLUSH_INTERVAL']
+        if config['WATCH_HISTORY_WORKER_ENABLED']:
+            self._ensure_worker()
+            if due:
+                self._wake.set()
+        elif due:
+            # Arka plan thread'i olmayan ortamlarda (ör. serverless) tampon isteğin içinde tek INSERT ile
+            # boşaltılır; eğilimler 'flask update-affinities' ile (cron) hesaplanır
+            self.flush()
+
+    def flush(self):
+        with self._lock:
+            rows, self._buffer = self._buffer, []
+        if rows:
+            db.session.execute(insert(WatchEvent), rows)
+            db.session.commit()
+        return len(rows)
+
+    def update_affinities(self, chunk_size=PROCESS_CHUNK_SIZE):
+        # İşlenmemiş olaylar id sırasıyla okunur; her (sahip, tür) için yeni katkı eklenmeden
+        # önce mevcut skor şimdiye sönümlenir. İşlenen olay sayısını döner.
+        state = db.session.get(JobState, JOB_NAME) or JobState(name=JOB_NAME, value='0')
+        last_id = int(state.value or 0)
+        processed = 0
+        while True:
+            ids = db.session.execute(select(WatchEvent.id).where(WatchEvent.id > last_id).order_by(WatchEvent.id).limit(chunk_size)).scalars().all()
+            if not ids:
+                break
+            now = datetime.utcnow()
+            rows = db.session.execute(
+                select(WatchEvent.owner, WatchEvent.created_at, anime_genres.c.genre_id)
+                .join(anime_genres, anime_genres.c.anime_id == WatchEvent.anime_id)
+                .join(Genre, Genre.id == anime_genres.c.genre_id)
+                .where(WatchEvent.id > last_id, WatchEvent.id <= ids[-1], Genre.name.notin_(self.excluded_genres))).all()
+            increments = defaultdict(float)
+            for owner, created_at, genre_id in rows:
+                increments[(owner, genre_id)] += decayed(1.0, created_at, now, self.half_life)
+            owners = {owner for owner, _ in increments}
+            existing = {(a.owner, a.genre_id): a for a in GenreAffinity.query.filter(GenreAffinity.owner.in_(owners))} if owners else {}
+            for key, increment in increments.items():
+                affinity = existing.get(key)
+                if affinity is None:
+                    db.session.add(GenreAffinity(owner=key[0], genre_id=key[1], score=increment, updated_at=now))
+                else:
+                    affinity.score = decayed(affinity.score, affinity.updated_at, now, self.half_life) + increment
+                    affinity.updated_at = now
+            last_id = ids[-1]
+            processed += len(ids)
+            state.value = str(last_id)
+            state.updated_at = now
+            db.session.merge(state)
+            db.session.commit()
+        return processed
+
+    def compact(self, retention_days=RETENTION_DAYS, chunk_size=PROCESS_CHUNK_SIZE):
+        # Saklama süresini aşan ve tür eğilimlerine işlenmiş olaylar id sırasıyla parça parça silinir; olaylar
+        # yazılma sırasıyla eklendiğinden ilk yeni olayda durulur (created_at indeksi gerekmez). Bu sürede
+        # görülmeyen anonim ziyaretçilerin ('v:' ile başlayan sahipler, birincil anahtar aralığından okunur)
+        # eğilimleri de silinir; kullanıcılarınki tutulur. (silinen olay, silinen eğilim) sayısını döner.
+        cutoff = datetime.utcnow() - timedelta(days=retention_days)
+        state = db.session.get(JobState, JOB_NAME)
+        processed_id = int(state.value or 0) if state else 0
+        events = 0
+        while True:
+            rows = db.session.execute(select(WatchEvent.id, WatchEvent.created_at).where(
+                WatchEvent.id <= processed_id).order_by(WatchEvent.id).limit(chunk_size)).all()
+            expired = [row.id for row in rows if row.created_at < cutoff]
+            if expired:
+                events += db.session.execute(delete(WatchEvent).where(WatchEvent.id.in_(expired))).rowcount
+                db.session.commit()
+            if len(rows) < chunk_size or len(expired) < len(rows):
+                break
+        stale = (GenreAffinity.owner >= 'v:', GenreAffinity.owner < 'v;', GenreAffinity.updated_at < cutoff)
+        affinities = 0
+        while True:
+            owners = db.session.execute(select(GenreAffinity.owner).where(*stale).distinct().limit(chunk_size)).scalars().all()
+            if owners:
+                affinities += db.session.execute(delete(GenreAffinity).where(
+                    GenreAffinity.owner.in_(owners), GenreAffinity.updated_at < cutoff)).rowcount
+                db.session.commit()
+            if len(owners) < chunk_size:
+                break
+        return events, affinities
+
+    def top_genres(self, owner, limit=3):
+        # Bir sahibin en fazla tür sayısı kadar satırı olur; sönümleme Python'da yapılır
+        now = datetime.utcnow()
+        rows = db.session.query(GenreAffinity.genre_id, GenreAffinity.score, GenreAffinity.updated_at).filter_by(owner=owner).all()
+        ranked = sorted(rows, key=lambda r: (-decayed(r.score, r.updated_at, now, self.half_life), r.genre_id))
+        return [row.genre_id for row in ranked[:limit]]
+
+    def last_watched(self, owner):
+        return db.session.query(WatchEvent.anime_id).filter_by(owner=owner).order_by(WatchEvent.id.desc()).limit(1).scalar()
+
+    def run_once(self):
+        return self.flush(), self.update_affinities()
+
+    def run_forever(self):
+        while not self._stop.is_set():
+            try:
+                self.run_once()
+            except Exception:
+                self.app.logger.exception('İzleme geçmişi worker hatası')
+                db.session.rollback()
+            finally:
+                db.session.remove()
+            self._wake.wait(self.app.config['WATCH_FLUSH_INTERVAL'])
+            self._wake.clear()
+
+    def _run(self):
+        with self.app.app_context():
+            self.run_forever()
+
+    def _ensure_worker(self):
+        if self._thread is not None and self._thread.is_alive():
+            return
+        with self._thread_lock:
+            if self._thread is None or not self._thread.is_alive():
+                self._stop.clear()
+                self._thread = threading.Thread(target=self._run, name='watch-history', daemon=True)
+                self._thread.start()
+
+    def stop(self, timeout=None):
+        self._stop.set()
+        self._wake.set()
+        if self._thread is not None:
+            self._thread.join(timeout)
+
+    def _flush_at_exit(self):
+        if self._buffer:
+            with self.app.app_context():
+                self.flush()
@@ -1,63 +1,369 @@
-from flask import Flask, render_template, redirect, url_for, flash, request, session, jsonify
+from flask import Flask, appcontext_pushed, Response, abort, render_template, redirect, url_for, flash, request, session, jsonify, stream_with_context, send_file, send_from_directory
 from flask_sqlalchemy import SQLAlchemy
 from flask_login import LoginManager, login_user, logout_user, login_required, current_user, UserMixin
 from werkzeug.security import generate_password_hash, check_password_hash
-from forms import LoginForm, AnimeForm, EpisodeForm, UserForm, EditUserForm, GenreForm, AnimeSearchForm, RegistrationForm
-from models import db, User, Anime, Episode, Log, Genre, Rating, Notification
+from markupsafe import Markup
+from sqlalchemy import func, select, update
+from sqlalchemy.orm import aliased, joinedload, load_only, raiseload, selectinload
+from forms import LoginForm, AnimeForm, EpisodeForm, EpisodeImportForm, UserForm, EditUserForm, GenreForm, AnimeSearchForm, RegistrationForm
+from models import db, SPECIAL_GENRES, User, Anime, AnimeScore, AnimeSimilarity, Episode, EpisodeSource, JobState, Log, Genre, Rating, Notification, anime_genres, watchlist as watchlist_table
+from shelves import ANIME_CARD_COLUMNS, animes_in_order, personalized_animes, random_animes as sample_random_animes
+from cache import PageCache
+from pagination import KeysetPage, keyset_paginate
+from querycount import QueryBudget, query_budget
+from auth import Principal, load_principal
+from database import read_replica
+from mal import MalEnricher
+from pubsub import NotificationHub
+from affinity import WatchHistory
+from sourcehealth import SourceHealthChecker, source_order
+from covers import CoverPipeline
+from assets import AssetPipeline, brotli_module
+from httpcache import HttpCache
+from metrics import Metrics
+from leaderboards import NO_TREND, Leaderboard, leaderboard_animes
+from export import CatalogExport
+import affinity
+import audit
+import database
+import migrations
+import pubsub
+import search
+import episodes
+import export
+import genres
+import httpcache
+import notifications
+import ratings
+import recommendations
+import click
+import os
 import re
-import random
+import secrets
+from datetime import timezone
 from functools import wraps
-import requests
-
-app = Flask(__name__)
-application = app
-app.config['SECRET_KEY'] = 'asd*fasd-dsdsaf+fa+fd,aadsf,af,.d,f.daf*f9d88asd7asdf68sdf567as47'
-app.config['SQLALCHEMY_DATABASE_URI'] = 'sqlite:///anime_site.db'
-db.init_app(app)
 
+page_cache = PageCache()
+mal_enricher = MalEnricher()
+notification_hub = NotificationHub()
+watch_history = WatchHistory()
+source_health = SourceHealthChecker()
+cover_pipeline = CoverPipeline()
+asset_pipeline = AssetPipeline()
+http_cache = HttpCache()
+metrics = Metrics()
+leaderboard = Leaderboard()
+catalog_export = CatalogExport()
 login_manager = LoginManager()
-login_manager.init_app(app)
 login_manager.login_view = 'login'
+watch_history.excluded_genres = SPECIAL_GENRES
+
+def create_app(config=None):
+    # Import sırasında veritabanına gidilmez. Şema, süreçteki ilk app context'te bir kez kontrol
+    # edilir (güncelse tek sorgu); DB_AUTO_UPGRADE=0 ise bu da atlanır ve flask db-upgrade ile yapılır.
+    app = Flask(__name__)
+    app.config['SECRET_KEY'] = 'asd*fasd-dsdsaf+fa+fd,aadsf,af,.d,f.daf*f9d88asd7asdf68sdf567as47'
+    app.config.update(config or {})
+    database.configure(app)
+    db.init_app(app)
+    page_cache.init_app(app)
+    QueryBudget(app)
+    mal_enricher.init_app(app)
+    notification_hub.init_app(app)
+    watch_history.init_app(app)
+    source_health.init_app(app)
+    cover_pipeline.init_app(app)
+    asset_pipeline.init_app(app)
+    http_cache.init_app(app)
+    metrics.init_app(app)
+    leaderboard.init_app(app)
+    catalog_export.init_app(app)
+    login_manager.init_app(app)
+    if app.config['DB_AUTO_UPGRADE']:
+        appcontext_pushed.connect(migrations.ensure_current, app)
+    return app
+
+# Route'lar bu modülde tanımlıdır; Vercel ve WSGI sunucuları modüldeki app/application nesnesini kullanır
+app = create_app()
+application = app
+
+ANIMES_PER_PAGE = 18
+LOGS_PER_PAGE = 10
+# Log kayıtlarında farkı tutulan alanlar
+ANIME_AUDIT_FIELDS = ('name', 'description', 'cover_image', 'release_year', 'status', 'anime_type', 'mal_score', 'mal_url')
+USER_AUDIT_FIELDS = ('username', 'can_delete', 'can_edit', 'can_add_user')
+
+# Sıralama seçeneği -> (keyset anahtarı, ilk sütun NULL olabilir mi); id her zaman eşitlik bozucudur
+ANIME_SORT_KEYS = {
+    'name_asc': ([(Anime.name, False), (Anime.id, False)], False),
+    'name_desc': ([(Anime.name, True), (Anime.id, True)], False),
+    'rating_desc': ([(Anime.average_rating, True), (Anime.id, True)], True),
+    'year_desc': ([(Anime.release_year, True), (Anime.id, True)], True),
+    'top_rated': ([(func.coalesce(AnimeScore.bayesian, 0.0), True), (Anime.id, True)], False),
+    'trending': ([(func.coalesce(AnimeScore.trending, NO_TREND), True), (Anime.id, True)], False),
+}
+# Bu sıralamalar anime_score tablosundan okunur (bkz. leaderboards.py); henüz skor satırı açılmamış animeler
+# listeden düşmesin diye dış birleştirme yapılır ve sütun varsayılanlarıyla en sona dizilir
+LEADERBOARD_SORTS = {'top_rated', 'trending'}
 
-SPECIAL_GENRES = ["Editörün Seçimi", "Hero Section"]
+@app.cli.command('rebuild-search-index')
+def rebuild_search_index_command():
+    search.ensure_search_index()
+    search.rebuild_search_index()
+    print('Arama indeksi yeniden oluşturuldu.')
 
-with app.app_context():
-    for genre_name in SPECIAL_GENRES:
-        if not Genre.query.filter_by(name=genre_name).first():
-            db.session.add(Genre(name=genre_name))
+@app.cli.command('db-upgrade')
+def db_upgrade_command():
+    ran = migrations.prepare(db.engine)
+    print(f"Uygulanan revizyonlar: {', '.join(ran)}" if ran else 'Veritabanı güncel.')
+
+@app.cli.command('db-status')
+def db_status_command():
+    print(f'Veritabanı: {db.engine.url.render_as_string(hide_password=True)} (havuz: {db.engine.pool.status()})')
+    if database.REPLICA_BIND in db.engines:
+        print(f'Replika: {db.engines[database.REPLICA_BIND].url.render_as_string(hide_password=True)}')
+    for name, value in database.pragmas(db.engine).items():
+        print(f'  PRAGMA {name} = {value}')
+    for name, description, done in migrations.status():
+        print(f"  [{'x' if done else ' '}] {name}: {description}")
+    for column, index in migrations.index_coverage(db.engine).items():
+        print(f"  {column}: {index or 'İNDEKS YOK'}")
+
+@app.cli.command('import-episodes')
+@click.argument('anime_id', type=int)
+@click.argument('path', type=click.Path(exists=True, dir_okay=False))
+def import_episodes_command(anime_id, path):
+    anime = db.session.get(Anime, anime_id)
+    if anime is None:
+        raise click.ClickException(f'{anime_id} numaralı anime bulunamadı.')
+    with open(path, 'rb') as f:
+        try:
+            result = episodes.import_episodes(anime, episodes.parse_import(f.read(), path))
+        except ValueError as e:
+            raise click.ClickException(str(e))
     db.session.commit()
+    invalidate_anime_cache(anime.id)
+    print(f'{result.added} bölüm eklendi, {result.updated} bölüm güncellendi ({result.sources} kaynak).')
+
+@app.cli.command('check-sources')
+@click.option('--worker', is_flag=True, help='Sürekli çalışır; kontrol zamanı gelen kaynakları yoklar')
+def check_sources_command(worker):
+    if worker:
+        source_health.run_forever()
+        return
+    checked = source_health.drain()
+    stats = source_health.stats()
+    print(f"{checked} kaynak kontrol edildi; toplam {stats['sources']} kaynaktan {stats['dead']} tanesi çalışmıyor.")
+
+@app.cli.command('process-covers')
+@click.option('--all', 'all_animes', is_flag=True, help='Kapağı işlenmemiş tüm animeleri (ve başarısız olanları) kuyruğa ekler')
+@click.option('--worker', is_flag=True, help='Sürekli çalışır; kuyruğa eklenen kapakları işler')
+def process_covers_command(all_animes, worker):
+    if all_animes:
+        print(f'{cover_pipeline.enqueue_missing(retry_failed=True)} kapak URL\'si kuyruğa eklendi.')
+    if worker:
+        cover_pipeline.run_forever()
+        return
+    processed = cover_pipeline.drain()
+    cover_pipeline.stop()
+    stats = cover_pipeline.stats()
+    print(f"{processed} kapak işlendi; hazır: {stats.get('ready', 0)}, bekleyen: {stats.get('pending', 0)}, başarısız: {stats.get('failed', 0)}.")
+
+@app.cli.command('build-assets')
+def build_assets_command():
+    # Dağıtım adımı: statik dosyaların gzip/brotli hallerini önceden üretir (ilk isteği beklemez)
+    count, original, smallest = asset_pipeline.build()
+    print(f'{count} statik dosya: {original / 1024:.0f} KB -> sıkıştırılmış {smallest / 1024:.0f} KB '
+          f"({'brotli + gzip' if brotli_module() else 'gzip; brotli için pip install brotli'}).")
+
+@app.cli.command('build-export')
+@click.option('--base-url', required=True, help="Sitemap'teki adreslerin kökü (ör. https://humatfansub.com)")
+def build_export_command(base_url):
+    # Tam NDJSON dökümü ve sitemap sayfaları EXPORT_DIR'e gzip'li yazılır; katalog değişene kadar istekler bu dosyalardan sunulur
+    base_url = base_url.rstrip('/') + '/'
+    with app.test_request_context(base_url=base_url):
+        modified = export.last_modified()
+        files = {'catalog.ndjson': lambda: export.buffered(catalog_export.ndjson(None, export.TYPES, modified, export_urls(), genres.registry().special_ids)),
+                 'sitemap.xml': lambda: export.buffered(export.sitemap_index(sitemap_entries(modified)))}
+        for kind, pages in sitemap_pages(modified).items():
+            for page, _ in pages:
+                files[f'sitemaps/{kind}-{page}.xml'] = lambda kind=kind, page=page: export.buffered(sitemap_page_chunks(kind, page))
+        written = catalog_export.build(modified, base_url, files)
+    for name, (size, compressed) in written.items():
+        print(f'  {name}: {size / 1024:.0f} KB -> {compressed / 1024:.0f} KB (gzip)')
+    print(f"{len(written)} dosya {app.config['EXPORT_DIR']} klasörüne yazıldı.")
+
+@app.cli.command('mal-worker')
+def mal_worker_command():
+    # Uzun süre çalışan süreçlerde (ör. Vercel dışı sunucular) ayrı bir worker olarak çalıştırılabilir
+    mal_enricher.run_forever()
+
+@app.cli.command('mal-refresh')
+def mal_refresh_command():
+    queued = mal_enricher.enqueue_refresh()
+    processed = mal_enricher.drain()
+    print(f'{queued} anime yenileme kuyruğuna eklendi, {processed} iş işlendi.')
+
+@app.cli.command('build-recommendations')
+@click.option('--incremental', is_flag=True, help='Sadece oyu/izleme listesi değişen animeleri günceller')
+def build_recommendations_command(incremental):
+    if incremental:
+        changed = recommendations.update_incremental(SPECIAL_GENRES)
+        page_cache.invalidate(*[f'similar:{anime_id}' for anime_id in changed])
+        print(f'{len(changed)} animenin benzer listesi güncellendi.')
+    else:
+        written = recommendations.rebuild(SPECIAL_GENRES)
+        page_cache.invalidate('recs')
+        print(f'{written} benzerlik satırı yazıldı.')
+
+@app.cli.command('update-affinities')
+def update_affinities_command():
+    flushed, processed = watch_history.run_once()
+    print(f'{processed} izleme olayı tür eğilimlerine işlendi.')
+
+@app.cli.command('compact-watch-history')
+@click.option('--days', default=affinity.RETENTION_DAYS, help='İzleme olaylarının ve anonim tür eğilimlerinin saklanacağı gün sayısı')
+def compact_watch_history_command(days):
+    events, affinities = watch_history.compact(days)
+    print(f'{events} eski izleme olayı ve {affinities} anonim ziyaretçi tür eğilimi silindi.')
+
+@app.cli.command('compact-notifications')
+@click.option('--days', default=notifications.RETENTION_DAYS, help='Okunmuş bildirimlerin saklanacağı gün sayısı')
+def compact_notifications_command(days):
+    deleted = notifications.compact(days)
+    print(f'{deleted} eski okunmuş bildirim silindi.')
+
+@app.cli.command('archive-logs')
+@click.option('--days', default=audit.RETENTION_DAYS, help='Logların log tablosunda tutulacağı gün sayısı')
+def archive_logs_command(days):
+    archived = audit.archive(days)
+    print(f'{archived} log kaydı arşive taşındı.')
+    for month, count in audit.archive_months():
+        print(f'  {month}: {count}')
+
+@app.cli.command('refresh-leaderboards')
+@click.option('--rebuild', is_flag=True, help='Trend skorlarını saklanan olaylardan baştan hesaplar')
+def refresh_leaderboards_command(rebuild):
+    updated = leaderboard.rebuild() if rebuild else leaderboard.refresh()
+    if updated:
+        page_cache.invalidate('leaderboard')
+    print(f'{updated} sıralama satırı güncellendi.')
+
+@app.cli.command('reconcile-ratings')
+@click.option('--check-only', is_flag=True, help='Sadece raporlar, düzeltmez')
+def reconcile_ratings_command(check_only):
+    mismatched = ratings.reconcile(fix=not check_only)
+    if mismatched and not check_only:
+        page_cache.invalidate('catalog', *[f'anime:{anime_id}' for anime_id in mismatched])
+    print(f'{len(mismatched)} animenin puan toplamı uyuşmuyordu' + ('.' if check_only else ', düzeltildi.'))
+
+def is_admin():
+    return current_user.is_authenticated and current_user.is_admin
 
 def admin_required(f):
     @wraps(f)
     def decorated_function(*args, **kwargs):
-        if not current_user.is_authenticated or not (current_user.can_add_user or current_user.can_edit or current_user.can_delete):
+        if not is_admin():
             flash('Bu sayfayı görüntüleme yetkiniz yok.', 'danger')
             return redirect(url_for('index'))
         return f(*args, **kwargs)
     return decorated_function
 
-def update_mal_data(anime):
-    try:
-        response = requests.get(f'https://api.jikan.moe/v4/anime?q={anime.name}&limit=1')
-        if response.status_code == 200:
-            data = response.json().get('data')
-            if data:
-                mal_anime = data[0]
-                anime.mal_id = mal_anime.get('mal_id')
-                anime.mal_score = mal_anime.get('score')
-                anime.mal_url = mal_anime.get('url')
-    except requests.exceptions.RequestException as e:
-        flash(f'MyAnimeList verileri alınamadı: {e}', 'warning')
-
-def log_action(action, description):
+def is_cacheable_request():
+    # Anonim ve bekleyen flash mesajı olmayan istekler için sayfa tamamen aynı render edilir
+    return not current_user.is_authenticated and not session.get('_flashes')
+
+def shelf_query():
+    return Anime.query.options(load_only(*ANIME_CARD_COLUMNS, Anime.description), raiseload('*'))
+
+def watch_owner(create=False):
+    # Giriş yapmış kullanıcılar id ile, anonimler çerezdeki kısa ziyaretçi id'si ile izlenir
     if current_user.is_authenticated:
-        new_log = Log(action=action, description=description, user_id=current_user.id)
-        db.session.add(new_log)
-        db.session.commit()
+        return f'u:{current_user.id}'
+    visitor_id = session.get('vid')
+    if visitor_id is None and create:
+        visitor_id = session['vid'] = secrets.token_hex(8)
+    return f'v:{visitor_id}' if visitor_id else None
+
+def render_shelf(template, animes, **context):
+    return Markup(render_template(template, animes=animes, **context))
+
+# Sayfada görünen verinin veritabanındaki değişiklik izi (tek sorgu). Süreç içi etiket sürümlerinden farklı
+# olarak başka süreçlerin (diğer worker'lar, CLI komutları, arka plan işleri) yazdıkları da görünür.
+def anime_page_state(anime_id):
+    similar = aliased(Anime)
+    return db.session.execute(select(
+        select(Anime.id).where(Anime.id == anime_id).scalar_subquery(),
+        select(Anime.updated_at).where(Anime.id == anime_id).scalar_subquery(),
+        select(func.count(Episode.id)).where(Episode.anime_id == anime_id).scalar_subquery(),
+        select(func.max(Episode.updated_at)).where(Episode.anime_id == anime_id).scalar_subquery(),
+        # Benzer anime kartları (ad, kapak, puan) ve listenin kendisi
+        select(func.max(similar.updated_at)).join(AnimeSimilarity, AnimeSimilarity.similar_id == similar.id).where(
+            AnimeSimilarity.anime_id == anime_id).scalar_subquery(),
+        select(JobState.value).where(JobState.name == recommendations.VERSION_JOB).scalar_subquery())).one()
+
+def episode_page_state(episode_id):
+    # Kaynaklar düzenlenince satırlar yeniden yazılır (id artar); sağlık kontrolü checked_at'i günceller
+    return db.session.execute(select(
+        select(Episode.id).where(Episode.id == episode_id).scalar_subquery(),
+        select(Episode.updated_at).where(Episode.id == episode_id).scalar_subquery(),
+        select(Anime.updated_at).join(Episode, Episode.anime_id == Anime.id).where(Episode.id == episode_id).scalar_subquery(),
+        select(func.count(EpisodeSource.id)).where(EpisodeSource.episode_id == episode_id).scalar_subquery(),
+        select(func.max(EpisodeSource.id)).where(EpisodeSource.episode_id == episode_id).scalar_subquery(),
+        select(func.max(EpisodeSource.checked_at)).where(EpisodeSource.episode_id == episode_id).scalar_subquery())).one()
+
+def conditional_page(name, tags, render, state):
+    # Anonim sayfalar için: ETag sayfanın veritabanındaki değişiklik izinden (state) türetilir; değişiklik hangi
+    # süreçte yapılmış olursa olsun ETag değişir. İstemcinin kopyası güncelse sayfa önbellekten bile okunmadan
+    # 304 döner. İz önbellek anahtarına da katılır; başka süreçte değişen sayfanın eski hali sunulmaz.
+    # İlk değer kaydın id'sidir (yoksa 404); updated_at'i boş eski/dışarıdan eklenmiş satırlar da sunulur
+    if state[0] is None:
+        abort(404)
+    tag = httpcache.state_tag(name, tuple(state), http_cache.release, asset_pipeline.version)
+    if httpcache.not_modified(tag):
+        response = app.response_class(status=304)
+    else:
+        response = app.response_class(page_cache.get_or_set(f'{name}|{tag}', tags, render))
+    # Giriş yapmış kullanıcılar aynı adreste farklı sayfa görür
+    response.vary.add('Cookie')
+    return httpcache.revalidate(response, tag)
+
+def invalidate_anime_cache(anime_id, genre_ids=()):
+    page_cache.invalidate(f'anime:{anime_id}', 'catalog', *[f'genre:{genre_id}' for genre_id in genre_ids])
+
+# MAL puanı kartlarda ve detay sayfasında görünür; worker güncellediğinde ilgili sayfalar düşer
+mal_enricher.on_update = lambda anime_ids: page_cache.invalidate('catalog', *[f'anime:{anime_id}' for anime_id in anime_ids])
+# Kaynak sırası veya ölü/canlı durumu değişen bölüm sayfaları düşer
+source_health.on_update = lambda episode_ids: page_cache.invalidate(*[f'episode:{episode_id}' for episode_id in episode_ids])
+
+def invalidate_covers(anime_ids):
+    # Kapak kartlarda, vitrin raflarında (tür etiketi) ve detay sayfasında görünür
+    genre_ids = db.session.execute(select(anime_genres.c.genre_id).where(anime_genres.c.anime_id.in_(anime_ids)).distinct()).scalars().all()
+    page_cache.invalidate('catalog', *[f'anime:{anime_id}' for anime_id in anime_ids], *[f'genre:{genre_id}' for genre_id in genre_ids])
+
+cover_pipeline.on_update = invalidate_covers
+# Trend/en beğenilen rafları ve bu sıralamalardaki keşfet sayfaları düşer
+leaderboard.on_update = lambda: page_cache.invalidate('leaderboard')
+
+# Yöneticiler herhangi bir sayfaya ?_profile=1 ekleyerek o isteğin cProfile çıktısını alır (/api/metrics/profiles)
+metrics.can_profile = is_admin
+metrics.can_view = is_admin
+
+def page_cache_metrics():
+    stats = page_cache.stats()
+    for name in ('hits', 'misses', 'invalidations'):
+        yield f'# TYPE page_cache_{name}_total counter'
+        yield f'page_cache_{name}_total {stats[name]}'
+    yield '# TYPE page_cache_entries gauge'
+    yield f"page_cache_entries {stats['entries']}"
+    yield '# TYPE page_cache_user_entries gauge'
+    yield f"page_cache_user_entries {stats['user_entries']}"
+
+metrics.collectors.append(page_cache_metrics)
 
 @login_manager.user_loader
 def load_user(user_id):
-    return User.query.get(int(user_id))
+    return load_principal(int(user_id), page_cache)
 
 @app.route('/register', methods=['GET', 'POST'])
 def register():
@@ -69,67 +375,146 @@ def register():
         user = User(username=form.username.data, password=hashed_password)
         db.session.add(user)
         db.session.commit()
+        page_cache.invalidate(f'user:{user.id}')
         flash('Hesabınız oluşturuldu! Şimdi giriş yapabilirsiniz.', 'success')
         return redirect(url_for('login'))
     return render_template('register.html', title='Kayıt Ol', form=form)
 
+# Önbellek tamamen soğukken giriş yapmış, izleme geçmişi olan kullanıcı için en kötü durum: tür kaydı, oturum,
+# vitrin ve editör rafları (id + kart), eğilim + kişisel raf, son izlenen + "izlediğin için" (ad + liste),
+# sıralama rafları (tek sorgu), son eklenenler ve rastgele raf (aralık, id'ler, kartlar)
 @app.route('/')
+@query_budget(16)
+@read_replica
 def index():
-    hero_animes = Anime.query.filter(Anime.genres.any(Genre.name == 'Hero Section')).limit(6).all()
-    editor_picks = Anime.query.filter(Anime.genres.any(Genre.name == 'Editörün Seçimi')).limit(6).all()
-    user_genres = session.get('user_genres', {})
-    personalized_recs = []
-    if user_genres:
-        sorted_genres = sorted(user_genres.items(), key=lambda x: x[1], reverse=True)
-        top_genre_ids = [int(g[0]) for g in sorted_genres[:3]]
+    registry = genres.registry()
+    hero_section = page_cache.get_or_set('shelf:hero', [f"genre:{registry.special_id('Hero Section')}"], lambda: render_shelf(
+        '_hero_carousel.html', animes_in_order(shelf_query(), genres.curated_ids('Hero Section', 6))))
+    editor_picks = page_cache.get_or_set('shelf:editor', [f"genre:{registry.special_id('Editörün Seçimi')}"], lambda: render_shelf(
+        '_anime_shelf.html', animes_in_order(shelf_query(), genres.curated_ids('Editörün Seçimi', 6)),
+        shelf_title='Editörün Seçimi', shelf_class='shelf-editors-pick'))
+    personalized_recs = ''
+    owner = watch_owner()
+    if owner:
+        top_genre_ids = page_cache.get_or_set(f'affinity:{owner}', [], lambda: watch_history.top_genres(owner, 3), ttl=60, per_user=True)
         if top_genre_ids:
-            personalized_recs = Anime.query.filter(Anime.genres.any(Genre.id.in_(top_genre_ids))).limit(6).all()
-    latest_animes = Anime.query.order_by(Anime.id.desc()).limit(6).all()
-    random_animes = random.sample(Anime.query.all(), min(len(Anime.query.all()), 6))
-    return render_template('index.html', hero_animes=hero_animes, editor_picks=editor_picks, personalized_recs=personalized_recs, latest_animes=latest_animes, random_animes=random_animes)
+            # Raf, tür üçlüsüne göre önbelleklenir; aynı eğilimdeki kullanıcılar aynı kaydı paylaşır
+            personalized_recs = page_cache.get_or_set(f"shelf:personal:{','.join(map(str, top_genre_ids))}",
+                ['catalog', *[f'genre:{genre_id}' for genre_id in top_genre_ids]], lambda: render_shelf(
+                '_anime_shelf.html', personalized_animes(shelf_query(), top_genre_ids),
+                shelf_title='Sana Özel Öneriler', shelf_class='shelf-personalized'))
+    because_watched = ''
+    if owner:
+        last_id = page_cache.get_or_set(f'last_watched:{owner}', [], lambda: watch_history.last_watched(owner), ttl=60, per_user=True)
+        if last_id:
+            because_watched = page_cache.get_or_set(f'shelf:because:{last_id}', ['recs', f'anime:{last_id}', f'similar:{last_id}'],
+                                                    lambda: render_because_watched(last_id))
+    # İki raf tek sorguyla yüklenip birlikte önbelleklenir. Trend rafı etkileşim olmasa da skorlar
+    # sönümlendikçe değişir; en geç ttl sonunda yeniden hesaplanır
+    trending, top_rated = page_cache.get_or_set('shelf:leaderboards', ['leaderboard', 'catalog'], lambda: render_leaderboards(), ttl=600)
+    latest_animes = page_cache.get_or_set('shelf:latest', ['catalog'], lambda: render_shelf(
+        '_anime_shelf.html', shelf_query().order_by(Anime.id.desc()).limit(6).all(),
+        shelf_title='Son Eklenenler', shelf_class='shelf-latest'))
+    random_animes = render_shelf('_anime_shelf.html', sample_random_animes(6), shelf_title='Rastgele Keşfet')
+    return render_template('index.html', hero_section=hero_section, editor_picks=editor_picks, personalized_recs=personalized_recs,
+                           because_watched=because_watched, trending=trending, top_rated=top_rated, latest_animes=latest_animes,
+                           random_animes=random_animes)
+
+def render_leaderboards():
+    trending, top_rated = leaderboard_animes(shelf_query(), leaderboard.trending_floor())
+    return (render_shelf('_anime_shelf.html', trending, shelf_title='Bu Hafta Trend', shelf_class='shelf-trending'),
+            render_shelf('_anime_shelf.html', top_rated, shelf_title='En Beğenilenler', shelf_class='shelf-top-rated'))
+
+def render_because_watched(anime_id):
+    name = db.session.query(Anime.name).filter_by(id=anime_id).scalar()
+    if name is None:
+        return ''
+    return render_shelf('_anime_shelf.html', recommendations.similar_animes(shelf_query(), anime_id),
+                        shelf_title=f'{name} izlediğin için', shelf_class='shelf-because-watched')
 
 @app.route('/animes', methods=['GET', 'POST'])
+@query_budget(5)
+@read_replica
 def animes():
     form = AnimeSearchForm(request.values)
-    genres_query = Genre.query
-    is_admin = current_user.is_authenticated and (current_user.can_add_user or current_user.can_edit or current_user.can_delete)
-    if not is_admin:
-        genres_query = genres_query.filter(Genre.name.notin_(SPECIAL_GENRES))
-    form.genre.choices = [('', 'Tüm Türler')] + [(str(g.id), g.name) for g in genres_query.order_by('name').all()]
-    query = Anime.query
+    form.genre.choices = [('', 'Tüm Türler')] + genres.registry().choices(include_special=is_admin())
+    query = Anime.query.options(load_only(Anime.id, Anime.name, Anime.cover_image, Anime.cover_digest), raiseload('*'))
+    search_query = None
     if form.validate_on_submit() or request.method == 'GET':
         search_query = form.query.data or request.args.get('query')
-        if search_query:
-            query = query.filter(Anime.name.ilike(f"%{search_query}%"))
+    # Arama yapılıp sıralama seçilmediyse sonuçlar alaka düzeyine göre sıralanır
+    sort_option = form.sort_by.data or 'name_asc'
+    if search_query and 'sort_by' not in request.values:
+        sort_option = form.sort_by.data = 'relevance'
+    rank = None
+    if search_query:
+        query, rank = search.apply_search(query, search_query)
     if form.genre.data:
         query = query.filter(Anime.genres.any(id=int(form.genre.data)))
     if form.release_year.data:
         query = query.filter_by(release_year=form.release_year.data)
     if form.anime_type.data:
         query = query.filter_by(anime_type=form.anime_type.data)
-    sort_option = form.sort_by.data or 'name_asc'
-    if sort_option == 'name_asc':
-        query = query.order_by(Anime.name.asc())
-    elif sort_option == 'name_desc':
-        query = query.order_by(Anime.name.desc())
-    elif sort_option == 'rating_desc':
-        query = query.order_by(Anime.average_rating.desc())
-    elif sort_option == 'year_desc':
-        query = query.order_by(Anime.release_year.desc())
-    page = request.args.get('page', 1, type=int)
-    animes = query.paginate(page=page, per_page=18, error_out=False)
-    return render_template('all_animes.html', animes=animes, form=form)
+    if sort_option == 'relevance' and rank is not None:
+        key, nullable = [(rank, False), (Anime.id, False)], False
+    else:
+        sort_option = sort_option if sort_option in ANIME_SORT_KEYS else 'name_asc'
+        key, nullable = ANIME_SORT_KEYS[sort_option]
+    page_query = query
+    tags = ['catalog']
+    if sort_option in LEADERBOARD_SORTS:
+        page_query = query.outerjoin(AnimeScore, AnimeScore.anime_id == Anime.id)
+        tags.append('leaderboard')
+    after = request.args.get('after')
+    before = request.args.get('before')
+    filter_key = f'{search_query}|{form.genre.data}|{form.release_year.data}|{form.anime_type.data}'
+    def load_page():
+        result = keyset_paginate(page_query, key, ANIMES_PER_PAGE, after=after, before=before, tag=sort_option, nullable=nullable)
+        return {'items': [{'id': a.id, 'name': a.name, 'cover_image': a.cover_image, 'cover_digest': a.cover_digest} for a in result.items],
+                'next': result.next_cursor, 'prev': result.prev_cursor}
+    result = page_cache.get_or_set(f'animes:{filter_key}|{sort_option}|{after}|{before}', tags, load_page)
+    # Toplam sayı filtre başına önbelleklenir; her sayfa geçişinde COUNT(*) çalışmaz
+    total = page_cache.get_or_set(f'animes_count:{filter_key}', ['catalog'], lambda: query.order_by(None).count())
+    animes = KeysetPage(result['items'], result['next'], result['prev'], total)
+    page_args = {name: value for name, value in {
+        'query': search_query, 'genre': form.genre.data, 'release_year': form.release_year.data,
+        'anime_type': form.anime_type.data, 'sort_by': sort_option,
+    }.items() if value}
+    return render_template('all_animes.html', animes=animes, form=form, page_args=page_args)
+
+@app.route('/api/search/autocomplete')
+@read_replica
+def search_autocomplete():
+    search_query = (request.args.get('q') or '').strip()
+    if len(search_query) < 2:
+        return jsonify([])
+    folded = ' '.join(search.tokenize(search_query))
+    response = jsonify(page_cache.get_or_set(f'autocomplete:{folded}', ['catalog'], lambda: search.autocomplete(search_query), ttl=60))
+    # Öneriler herkes için aynıdır; yazarken aynı önek tekrar sorulursa tarayıcı önbelleğinden gelir
+    response.cache_control.public = True
+    response.cache_control.max_age = 60
+    return response
 
 @app.route('/episode/<int:episode_id>')
+@query_budget(5)
+@read_replica
 def episode(episode_id):
-    episode = Episode.query.get_or_404(episode_id)
-    sources = episode.sources.split(',')
-    user_genres = session.get('user_genres', {})
-    for genre in episode.anime.genres:
-        if genre.name not in SPECIAL_GENRES:
-            user_genres[str(genre.id)] = user_genres.get(str(genre.id), 0) + 1
-    session['user_genres'] = user_genres
-    return render_template('episode.html', episode=episode, sources=sources)
+    def render_episode():
+        episode = Episode.query.options(
+            joinedload(Episode.anime).load_only(Anime.id, Anime.name),
+            selectinload(Episode.sources)
+        ).get_or_404(episode_id)
+        return render_template('episode.html', episode=episode, sources=sorted(episode.sources, key=source_order))
+    # Bölüm sayfası animeye göre etiketlenir; anime veya bölümleri değişince düşer
+    anime_id = page_cache.get_or_set(f'episode_anime:{episode_id}', [f'episode:{episode_id}'], lambda: Episode.query.get_or_404(episode_id).anime_id)
+    # Eski sürümlerin çereze yazdığı tür sayaçları temizlenir
+    session.pop('user_genres', None)
+    # İzleme, sayfa 304 ile dönse de kaydedilir
+    watch_history.record(watch_owner(create=True), anime_id, episode_id)
+    if is_cacheable_request():
+        return conditional_page(f'page:{request.path}', [f'anime:{anime_id}', f'episode:{episode_id}'], render_episode,
+                                episode_page_state(episode_id))
+    return render_episode()
 
 @app.route('/admin/genres', methods=['GET', 'POST'])
 @login_required
@@ -140,16 +525,18 @@ def manage_genres():
         new_genre_name = form.name.data
         if new_genre_name in SPECIAL_GENRES:
             flash(f'"{new_genre_name}" türü özel bir türdür ve eklenemez.', 'danger')
-        elif Genre.query.filter_by(name=new_genre_name).first():
+        elif new_genre_name in genres.registry().by_name:
             flash(f'"{new_genre_name}" türü zaten mevcut.', 'warning')
         else:
             new_genre = Genre(name=new_genre_name)
             db.session.add(new_genre)
+            db.session.flush()
+            audit.record('add', f'"{new_genre_name}" türü eklendi.', ('genre', new_genre.id))
             db.session.commit()
+            page_cache.invalidate('genres')
             flash(f'"{new_genre_name}" türü eklendi.', 'success')
         return redirect(url_for('manage_genres'))
-    genres = Genre.query.all()
-    return render_template('manage_genres.html', form=form, genres=genres, special_genres=SPECIAL_GENRES)
+    return render_template('manage_genres.html', form=form, genres=genres.registry().genres, special_genres=SPECIAL_GENRES)
 
 @app.route('/admin/delete_genre/<int:genre_id>', methods=['POST'])
 @login_required
@@ -159,8 +546,13 @@ def delete_genre(genre_id):
     if genre.name in SPECIAL_GENRES:
         flash(f'"{genre.name}" türü silinemez.', 'danger')
     else:
+        anime_ids = db.session.execute(select(anime_genres.c.anime_id).where(anime_genres.c.genre_id == genre_id)).scalars().all()
+        # Tür listesi sadece ara tabloda değişir; dışa aktarmanın since sorgusu için animeler de değişmiş sayılır
+        db.session.execute(update(Anime).where(Anime.id.in_(anime_ids)).values(updated_at=db.func.now()))
         db.session.delete(genre)
+        audit.record('delete', f'"{genre.name}" türü silindi.', ('genre', genre_id))
         db.session.commit()
+        page_cache.invalidate('genres', 'catalog', f'genre:{genre_id}', *[f'anime:{anime_id}' for anime_id in anime_ids])
         flash(f'"{genre.name}" türü silindi.', 'success')
     return redirect(url_for('manage_genres'))
 
@@ -175,13 +567,21 @@ def add_anime():
             new_anime.mal_score = float(form.mal_score.data)
         if form.mal_url.data:
             new_anime.mal_url = form.mal_url.data
-        if not new_anime.mal_score:
-            update_mal_data(new_anime)
-        for genre in form.genres.data:
-            new_anime.genres.append(genre)
+        if form.genres.data:
+            new_anime.genres = Genre.query.filter(Genre.id.in_([genre.id for genre in form.genres.data])).all()
         db.session.add(new_anime)
+        cover_pipeline.assign(new_anime)
+        db.session.flush()
+        search.index_anime(new_anime)
+        recommendations.mark_dirty(new_anime.id)
+        if not new_anime.mal_score:
+            mal_enricher.enqueue(new_anime.id)
+        audit.record('add', f'Anime "{new_anime.name}" eklendi.', ('anime', new_anime.id),
+                     audit.diff({}, dict(audit.snapshot(new_anime, ANIME_AUDIT_FIELDS), genres=[genre.name for genre in new_anime.genres])))
         db.session.commit()
-        log_action('add', f'Anime "{new_anime.name}" eklendi.')
+        mal_enricher.wake()
+        cover_pipeline.wake()
+        invalidate_anime_cache(new_anime.id, [genre.id for genre in new_anime.genres])
         return redirect(url_for('admin'))
     return render_template('add_anime.html', form=form)
 
@@ -192,9 +592,12 @@ def edit_anime(anime_id):
     anime = Anime.query.get_or_404(anime_id)
     form = AnimeForm(obj=anime)
     if form.validate_on_submit():
+        before = audit.snapshot(anime, ANIME_AUDIT_FIELDS)
         anime.name = form.name.data
         anime.description = form.description.data
         anime.cover_image = form.cover_image.data
+        if anime.cover_image != before['cover_image']:
+            cover_pipeline.assign(anime)
         anime.release_year = form.release_year.data
         anime.status = form.status.data
         anime.anime_type = form.anime_type.data
@@ -202,28 +605,120 @@ def edit_anime(anime_id):
             anime.mal_score = float(form.mal_score.data)
         if form.mal_url.data:
             anime.mal_url = form.mal_url.data
+        search.index_anime(anime)
         if not anime.mal_score:
-            update_mal_data(anime)
+            mal_enricher.enqueue(anime.id)
+        audit.record('update', f'Anime "{anime.name}" düzenlendi.', ('anime', anime.id),
+                     audit.diff(before, audit.snapshot(anime, ANIME_AUDIT_FIELDS)))
         db.session.commit()
-        log_action('update', f'Anime "{anime.name}" düzenlendi.')
+        mal_enricher.wake()
+        cover_pipeline.wake()
+        invalidate_anime_cache(anime.id, [genre.id for genre in anime.genres])
         return redirect(url_for('admin'))
     assigned_genres = anime.genres
-    unassigned_genres = [genre for genre in Genre.query.all() if genre not in assigned_genres]
+    unassigned_genres = genres.registry().excluding(genre.id for genre in assigned_genres)
     return render_template('edit_anime.html', form=form, anime=anime, assigned_genres=assigned_genres, unassigned_genres=unassigned_genres)
 
+def export_urls():
+    return {'anime': export.link_template(url_for('anime', anime_id=export.PLACEHOLDER_ID, _external=True)),
+            'episode': export.link_template(url_for('episode', episode_id=export.PLACEHOLDER_ID, _external=True))}
+
+def export_response(name, modified, mimetype, chunks, prebuilt=True):
+    # chunks: satır üreteci döndüren fonksiyon; sadece gövde gerçekten gönderilecekse çağrılır.
+    # If-Modified-Since katalogun son değişikliğinden yeniyse gövdesiz 304 döner.
+    if modified is not None and request.if_modified_since and modified.replace(microsecond=0, tzinfo=timezone.utc) <= request.if_modified_since:
+        response = app.response_class(status=304)
+    else:
+        gzip_accepted = 'gzip' in request.accept_encodings
+        path = catalog_export.prebuilt(name, modified, request.url_root) if prebuilt and gzip_accepted else None
+        if path is not None:
+            response = send_file(path, mimetype=mimetype, conditional=False, etag=False)
+        else:
+            body = export.buffered(chunks())
+            if gzip_accepted:
+                body = export.gzip_stream(body, app.config['EXPORT_COMPRESS_LEVEL'])
+            response = Response(stream_with_context(body), mimetype=mimetype)
+        if gzip_accepted:
+            response.headers['Content-Encoding'] = 'gzip'
+        response.vary.add('Accept-Encoding')
+    if modified is not None:
+        response.last_modified = modified.replace(tzinfo=timezone.utc)
+    response.cache_control.public = True
+    response.cache_control.no_cache = True
+    return response
+
+def sitemap_pages(modified):
+    # Sayfa başına son değişiklik bir tam tarama gerektirir; katalog değişene kadar önbellekten okunur
+    return page_cache.get_or_set(f'sitemap_pages:{export.isoformat(modified)}', [], lambda: {
+        kind: [tuple(row) for row in export.sitemap_pages(kind)] for kind in export.SITEMAP_KINDS}, ttl=24 * 3600)
+
+def sitemap_entries(modified):
+    return [(url_for('sitemap_page', kind=kind, page=page, _external=True), lastmod)
+            for kind, pages in sitemap_pages(modified).items() for page, lastmod in pages]
+
+def sitemap_page_chunks(kind, page):
+    return export.sitemap_urls(kind, page, export_urls()[kind], app.config['EXPORT_YIELD_PER'])
+
+@app.route('/export/catalog.ndjson')
+@read_replica
+def export_catalog():
+    # Tam döküm veya ?since=<ISO 8601 | Unix zamanı> ile o andan sonra değişenler (silinenler dahil);
+    # ?types=anime,episode ile türler seçilir. İlk satırdaki next_since bir sonraki istekte kullanılır.
+    since = export.parse_since(request.args.get('since'))
+    if request.args.get('since') and since is None:
+        return jsonify({'status': 'error', 'message': 'Invalid since'}), 400
+    requested = request.args.get('types')
+    types = [kind for kind in export.TYPES if not requested or kind in requested.split(',')]
+    modified = export.last_modified()
+    return export_response('catalog.ndjson', modified, 'application/x-ndjson', lambda: catalog_export.ndjson(
+        since, types, modified, export_urls(), genres.registry().special_ids), prebuilt=since is None and not requested)
+
+@app.route('/sitemap.xml')
+@read_replica
+def sitemap():
+    modified = export.last_modified()
+    return export_response('sitemap.xml', modified, 'application/xml', lambda: export.sitemap_index(sitemap_entries(modified)))
+
+@app.route('/sitemaps/<kind>-<int:page>.xml')
+@read_replica
+def sitemap_page(kind, page):
+    if kind not in export.SITEMAP_KINDS:
+        abort(404)
+    return export_response(f'sitemaps/{kind}-{page}.xml', export.last_modified(), 'application/xml', lambda: sitemap_page_chunks(kind, page))
+
+@app.route('/robots.txt')
+def robots():
+    return Response(f"User-agent: *\nAllow: /\nSitemap: {url_for('sitemap', _external=True)}\n", mimetype='text/plain')
+
+@app.route('/covers/<path:filename>')
+def cover_file(filename):
+    # Dosya adı içerik özetini taşır, içerik hiç değişmez; tarayıcı ve CDN bir yıl boyunca tekrar sormaz
+    response = send_from_directory(app.config['COVER_DIR'], filename, max_age=app.config['COVER_MAX_AGE'])
+    response.cache_control.immutable = True
+    return response
+
 @app.route('/copyright')
 def copyright():
     return render_template('copyright.html')
 
 @app.route('/anime/<int:anime_id>')
+@query_budget(6)
+@read_replica
 def anime(anime_id):
-    anime = Anime.query.get_or_404(anime_id)
+    if is_cacheable_request():
+        return conditional_page(f'page:{request.path}', [f'anime:{anime_id}', f'similar:{anime_id}', 'recs'], lambda: render_anime(anime_id),
+                                anime_page_state(anime_id))
+    return render_anime(anime_id)
+
+def render_anime(anime_id):
+    anime = Anime.query.options(selectinload(Anime.genres), selectinload(Anime.episodes)).get_or_404(anime_id)
     user_rating = None
     is_in_watchlist = False
     if current_user.is_authenticated:
         user_rating = Rating.query.filter_by(user_id=current_user.id, anime_id=anime.id).first()
-        is_in_watchlist = anime in current_user.watchlist_animes
-    return render_template('anime.html', anime=anime, user_rating=user_rating, is_in_watchlist=is_in_watchlist)
+        is_in_watchlist = db.session.query(watchlist_table.c.anime_id).filter_by(user_id=current_user.id, anime_id=anime.id).first() is not None
+    similar = recommendations.similar_animes(shelf_query(), anime.id)
+    return render_template('anime.html', anime=anime, user_rating=user_rating, is_in_watchlist=is_in_watchlist, similar_animes=similar)
 
 @app.route('/login', methods=['GET', 'POST'])
 def login():
@@ -231,18 +726,20 @@ def login():
     if form.validate_on_submit():
         user = User.query.filter_by(username=form.username.data).first()
         if user and check_password_hash(user.password, form.password.data):
-            login_user(user)
+            # current_user bu istekte de Principal olur (yetki kontrolleri tek yerden)
+            login_user(Principal(user.id, user.username, user.can_delete, user.can_edit, user.can_add_user))
             return redirect(url_for('index'))
         else:
             flash('Giriş başarısız. Lütfen kullanıcı adınızı ve şifrenizi kontrol edin.', 'danger')
     return render_template('login.html', form=form)
 
 @app.route('/admin', methods=['GET', 'POST'])
+@query_budget(3)
 @login_required
 @admin_required
 def admin():
-    animes = Anime.query.all()
-    return render_template('admin.html', animes=animes)
+    animes = Anime.query.options(load_only(Anime.id, Anime.name), raiseload('*')).all()
+    return render_template('admin.html', animes=animes, dead_sources=source_health.dead_sources())
 
 @app.route('/add_episode/<int:anime_id>', methods=['GET', 'POST'])
 @login_required
@@ -250,21 +747,51 @@ def admin():
 def add_episode(anime_id):
     form = EpisodeForm()
     if form.validate_on_submit():
-        episode = Episode(number=form.number.data, sources=form.sources.data, anime_id=anime_id)
+        anime = Anime.query.options(load_only(Anime.id, Anime.name), raiseload('*')).get_or_404(anime_id)
+        episode = Episode(number=form.number.data, anime_id=anime_id)
+        episodes.set_sources(episode, form.sources.data)
         db.session.add(episode)
+        # Bölüm ve bildirimler aynı transaction'da yazılır
+        message = f"{anime.name} animesinin {episode.number}. bölümü yayınlandı!"
+        notifications.fan_out(anime.id, message)
+        db.session.flush()
+        audit.record('add', f'Anime "{anime.name}" için bölüm {episode.number} eklendi.', ('episode', episode.id),
+                     {'number': [None, episode.number], 'sources': [None, [source.url for source in episode.sources]]})
         db.session.commit()
-        anime = Anime.query.get(anime_id)
-        # Bildirim gönder
-        for user in anime.watchlisted_by:
-            notification = Notification(message=f"{anime.name} animesinin {episode.number}. bölümü yayınlandı!", user_id=user.id, anime_id=anime.id)
-            db.session.add(notification)
-        db.session.commit()
-
-        log_action('add', f'Anime "{anime.name}" için bölüm {form.number.data} eklendi.')
+        # Bu süreçteki akışa bağlı izleyicilere anında haber verilir
+        notification_hub.publish(notifications.watcher_ids(anime.id, notification_hub.connected_users()),
+                                 ('notification', {'anime_id': anime.id, 'message': message}))
+        invalidate_anime_cache(anime.id)
         flash('Bölüm başarıyla eklendi.', 'success')
         return redirect(url_for('anime', anime_id=anime_id))
     return render_template('add_episode.html', form=form)
 
+@app.route('/import_episodes/<int:anime_id>', methods=['GET', 'POST'])
+@login_required
+@admin_required
+def import_episodes(anime_id):
+    anime = Anime.query.options(load_only(Anime.id, Anime.name), raiseload('*')).get_or_404(anime_id)
+    form = EpisodeImportForm()
+    if form.validate_on_submit():
+        upload = form.file.data
+        try:
+            result = episodes.import_episodes(anime, episodes.parse_import(upload.read(), upload.filename or ''))
+        except ValueError as e:
+            db.session.rollback()
+            flash(f'Bölümler içe aktarılamadı: {e}', 'danger')
+            return render_template('import_episodes.html', form=form, anime=anime)
+        audit.record('import', f'Anime "{anime.name}" için {result.added} bölüm içe aktarıldı, {result.updated} bölüm güncellendi.',
+                     ('anime', anime.id), {'file': [None, upload.filename], 'added': [None, result.added],
+                                           'updated': [None, result.updated], 'sources': [None, result.sources]})
+        db.session.commit()
+        if result.message:
+            notification_hub.publish(notifications.watcher_ids(anime.id, notification_hub.connected_users()),
+                                     ('notification', {'anime_id': anime.id, 'message': result.message}))
+        invalidate_anime_cache(anime.id)
+        flash(f'{result.added} bölüm eklendi, {result.updated} bölüm güncellendi.', 'success')
+        return redirect(url_for('anime', anime_id=anime_id))
+    return render_template('import_episodes.html', form=form, anime=anime)
+
 @app.route('/delete_anime/<int:anime_id>', methods=['POST'])
 @login_required
 @admin_required
@@ -275,10 +802,17 @@ def delete_anime(anime_id):
     anime = Anime.query.get_or_404(anime_id)
     if anime:
         anime_name = anime.name
+        genre_ids = [genre.id for genre in anime.genres]
+        episodes.remove_for_anime(anime_id)
         Episode.query.filter_by(anime_id=anime_id).delete()
+        search.remove_anime(anime_id)
+        recommendations.remove_anime(anime_id)
+        leaderboard.remove_anime(anime_id)
+        audit.record('delete', f'Anime "{anime_name}" silindi.', ('anime', anime_id),
+                     audit.diff(audit.snapshot(anime, ANIME_AUDIT_FIELDS), dict.fromkeys(ANIME_AUDIT_FIELDS)))
         db.session.delete(anime)
         db.session.commit()
-        log_action('delete', f'Anime "{anime_name}" silindi.')
+        invalidate_anime_cache(anime_id, genre_ids)
         flash('Anime ve ilgili bölümler başarıyla silindi.', 'success')
     return redirect(url_for('admin'))
 
@@ -291,9 +825,11 @@ def delete_episode(episode_id):
         return redirect(url_for('anime', anime_id=Episode.query.get_or_404(episode_id).anime_id))
     episode = Episode.query.get_or_404(episode_id)
     anime_id = episode.anime_id
+    audit.record('delete', f'Bölüm {episode.number} silindi. Anime ID: {anime_id}', ('episode', episode_id),
+                 {'number': [episode.number, None], 'sources': [[source.url for source in episode.sources], None]})
     db.session.delete(episode)
     db.session.commit()
-    log_action('delete', f'Bölüm {episode.number} silindi. Anime ID: {anime_id}')
+    page_cache.invalidate(f'anime:{anime_id}', f'episode:{episode_id}')
     flash('Bölüm başarıyla silindi.', 'success')
     return redirect(url_for('anime', anime_id=anime_id))
 
@@ -307,16 +843,17 @@ def edit_episode(episode_id):
     episode = Episode.query.get_or_404(episode_id)
     form = EpisodeForm()
     if form.validate_on_submit():
-        old_number = episode.number
-        old_sources = episode.sources
+        before = {'number': str(episode.number), 'sources': [source.url for source in episode.sources]}
         episode.number = form.number.data
-        episode.sources = form.sources.data
+        episodes.set_sources(episode, form.sources.data)
+        audit.record('edit', f'Bölüm {before["number"]} güncellendi.', ('episode', episode.id),
+                     audit.diff(before, {'number': str(episode.number), 'sources': [source.url for source in episode.sources]}))
         db.session.commit()
-        log_action('edit', f'Bölüm {old_number} güncellendi. Yeni numara: {form.number.data}, Eski kaynaklar: {old_sources}, Yeni kaynaklar: {form.sources.data}')
+        page_cache.invalidate(f'anime:{episode.anime_id}', f'episode:{episode_id}')
         flash('Bölüm başarıyla güncellendi.', 'success')
         return redirect(url_for('anime', anime_id=episode.anime_id))
     form.number.data = episode.number
-    form.sources.data = episode.sources
+    form.sources.data = episodes.sources_text(episode)
     return render_template('edit_episode.html', form=form, episode=episode)
 
 @app.route('/add_user', methods=['GET', 'POST'])
@@ -331,24 +868,31 @@ def add_user():
         hashed_password = generate_password_hash(form.password.data, method='pbkdf2:sha256')
         new_user = User(username=form.username.data, password=hashed_password, can_delete=form.can_delete.data, can_edit=form.can_edit.data, can_add_user=form.can_add_user.data)
         db.session.add(new_user)
+        db.session.flush()
+        audit.record('add_user', f'Yeni kullanıcı eklendi: {new_user.username}', ('user', new_user.id),
+                     audit.diff({}, audit.snapshot(new_user, USER_AUDIT_FIELDS)))
         db.session.commit()
-        log_action('add_user', f'Yeni kullanıcı eklendi: {form.username.data}, Silme yetkisi: {form.can_delete.data}, Düzenleme yetkisi: {form.can_edit.data}, Kullanıcı ekleme yetkisi: {form.can_add_user.data}')
+        page_cache.invalidate(f'user:{new_user.id}')
         flash('Kullanıcı başarıyla eklendi!', 'success')
         return redirect(url_for('admin'))
     return render_template('add_user.html', form=form)
 
 @app.route('/logs')
+@query_budget(4)
 @login_required
 @admin_required
 def view_logs():
     if not current_user.can_add_user:
         flash('Bu sayfayı görüntüleme yetkiniz yok.', 'danger')
         return redirect(url_for('index'))
-    page = request.args.get('page', 1, type=int)
-    logs = Log.query.order_by(Log.timestamp.desc()).paginate(page=page, per_page=10)
+    logs_query = Log.query.options(joinedload(Log.user).load_only(User.id, User.username))
+    logs = keyset_paginate(logs_query, [(Log.timestamp, True), (Log.id, True)], LOGS_PER_PAGE,
+                           after=request.args.get('after'), before=request.args.get('before'), tag='logs')
+    logs.total = page_cache.get_or_set('log_count', [], lambda: Log.query.count(), ttl=60)
     return render_template('log.html', logs=logs)
 
 @app.route('/users')
+@query_budget(2)
 @login_required
 @admin_required
 def users():
@@ -368,54 +912,67 @@ def edit_user(user_id):
     user = User.query.get_or_404(user_id)
     form = EditUserForm(obj=user)
     if form.validate_on_submit():
+        before = audit.snapshot(user, USER_AUDIT_FIELDS)
         user.username = form.username.data
         user.can_delete = form.can_delete.data
         user.can_edit = form.can_edit.data
         user.can_add_user = form.can_add_user.data
+        audit.record('edit_user', f'Kullanıcı "{user.username}" güncellendi.', ('user', user.id),
+                     audit.diff(before, audit.snapshot(user, USER_AUDIT_FIELDS)))
         db.session.commit()
-        log_action('edit_user', f'Kullanıcı "{user.username}" güncellendi.')
+        page_cache.invalidate(f'user:{user.id}')
         flash('Kullanıcı başarıyla güncellendi.', 'success')
         return redirect(url_for('admin'))
     return render_template('edit_user.html', form=form, user=user)
 
 @app.route('/api/watchlist/<int:anime_id>', methods=['POST'])
+@query_budget(6)
 @login_required
 def toggle_watchlist(anime_id):
-    anime = Anime.query.get_or_404(anime_id)
-    if anime in current_user.watchlist_animes:
-        current_user.watchlist_animes.remove(anime)
+    anime = Anime.query.options(load_only(Anime.id), raiseload('*')).get_or_404(anime_id)
+    # İzleme listesinin tamamı yüklenmeden doğrudan ara tabloya yazılır
+    entry = watchlist_table.c.user_id == current_user.id, watchlist_table.c.anime_id == anime.id
+    if db.session.query(watchlist_table.c.anime_id).filter(*entry).first():
+        db.session.execute(watchlist_table.delete().where(*entry))
         status = 'removed'
     else:
-        current_user.watchlist_animes.append(anime)
+        db.session.execute(watchlist_table.insert().values(user_id=current_user.id, anime_id=anime.id))
+        leaderboard.record(anime.id, 'watchlist')
         status = 'added'
+    recommendations.mark_dirty(anime.id)
     db.session.commit()
     return jsonify({'status': status})
 
 @app.route('/api/rate/<int:anime_id>', methods=['POST'])
+@query_budget(7)
 @login_required
 def rate_anime(anime_id):
-    anime = Anime.query.get_or_404(anime_id)
     score = request.json.get('score')
-    if not score or not 1 <= score <= 5:
+    if not isinstance(score, int) or not 1 <= score <= 5:
         return jsonify({'status': 'error', 'message': 'Invalid score'}), 400
-    rating = Rating.query.filter_by(user_id=current_user.id, anime_id=anime.id).first()
-    if rating:
-        rating.score = score
-    else:
-        rating = Rating(user_id=current_user.id, anime_id=anime.id, score=score)
-        db.session.add(rating)
-    total_ratings = db.session.query(db.func.sum(Rating.score)).filter(Rating.anime_id == anime.id).scalar()
-    count_ratings = db.session.query(db.func.count(Rating.id)).filter(Rating.anime_id == anime.id).scalar()
-    anime.average_rating = total_ratings / count_ratings
-    anime.rating_count = count_ratings
+    result = ratings.vote(current_user.id, anime_id, score)
+    if result is None:
+        db.session.rollback()
+        abort(404)
+    recommendations.mark_dirty(anime_id)
+    # Yüksek puan trende daha çok katkı verir
+    leaderboard.record(anime_id, 'rating', score / 5)
     db.session.commit()
-    return jsonify({'status': 'success', 'new_average': anime.average_rating, 'rating_count': anime.rating_count})
+    average_rating, rating_count = result
+    # Anime sayfası hemen; ortalama puanı gösteren katalog sayfaları ve raflar (rating_desc sıralaması dahil)
+    # en fazla CACHE_DEBOUNCE_SECONDS gecikmeyle yenilenir, her oy tüm katalog önbelleğini silmez
+    page_cache.invalidate(f'anime:{anime_id}')
+    page_cache.invalidate_soon('catalog')
+    return jsonify({'status': 'success', 'new_average': average_rating, 'rating_count': rating_count})
 
 @app.route('/profile')
+@query_budget(4)
 @login_required
 def profile():
-    watchlist = current_user.watchlist_animes
-    user_ratings = Rating.query.filter_by(user_id=current_user.id).order_by(Rating.score.desc()).all()
+    watchlist = Anime.query.join(watchlist_table, watchlist_table.c.anime_id == Anime.id).filter(
+        watchlist_table.c.user_id == current_user.id).options(load_only(Anime.id, Anime.name, Anime.cover_image, Anime.cover_digest), raiseload('*')).all()
+    user_ratings = Rating.query.filter_by(user_id=current_user.id).options(
+        joinedload(Rating.anime).load_only(Anime.id, Anime.name, Anime.cover_image, Anime.cover_digest)).order_by(Rating.score.desc()).all()
     return render_template('profile.html', watchlist=watchlist, user_ratings=user_ratings)
 
 @app.route('/api/anime/<int:anime_id>/genre/add/<int:genre_id>', methods=['POST'])
@@ -426,7 +983,10 @@ def add_genre_to_anime(anime_id, genre_id):
     genre = Genre.query.get_or_404(genre_id)
     if genre not in anime.genres:
         anime.genres.append(genre)
+        anime.updated_at = db.func.now()
+        recommendations.mark_dirty(anime.id)
         db.session.commit()
+        invalidate_anime_cache(anime.id, [genre.id])
     return jsonify({'status': 'success'})
 
 @app.route('/api/anime/<int:anime_id>/genre/remove/<int:genre_id>', methods=['POST'])
@@ -437,7 +997,10 @@ def remove_genre_from_anime(anime_id, genre_id):
     genre = Genre.query.get_or_404(genre_id)
     if genre in anime.genres:
         anime.genres.remove(genre)
+        anime.updated_at = db.func.now()
+        recommendations.mark_dirty(anime.id)
         db.session.commit()
+        invalidate_anime_cache(anime.id, [genre.id])
     return jsonify({'status': 'success'})
 
 @app.route('/delete_user/<int:user_id>', methods=['POST'])
@@ -454,6 +1017,7 @@ def delete_user(user_id):
     db.session.commit()
     db.session.delete(user)
     db.session.commit()
+    page_cache.invalidate(f'user:{user_id}')
     flash('Kullanıcı başarıyla silindi!', 'success')
     return redirect(url_for('users'))
 
@@ -467,11 +1031,113 @@ def logout():
 def support():
     return render_template('support.html')
 
+@app.route('/api/cache/stats')
+@login_required
+@admin_required
+def cache_stats():
+    return jsonify(page_cache.stats())
+
+@app.route('/api/mal/stats')
+@login_required
+@admin_required
+def mal_stats():
+    return jsonify(mal_enricher.stats())
+
+@app.route('/api/sources/stats')
+@login_required
+@admin_required
+def source_stats():
+    return jsonify(source_health.stats())
+
+@app.route('/api/sources/<int:source_id>/history')
+@login_required
+@admin_required
+def source_history(source_id):
+    return jsonify([{'checked_at': check.checked_at.isoformat(), 'status': check.status, 'latency_ms': check.latency_ms,
+                     'error': check.error} for check in source_health.history(source_id)])
+
+@app.route('/api/metrics/profiles')
+@login_required
+@admin_required
+def metric_profiles():
+    return jsonify([{key: value for key, value in profile.items() if key != 'report'} for profile in metrics.profiles])
+
+@app.route('/api/metrics/profiles/<int:profile_id>')
+@login_required
+@admin_required
+def metric_profile(profile_id):
+    profile = metrics.profile(profile_id)
+    if profile is None:
+        abort(404)
+    header = f"{profile['path']} ({profile['endpoint']}): {profile['duration_ms']} ms, {profile['statements']} sorgu / {profile['db_ms']} ms\n\n"
+    return app.response_class(header + profile['report'], mimetype='text/plain')
+
+def conditional_json(tag, build):
+    # İstemcinin elindeki sürüm güncelse gövde hiç oluşturulmadan 304 döner
+    if httpcache.not_modified(tag):
+        response = app.response_class(status=304)
+    else:
+        response = jsonify(build())
+    response.cache_control.private = True
+    return httpcache.revalidate(response, tag)
+
 @app.route('/api/notifications')
+@query_budget(3)
 @login_required
 def get_notifications():
-    notifications = Notification.query.filter_by(user_id=current_user.id).order_by(Notification.timestamp.desc()).all()
-    return jsonify([{'id': n.id, 'message': n.message, 'timestamp': n.timestamp.isoformat(), 'is_read': n.is_read, 'anime_id': n.anime_id} for n in notifications])
+    # ?since=<id> sadece o id'den yeni bildirimleri döner; ilk yüklemede son PAGE_SIZE kayıt gelir
+    after_id = request.args.get('since', 0, type=int)
+    limit = min(request.args.get('limit', notifications.PAGE_SIZE, type=int), notifications.PAGE_SIZE)
+    latest_id, unread = notifications.state(current_user.id)
+    tag = notifications.etag(current_user.id, latest_id, unread, after_id, limit)
+    return conditional_json(tag, lambda: {
+        'notifications': [notifications.serialize(n) for n in notifications.since(current_user.id, after_id, limit)],
+        'unread': unread,
+        'cursor': latest_id,
+    })
+
+@app.route('/api/notifications/unread_count')
+@query_budget(2)
+@login_required
+def unread_notification_count():
+    latest_id, unread = notifications.state(current_user.id)
+    tag = notifications.etag(current_user.id, latest_id, unread)
+    return conditional_json(tag, lambda: {'unread': unread, 'cursor': latest_id})
+
+@app.route('/api/notifications/stream')
+@login_required
+def notification_stream():
+    # Server-Sent Events; desteklemeyen istemciler /api/notifications?since= ile yoklamaya devam eder
+    if not app.config['NOTIFICATION_STREAM_ENABLED']:
+        return jsonify({'status': 'error', 'message': 'Stream disabled'}), 404
+    user_id = current_user.id
+    known = {'latest_id': notifications.state(user_id)[0]}
+    # Boştaki bağlantı veritabanı bağlantısı tutmaz
+    db.session.close()
+
+    def check():
+        # Başka süreçlerde (worker'larda) yazılan bildirimler bu kontrolle yakalanır
+        latest_id = notifications.state(user_id)[0]
+        db.session.close()
+        changed = latest_id > known['latest_id']
+        known['latest_id'] = latest_id
+        return changed
+
+    subscription = notification_hub.subscribe(user_id)
+    def events():
+        try:
+            yield from pubsub.stream(subscription, app.config['NOTIFICATION_STREAM_KEEPALIVE'], app.config['NOTIFICATION_STREAM_RECHECK'],
+                                     app.config['NOTIFICATION_STREAM_MAX_AGE'], check)
+        finally:
+            notification_hub.unsubscribe(subscription)
+    return Response(stream_with_context(events()), mimetype='text/event-stream',
+                    headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'})
+
+@app.route('/api/notifications/stream/stats')
+@login_required
+@admin_required
+def notification_stream_stats():
+    return jsonify(notification_hub.stats())
 
 @app.route('/api/notifications/mark_read', methods=['POST'])
 @login_required
@@ -0,0 +1,173 @@
+import gzip
+import hashlib
+import mimetypes
+import os
+import threading
+
+from flask import abort, request, send_file
+from werkzeug.security import safe_join
+
+# Sıkıştırılacak (metin tabanlı) statik dosyalar; PNG/JPEG/WOFF2 zaten sıkıştırılmıştır
+COMPRESSIBLE = {'.css', '.js', '.svg', '.json', '.txt', '.ico', '.map'}
+# Accept-Encoding'de tercih sırası
+ENCODINGS = (('br', '.br'), ('gzip', '.gz'))
+
+def brotli_module():
+    # brotli isteğe bağlıdır (pip install brotli); yoksa sadece gzip üretilir
+    try:
+        import brotli
+    except ImportError:
+        return None
+    return brotli
+
+def fingerprint(path):
+    with open(path, 'rb') as f:
+        return hashlib.sha256(f.read()).hexdigest()[:10]
+
+def hashed_name(filename, digest):
+    stem, ext = os.path.splitext(filename)
+    return f'{stem}.{digest}{ext}'
+
+def write_atomic(path, data):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    temporary = f'{path}.{os.getpid()}.tmp'
+    with open(temporary, 'wb') as f:
+        f.write(data)
+    os.replace(temporary, path)
+
+class AssetPipeline:
+    # url_for('static', ...) içerik özetli dosya adı üretir (css/custom.3f2a1b9c0d.css). Özetli adlar
+    # içerik değişmedikçe aynı kaldığından bir yıllık immutable önbellekle sunulur; dosya değişince
+    # adı da değişir. Metin dosyalarının gzip/brotli halleri bir kez üretilip diskten verilir.
+    def __init__(self, app=None):
+        self.app = None
+        self._manifest = None
+        self._originals = None
+        # (dosya, kodlama) -> sıkıştırılmış dosya yolu veya None (üretilemiyor)
+        self._compressed = {}
+        self._lock = threading.Lock()
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        app.config.setdefault('ASSET_BUILD_DIR', os.path.join(app.instance_path, 'assets'))
+        app.config.setdefault('ASSET_MAX_AGE', 365 * 24 * 3600)
+        app.config.setdefault('ASSET_COMPRESS_LEVEL', 9)
+        # Kapalıysa (ör. geliştirirken) özgün adlar kullanılır
+        app.config.setdefault('ASSET_FINGERPRINT', True)
+        self.app = app
+        app.extensions['asset_pipeline'] = self
+        app.url_defaults(self.inject_filename)
+        app.view_functions['static'] = self.send_static
+
+    @property
+    def manifest(self):
+        # {özgün ad: özetli ad}; statik klasörü birkaç küçük dosyadır, ilk url_for'da bir kez hesaplanır
+        if self._manifest is None:
+            with self._lock:
+                if self._manifest is None:
+                    manifest = self.scan()
+                    self._originals = {hashed: filename for filename, hashed in manifest.items()}
+                    self._manifest = manifest
+        return self._manifest
+
+    @property
+    def originals(self):
+        # {özetli ad: özgün ad}
+        if self._manifest is None:
+            self.manifest
+        return self._originals
+
+    def scan(self):
+        root = self.app.static_folder
+        manifest = {}
+        for directory, _, files in os.walk(root):
+            for name in files:
+                path = os.path.join(directory, name)
+                filename = os.path.relpath(path, root).replace(os.sep, '/')
+                manifest[filename] = hashed_name(filename, fingerprint(path))
+        return manifest
+
+    @property
+    def version(self):
+        # Tüm statik dosyaların ortak özeti; HTML sayfalarının ETag'ine katılır (CSS değişince sayfa da yenilenir)
+        return hashlib.sha1('|'.join(sorted(self.manifest.values())).encode()).hexdigest()[:10]
+
+    def inject_filename(self, endpoint, values):
+        if endpoint == 'static' and self.app.config['ASSET_FINGERPRINT'] and not self.app.debug:
+            values['filename'] = self.manifest.get(values.get('filename'), values.get('filename'))
+
+    def send_static(self, filename):
+        immutable = filename in self.originals
+        filename = self.originals.get(filename, filename)
+        path = safe_join(self.app.static_folder, filename)
+        if path is None or not os.path.isfile(path):
+            abort(404)
+        encoding, served = self.negotiate(filename, path)
+        mimetype = mimetypes.guess_type(filename)[0] or 'application/octet-stream'
+        if immutable:
+            response = send_file(served, mimetype=mimetype, max_age=self.app.config['ASSET_MAX_AGE'],
+                                 conditional=False, etag=False)
+            response.cache_control.immutable = True
+            response.cache_control.public = True
+        else:
+            # Özetsiz adlar (eski bağlantılar, og:image) her seferinde doğrulanır; değişmediyse 304
+            response = send_file(served, mimetype=mimetype, conditional=True, etag=True)
+        if encoding:
+            response.headers['Content-Encoding'] = encoding
+        if os.path.splitext(filename)[1] in COMPRESSIBLE:
+            response.vary.add('Accept-Encoding')
+        return response
+
+    def negotiate(self, filename, path):
+        # Geliştirirken dosyalar sık değişir; sıkıştırılmış kopyalar sadece özetli manifest ile tutarlıdır
+        if os.path.splitext(filename)[1] not in COMPRESSIBLE or self.app.debug:
+            return None, path
+        for encoding, suffix in ENCODINGS:
+            if encoding in request.accept_encodings:
+                key = (filename, encoding)
+                if key not in self._compressed:
+                    self._compressed[key] = self.compressed(filename, path, encoding, suffix)
+                if self._compressed[key]:
+                    return encoding, self._compressed[key]
+        return None, path
+
+    def compressed(self, filename, path, encoding, suffix):
+        # Önceden üretilmiş dosya varsa (flask build-assets) o kullanılır; yoksa ilk istekte üretilir.
+        # Derleme klasörü yazılamıyorsa (salt okunur dağıtım) sıkıştırılmamış dosya verilir.
+        target = os.path.join(self.app.config['ASSET_BUILD_DIR'], self.manifest.get(filename, filename) + suffix)
+        if os.path.exists(target):
+            return target
+        brotli = brotli_module() if encoding == 'br' else None
+        if encoding == 'br' and brotli is None:
+            return None
+        with open(path, 'rb') as f:
+            data = f.read()
+        if brotli is not None:
+            data = brotli.compress(data, quality=11)
+        else:
+            data = gzip.compress(data, compresslevel=self.app.config['ASSET_COMPRESS_LEVEL'], mtime=0)
+        try:
+            write_atomic(target, data)
+        except OSError:
+            return None
+        return target
+
+    def build(self):
+        # Dağıtım adımı: tüm sıkıştırılmış halleri üretir, (dosya sayısı, özgün bayt, en küçük bayt) döner
+        self._manifest = None
+        self._compressed.clear()
+        count = original = smallest = 0
+        for filename in sorted(self.manifest):
+            path = os.path.join(self.app.static_folder, filename)
+            size = os.path.getsize(path)
+            best = size
+            if os.path.splitext(filename)[1] in COMPRESSIBLE:
+                for encoding, suffix in ENCODINGS:
+                    compressed = self.compressed(filename, path, encoding, suffix)
+                    if compressed:
+                        best = min(best, os.path.getsize(compressed))
+            count += 1
+            original += size
+            smallest += best
+        return count, original, smallest
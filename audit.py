@@ -0,0 +1,47 @@
+import json
+from datetime import datetime, timedelta
+from flask_login import current_user
+from sqlalchemy import delete, func, select
+from models import db, Log, LogArchive
+
+RETENTION_DAYS = 90
+ARCHIVE_CHUNK_SIZE = 5000
+
+def snapshot(obj, fields):
+    return {field: getattr(obj, field) for field in fields}
+
+def diff(before, after):
+    # Sadece değişen alanlar {alan: [eski, yeni]} olarak döner; before boşsa tüm alanlar yenidir
+    return {field: [before.get(field), value] for field, value in after.items() if before.get(field) != value}
+
+def record(action, description, target=None, changes=None):
+    # Log satırı değişiklikle aynı oturuma eklenir ve onunla birlikte commit edilir; ayrı bir
+    # commit (ayrı yazma/fsync) yapılmaz, değişiklik geri alınırsa log da yazılmaz. Commit çağıranındır.
+    if not current_user.is_authenticated:
+        return None
+    target_type, target_id = target or (None, None)
+    entry = Log(action=action, description=description, user_id=current_user.id, target_type=target_type,
+                target_id=target_id, changes=json.dumps(changes, ensure_ascii=False, default=str) if changes else None)
+    db.session.add(entry)
+    return entry
+
+def archive(retention_days=RETENTION_DAYS, chunk_size=ARCHIVE_CHUNK_SIZE):
+    # Saklama süresini aşan loglar ay anahtarıyla log_archive tablosuna taşınır; log tablosu küçük
+    # kaldığından /logs sayfası ve sayımı hızlı kalır. Kısa kilitler için parça parça commit edilir.
+    cutoff = datetime.utcnow() - timedelta(days=retention_days)
+    columns = [column.name for column in Log.__table__.columns]
+    archived = 0
+    while True:
+        rows = db.session.execute(select(Log.__table__).where(Log.timestamp < cutoff).order_by(
+            Log.timestamp, Log.id).limit(chunk_size)).mappings().all()
+        if not rows:
+            return archived
+        db.session.execute(LogArchive.__table__.insert(), [
+            dict({column: row[column] for column in columns}, month=row['timestamp'].strftime('%Y-%m')) for row in rows])
+        db.session.execute(delete(Log).where(Log.id.in_([row['id'] for row in rows])))
+        db.session.commit()
+        archived += len(rows)
+
+def archive_months():
+    return db.session.execute(select(LogArchive.month, func.count(LogArchive.id)).group_by(
+        LogArchive.month).order_by(LogArchive.month)).all()
@@ -0,0 +1,25 @@
+from flask_login import UserMixin
+from models import db, User
+
+# Oturumdaki kullanıcı bilgisinin önbellekte tutulacağı süre (saniye)
+PRINCIPAL_TTL = 60
+
+class Principal(UserMixin):
+    # Her istekte ORM User nesnesi yerine sadece kimlik ve yetki bitlerini taşır
+    def __init__(self, id, username, can_delete, can_edit, can_add_user):
+        self.id = id
+        self.username = username
+        self.can_delete = bool(can_delete)
+        self.can_edit = bool(can_edit)
+        self.can_add_user = bool(can_add_user)
+
+    @property
+    def is_admin(self):
+        return self.can_add_user or self.can_edit or self.can_delete
+
+def load_principal(user_id, cache):
+    def fetch():
+        row = db.session.query(User.id, User.username, User.can_delete, User.can_edit, User.can_add_user).filter_by(id=user_id).first()
+        return tuple(row) if row else None
+    data = cache.get_or_set(f'principal:{user_id}', [f'user:{user_id}'], fetch, ttl=PRINCIPAL_TTL, per_user=True)
+    return Principal(*data) if data else None
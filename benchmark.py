@@ -0,0 +1,1532 @@
+"""Basit performans ölçümleri.
+
+Geçici bir SQLite veritabanı oluşturur, sentetik veri ile doldurur ve
+route'ları Flask test istemcisi üzerinden ölçer:
+
+    python benchmark.py index --sizes 100 1000 10000 100000
+    python benchmark.py search --sizes 10000 100000
+    python benchmark.py auth --watchlist 500
+    python benchmark.py mal --animes 30 --delay 0.5
+    python benchmark.py publish --watchers 10 1000 100000
+    python benchmark.py stream --connections 2000 --users 200
+    python benchmark.py ratings --votes 5000 --threads 16
+    python benchmark.py recommend --users 100000 --titles 20000
+    python benchmark.py import --episodes 10000 --watchers 1000
+    python benchmark.py health --episodes 300 --per-host 4
+    python benchmark.py db --writers 4 --readers 8 --seconds 10
+    python benchmark.py audit --logs 1000000 --days 90
+    python benchmark.py coldstart --repeat 20 --output coldstart.json
+    python benchmark.py genres --animes 100000 --genres 60
+    python benchmark.py covers --covers 54 --workers 0 2
+    python benchmark.py http --episodes 500 --notifications 50
+    python benchmark.py metrics --animes 10000
+    python benchmark.py leaderboards --titles 100000 --ratings 1000000 --views 500000
+    python benchmark.py export --titles 100000 --episodes 2000000
+    python benchmark.py load --titles 1000 10000 100000 --clients 16 --duration 30 --output load.json
+"""
+import argparse
+import io
+import json
+import os
+import random
+import re
+import resource
+import shutil
+import selectors
+import socket
+import statistics
+import subprocess
+import sys
+import tempfile
+import threading
+from concurrent.futures import ThreadPoolExecutor
+import time
+from datetime import datetime, timedelta
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+
+from sqlalchemy import create_engine
+
+def percentile(samples, pct):
+    ordered = sorted(samples)
+    index = min(len(ordered) - 1, int(round(pct / 100 * (len(ordered) - 1))))
+    return ordered[index]
+
+def timed(fn, repeat):
+    samples = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        samples.append((time.perf_counter() - start) * 1000)
+    return samples
+
+def report(label, samples):
+    print(f'{label:<40} p50={statistics.median(samples):8.2f}ms  p95={percentile(samples, 95):8.2f}ms  n={len(samples)}')
+
+def prepare_database():
+    from models import db
+    path = os.path.join(tempfile.mkdtemp(prefix='anime-bench-'), 'bench.db')
+    uri = f'sqlite:///{path}'
+    engine = create_engine(uri)
+    db.metadata.create_all(engine)
+    os.environ['DATABASE_URL'] = uri
+    return engine
+
+SYLLABLES = ['ka', 'ra', 'şe', 'ğı', 'mi', 'ço', 'lü', 'ta', 'na', 'yo', 'ki', 'su', 'ba', 'dö', 'ze', 'gi']
+_rng = random.Random(42)
+# Gerçek Türkçe kelimeler + hece birleşiminden üretilmiş geniş bir sözlük
+WORDS = ['şeker', 'ılık', 'gölge', 'kılıç', 'yıldız', 'ejderha', 'okul', 'macera', 'İstanbul', 'çiçek',
+         'savaşçı', 'büyü', 'deniz', 'rüya', 'ağaç', 'kahraman', 'gece', 'ışık', 'robot', 'kedi'] + [
+    ''.join(_rng.choice(SYLLABLES) for _ in range(_rng.randint(2, 4))) for _ in range(5000)]
+
+def random_text(words):
+    return ' '.join(random.choice(WORDS) for _ in range(words))
+
+def seed_animes(engine, start, count):
+    from models import Anime
+    rows = [{
+        'name': f'{random_text(2).title()} {i}',
+        'description': random_text(30),
+        'cover_image': f'https://example.com/covers/{i}.jpg',
+        'release_year': random.randint(1990, 2025),
+        'status': random.choice(['Bitti', 'Devam Ediyor']),
+        'anime_type': random.choice(['TV', 'Film', 'OVA']),
+        'average_rating': random.uniform(1, 5),
+        'rating_count': random.randint(0, 500),
+    } for i in range(start, start + count)]
+    with engine.begin() as conn:
+        conn.execute(Anime.__table__.insert(), rows)
+
+def bench_index(args):
+    engine = prepare_database()
+    from app import app
+    from models import Anime
+    from shelves import random_animes
+    client = app.test_client()
+    seeded = 0
+    for size in sorted(args.sizes):
+        seed_animes(engine, seeded, size - seeded)
+        seeded = size
+        client.get('/')
+        report(f'index  ({size} anime)', timed(lambda: client.get('/'), args.repeat))
+        def random_shelf():
+            with app.app_context():
+                random_animes(6)
+        report(f'random shelf ({size} anime)', timed(random_shelf, args.repeat))
+        if args.legacy:
+            # Eski yöntem: tüm katalog iki kez yüklenip random.sample ile seçiliyordu
+            def legacy():
+                with app.app_context():
+                    random.sample(Anime.query.all(), min(len(Anime.query.all()), 6))
+            report(f'legacy random.sample ({size} anime)', timed(legacy, max(1, args.repeat // 10)))
+
+def bench_search(args):
+    engine = prepare_database()
+    from app import app
+    from models import db, Anime
+    import search
+    queries = ['şeker', 'kılıç yıldız', 'ISIK', 'ejder', 'istanbul gece']
+    seeded = 0
+    for size in sorted(args.sizes):
+        seed_animes(engine, seeded, size - seeded)
+        seeded = size
+        with app.app_context():
+            search.rebuild_search_index()
+            for term in queries:
+                def fts():
+                    query, rank = search.apply_search(Anime.query, term)
+                    query.order_by(rank, Anime.id).limit(18).all()
+                def ilike():
+                    Anime.query.filter(Anime.name.ilike(f'%{term}%')).order_by(Anime.name).limit(18).all()
+                report(f'fts   {term!r} ({size} anime)', timed(fts, args.repeat))
+                report(f'ilike {term!r} ({size} anime)', timed(ilike, args.repeat))
+            db.session.remove()
+
+def bench_auth(args):
+    engine = prepare_database()
+    seed_animes(engine, 0, max(args.watchlist, 1))
+    from app import app, login_manager, page_cache
+    from models import db, User, watchlist
+    from sqlalchemy.orm import subqueryload
+    from werkzeug.security import generate_password_hash
+    with app.app_context():
+        user = User(username='bench', password=generate_password_hash('bench'))
+        db.session.add(user)
+        db.session.commit()
+        db.session.execute(watchlist.insert(), [{'user_id': user.id, 'anime_id': i} for i in range(1, args.watchlist + 1)])
+        db.session.commit()
+    app.config['WTF_CSRF_ENABLED'] = False
+    client = app.test_client()
+    client.post('/login', data={'username': 'bench', 'password': 'bench'})
+    principal_loader = login_manager._user_callback
+
+    # Eski davranış: her istekte tam User nesnesi ve izleme listesi (lazy='subquery')
+    login_manager.user_loader(lambda user_id: db.session.get(User, int(user_id), options=[subqueryload(User.watchlist_animes)]))
+    report(f'legacy User + watchlist ({args.watchlist})', timed(lambda: client.get('/support'), args.repeat))
+    login_manager.user_loader(principal_loader)
+    page_cache.enabled = False
+    report('principal (önbelleksiz)', timed(lambda: client.get('/support'), args.repeat))
+    page_cache.enabled = True
+    report('principal (önbellekli)', timed(lambda: client.get('/support'), args.repeat))
+    client.get('/logout')
+    report('anonim istek', timed(lambda: client.get('/support'), args.repeat))
+
+class FakeJikanHandler(BaseHTTPRequestHandler):
+    # Jikan v4'ün /anime?q= ve /anime/<id> uçlarını taklit eden yerel sunucu
+    delay = 0.0
+    throttle_every = 0
+    hits = []
+
+    def do_GET(self):
+        type(self).hits.append(time.monotonic())
+        time.sleep(self.delay)
+        if self.throttle_every and len(self.hits) % self.throttle_every == 0:
+            return self._send(429, {'message': 'Too Many Requests'}, {'Retry-After': '1'})
+        url = urlparse(self.path)
+        if url.path == '/v4/anime':
+            title = parse_qs(url.query).get('q', [''])[0]
+            mal_id = abs(hash(title)) % 100000
+            return self._send(200, {'data': [{'mal_id': mal_id, 'score': 7.5, 'url': f'https://myanimelist.net/anime/{mal_id}'}]})
+        if url.path.startswith('/v4/anime/'):
+            mal_id = int(url.path.rsplit('/', 1)[1])
+            return self._send(200, {'data': {'mal_id': mal_id, 'score': 8.1, 'url': f'https://myanimelist.net/anime/{mal_id}'}})
+        self._send(404, {'message': 'Not Found'})
+
+    def _send(self, status, body, headers=None):
+        payload = json.dumps(body).encode()
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(payload)))
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(payload)
+
+    def log_message(self, *args):
+        pass
+
+def start_fake_jikan(delay=0.0, throttle_every=0):
+    FakeJikanHandler.delay = delay
+    FakeJikanHandler.throttle_every = throttle_every
+    FakeJikanHandler.hits = []
+    server = ThreadingHTTPServer(('127.0.0.1', 0), FakeJikanHandler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server, f'http://127.0.0.1:{server.server_port}/v4'
+
+def bench_mal(args):
+    server, base_url = start_fake_jikan(args.delay, args.throttle_every)
+    os.environ['JIKAN_BASE_URL'] = base_url
+    prepare_database()
+    from app import app, mal_enricher
+    from models import db, User, Anime, MalJob
+    from werkzeug.security import generate_password_hash
+    import requests
+    app.config.update(WTF_CSRF_ENABLED=False, MAL_WORKER_ENABLED=False)
+    with app.app_context():
+        db.session.add(User(username='bench', password=generate_password_hash('bench'), can_edit=True, can_add_user=True, can_delete=True))
+        db.session.commit()
+    client = app.test_client()
+    client.post('/login', data={'username': 'bench', 'password': 'bench'})
+
+    # Eski davranış: kayıt isteği içinde zaman aşımı olmadan senkron Jikan çağrısı
+    legacy = timed(lambda: requests.get(f'{base_url}/anime?q=legacy&limit=1'), min(args.animes, 10))
+    report(f'legacy senkron Jikan (gecikme {args.delay}s)', legacy)
+
+    # Başlıkların yarısı tekrar eder; önbellek sayesinde Jikan'a bir kez gidilir
+    titles = [f'Bench Anime {i % max(args.animes // 2, 1)}' for i in range(args.animes)]
+    def add(title):
+        return lambda: client.post('/add_anime', data={'name': title, 'description': 'x', 'cover_image': 'x.jpg'})
+    saves = [timed(add(title), 1)[0] for title in titles]
+    report('add_anime (kuyruğa alma)', saves)
+
+    with app.app_context():
+        FakeJikanHandler.hits = []
+        start = time.perf_counter()
+        processed = mal_enricher.drain()
+        elapsed = time.perf_counter() - start
+        hits = FakeJikanHandler.hits
+        rate = (len(hits) - 1) / (hits[-1] - hits[0]) if len(hits) > 1 else 0
+        enriched = Anime.query.filter(Anime.mal_id.isnot(None)).count()
+        print(f'worker: {processed} iş, {len(hits)} HTTP isteği, {elapsed:.2f}s, {rate:.2f} istek/sn, {enriched} anime zenginleştirildi')
+        queued = mal_enricher.enqueue_refresh()
+        start = time.perf_counter()
+        processed = mal_enricher.drain()
+        print(f'refresh: {queued} kuyruğa alındı, {processed} iş {time.perf_counter() - start:.2f}s içinde işlendi')
+        print('iş durumları:', dict(db.session.query(MalJob.status, db.func.count(MalJob.id)).group_by(MalJob.status).all()))
+    server.shutdown()
+
+def seed_watchers(engine, anime_id, start, count):
+    from models import User, watchlist
+    users = [{'username': f'watcher{i}', 'password': 'x'} for i in range(start, start + count)]
+    with engine.begin() as conn:
+        conn.execute(User.__table__.insert(), users)
+        first_id = conn.execute(User.__table__.select().where(User.username == f'watcher{start}')).first().id
+        conn.execute(watchlist.insert(), [{'user_id': user_id, 'anime_id': anime_id} for user_id in range(first_id, first_id + count)])
+
+def bench_publish(args):
+    engine = prepare_database()
+    seed_animes(engine, 0, 2)
+    from app import app
+    from models import db, User, Anime, Episode, Notification
+    from werkzeug.security import generate_password_hash
+    app.config['WTF_CSRF_ENABLED'] = False
+    with app.app_context():
+        db.session.add(User(username='bench', password=generate_password_hash('bench'), can_edit=True, can_add_user=True, can_delete=True))
+        db.session.commit()
+    client = app.test_client()
+    client.post('/login', data={'username': 'bench', 'password': 'bench'})
+    seeded = 0
+    counter = iter(range(1, 10 ** 9))
+    for watchers in sorted(args.watchers):
+        seed_watchers(engine, 1, seeded, watchers - seeded)
+        seeded = watchers
+        repeat = max(1, args.repeat if watchers < 10000 else args.repeat // 5)
+        report(f'add_episode ({watchers} izleyici)', timed(
+            lambda: client.post('/add_episode/1', data={'number': next(counter), 'sources': 'https://example.com/e'}), repeat))
+        if args.legacy:
+            # Eski davranış: izleyen her kullanıcı yüklenip tek tek Notification eklenirdi
+            def legacy():
+                with app.app_context():
+                    episode = Episode(number=next(counter), legacy_sources='https://example.com/e', anime_id=1)
+                    db.session.add(episode)
+                    db.session.commit()
+                    anime = db.session.get(Anime, 1)
+                    for user in anime.watchlisted_by:
+                        db.session.add(Notification(message=f'{anime.name} {episode.number}', user_id=user.id, anime_id=anime.id))
+                    db.session.commit()
+            report(f'legacy döngü ({watchers} izleyici)', timed(legacy, repeat))
+
+def process_status(pid):
+    fields = {}
+    with open(f'/proc/{pid}/status') as f:
+        for line in f:
+            name, _, value = line.partition(':')
+            fields[name] = value.strip()
+    return f"RSS={fields.get('VmRSS')} thread={fields.get('Threads')}"
+
+def wait_for_server(port, timeout=30):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        try:
+            socket.create_connection(('127.0.0.1', port), timeout=1).close()
+            return
+        except OSError:
+            time.sleep(0.2)
+    raise RuntimeError('sunucu başlamadı')
+
+def bench_stream(args):
+    import requests
+    soft, hard = resource.getrlimit(resource.RLIMIT_NOFILE)
+    resource.setrlimit(resource.RLIMIT_NOFILE, (hard, hard))
+    engine = prepare_database()
+    seed_animes(engine, 0, 1)
+    from models import User, watchlist
+    from werkzeug.security import generate_password_hash
+    # Hızlı giriş için düşük iterasyonlu hash; ölçülen şey akış, giriş değil
+    password = generate_password_hash('bench', method='pbkdf2:sha256:1000')
+    with engine.begin() as conn:
+        conn.execute(User.__table__.insert(), [{'username': f'viewer{i}', 'password': password} for i in range(args.users)])
+        conn.execute(User.__table__.insert(), {'username': 'bench', 'password': password, 'can_edit': True, 'can_add_user': True, 'can_delete': True})
+        conn.execute(watchlist.insert(), [{'user_id': i, 'anime_id': 1} for i in range(1, args.users + 1)])
+
+    port = args.port
+    command = [sys.executable, os.path.join(os.path.dirname(os.path.abspath(__file__)), 'serve.py'), '--port', str(port)]
+    if args.threaded:
+        command.append('--threaded')
+    server = subprocess.Popen(command, stderr=subprocess.DEVNULL)
+    try:
+        wait_for_server(port)
+        base = f'http://127.0.0.1:{port}'
+        def csrf_token(session, path):
+            return re.search(r'name="csrf_token" type="hidden" value="([^"]+)"', session.get(f'{base}{path}').text).group(1)
+        def login(username):
+            session = requests.Session()
+            session.post(f'{base}/login', data={'username': username, 'password': 'bench', 'csrf_token': csrf_token(session, '/login')},
+                         allow_redirects=False)
+            return session
+        cookies = [login(f'viewer{i}').cookies.get('session') for i in range(args.users)]
+        admin = login('bench')
+        print(f'başlangıç: {process_status(server.pid)}')
+
+        selector = selectors.DefaultSelector()
+        buffers = {}
+        for i in range(args.connections):
+            sock = socket.create_connection(('127.0.0.1', port))
+            sock.sendall((f'GET /api/notifications/stream HTTP/1.1\r\nHost: 127.0.0.1\r\n'
+                          f'Cookie: session={cookies[i % args.users]}\r\nAccept: text/event-stream\r\n\r\n').encode())
+            sock.setblocking(False)
+            selector.register(sock, selectors.EVENT_READ)
+            buffers[sock] = b''
+        def pump(until, pattern):
+            done = {sock for sock, data in buffers.items() if pattern in data}
+            while len(done) < len(buffers) and time.monotonic() < until:
+                for key, _ in selector.select(timeout=0.5):
+                    chunk = key.fileobj.recv(65536)
+                    buffers[key.fileobj] += chunk
+                    if pattern in buffers[key.fileobj]:
+                        done.add(key.fileobj)
+            return len(done)
+        connected = pump(time.monotonic() + 60, b'retry:')
+        print(f'{connected}/{args.connections} bağlantı açık: {process_status(server.pid)}')
+        time.sleep(args.idle)
+        print(f'{args.idle}s boşta sonra: {process_status(server.pid)}')
+
+        token = csrf_token(admin, '/add_episode/1')
+        start = time.perf_counter()
+        admin.post(f'{base}/add_episode/1', data={'number': 1, 'sources': 'https://example.com/e', 'csrf_token': token}, allow_redirects=False)
+        publish_ms = (time.perf_counter() - start) * 1000
+        delivered = pump(time.monotonic() + 60, b'event: notification')
+        print(f'yayın isteği {publish_ms:.1f}ms, {delivered}/{args.connections} bağlantıya '
+              f'{(time.perf_counter() - start) * 1000:.1f}ms içinde ulaştı')
+        for sock in buffers:
+            sock.close()
+    finally:
+        server.terminate()
+        server.wait()
+
+def bench_ratings(args):
+    engine = prepare_database()
+    seed_animes(engine, 0, args.animes)
+    from models import User, Anime
+    from werkzeug.security import generate_password_hash
+    password = generate_password_hash('bench', method='pbkdf2:sha256:1000')
+    with engine.begin() as conn:
+        # Seed verisindeki sahte ortalamalar sıfırlanır; sonuç sadece bu testteki oylardan oluşmalı
+        conn.execute(Anime.__table__.update().values(average_rating=0.0, rating_count=0, rating_sum=0))
+        conn.execute(User.__table__.insert(), [{'username': f'voter{i}', 'password': password} for i in range(args.users)])
+    from app import app
+    from sqlalchemy import func
+    from models import db, Rating
+    app.config['WTF_CSRF_ENABLED'] = False
+
+    # Her kullanıcı tek bir thread'e aittir (bir tarayıcı gibi); son gönderdiği oy kesin olarak bilinir
+    def run_user(index, votes):
+        client = app.test_client()
+        client.post('/login', data={'username': f'voter{index}', 'password': 'bench'})
+        rng = random.Random(index)
+        final = {}
+        samples = []
+        for _ in range(votes):
+            anime_id, score = rng.randint(1, args.animes), rng.randint(1, 5)
+            start = time.perf_counter()
+            response = client.post(f'/api/rate/{anime_id}', json={'score': score})
+            samples.append((time.perf_counter() - start) * 1000)
+            if response.status_code != 200:
+                raise RuntimeError(f'{response.status_code}: {response.data[:200]}')
+            final[anime_id] = score
+        return final, samples
+
+    per_user = args.votes // args.users
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=args.threads) as pool:
+        results = list(pool.map(lambda i: run_user(i, per_user), range(args.users)))
+    elapsed = time.perf_counter() - start
+    samples = [ms for _, user_samples in results for ms in user_samples]
+    report(f'rate_anime ({args.threads} thread)', samples)
+    print(f'{len(samples)} oy {elapsed:.2f}s içinde ({len(samples) / elapsed:.0f} oy/sn)')
+
+    expected = {}
+    for final, _ in results:
+        for anime_id, score in final.items():
+            total, votes = expected.get(anime_id, (0, 0))
+            expected[anime_id] = (total + score, votes + 1)
+    with app.app_context():
+        errors = 0
+        for anime in Anime.query.all():
+            total, votes = expected.get(anime.id, (0, 0))
+            average = total / votes if votes else 0.0
+            if (anime.rating_sum, anime.rating_count) != (total, votes) or anime.average_rating != average:
+                errors += 1
+        raw = db.session.query(func.count(Rating.id)).scalar()
+        print(f'{len(expected)} anime, {raw} oy satırı; beklenenden farklı toplam: {errors}')
+        if errors:
+            raise SystemExit(1)
+
+def bench_recommend(args):
+    engine = prepare_database()
+    seed_animes(engine, 0, args.titles)
+    from models import User, Genre, Rating, anime_genres, watchlist
+    rng = random.Random(7)
+    genre_count = 30
+    # Her kullanıcı birkaç "zevk kümesinden" seçer; böylece benzerlik rastgele gürültü olmaz
+    clusters = [rng.sample(range(1, args.titles + 1), 200) for _ in range(args.titles // 100)]
+    rated, listed = {}, {}
+    for user_id in range(1, args.users + 1):
+        tastes = rng.sample(clusters, 2)
+        for _ in range(args.interactions):
+            anime_id = rng.choice(rng.choice(tastes)) if rng.random() < 0.8 else rng.randint(1, args.titles)
+            if rng.random() < 0.7:
+                rated[(user_id, anime_id)] = rng.randint(1, 5)
+            else:
+                listed[(user_id, anime_id)] = True
+    start = time.perf_counter()
+    with engine.begin() as conn:
+        conn.execute(User.__table__.insert(), [{'username': f'user{i}', 'password': '-'} for i in range(1, args.users + 1)])
+        conn.execute(Genre.__table__.insert(), [{'name': f'Tür {i}'} for i in range(genre_count)])
+        conn.execute(anime_genres.insert(), [{'anime_id': anime_id, 'genre_id': genre_id}
+                                             for anime_id in range(1, args.titles + 1)
+                                             for genre_id in rng.sample(range(1, genre_count + 1), 3)])
+        conn.execute(Rating.__table__.insert(), [{'user_id': u, 'anime_id': a, 'score': score} for (u, a), score in rated.items()])
+        conn.execute(watchlist.insert(), [{'user_id': u, 'anime_id': a} for u, a in listed])
+    print(f'{args.users} kullanıcı, {args.titles} anime, {len(rated)} oy, {len(listed)} izleme listesi kaydı '
+          f'({time.perf_counter() - start:.1f}s)')
+
+    from app import app
+    from models import db, Anime
+    import recommendations
+    with app.app_context():
+        start = time.perf_counter()
+        written = recommendations.rebuild()
+        print(f'tam yeniden hesaplama: {time.perf_counter() - start:.1f}s, {written} komşu satırı')
+
+        dirty = rng.sample(range(1, args.titles + 1), args.dirty)
+        voters = [next(u for u in iter(lambda: rng.randint(1, args.users), None) if (u, anime_id) not in rated) for anime_id in dirty]
+        db.session.execute(Rating.__table__.insert(), [{'user_id': user_id, 'anime_id': anime_id, 'score': 5}
+                                                       for user_id, anime_id in zip(voters, dirty)])
+        recommendations.mark_dirty(*dirty)
+        db.session.commit()
+        start = time.perf_counter()
+        changed = recommendations.update_incremental()
+        print(f'artımlı güncelleme ({args.dirty} işaretli anime): {time.perf_counter() - start:.1f}s, {len(changed)} liste değişti')
+
+        query = lambda: Anime.query
+        report('similar_animes sorgusu', timed(lambda: recommendations.similar_animes(query(), rng.randint(1, args.titles)), args.repeat))
+    client = app.test_client()
+    report('anime sayfası (benzerlerle)', timed(lambda: client.get(f'/anime/{rng.randint(1, args.titles)}'), args.repeat))
+
+def bench_import(args):
+    engine = prepare_database()
+    seed_animes(engine, 0, 2)
+    seed_watchers(engine, 1, 0, args.watchers)
+    if args.legacy:
+        seed_watchers(engine, 2, args.watchers, args.watchers)
+    from app import app
+    from models import db, User, Episode, EpisodeSource, Notification
+    from werkzeug.security import generate_password_hash
+    app.config['WTF_CSRF_ENABLED'] = False
+    with app.app_context():
+        db.session.add(User(username='bench', password=generate_password_hash('bench'), can_edit=True, can_add_user=True, can_delete=True))
+        db.session.commit()
+    client = app.test_client()
+    client.post('/login', data={'username': 'bench', 'password': 'bench'})
+    hosts = ['vidmoly.to', 'ok.ru', 'drive.google.com', 'sibnet.ru']
+    season = json.dumps([{'number': number, 'sources': [
+        {'url': f'https://{host}/embed/{number}-{i}', 'quality': random.choice(['720p', '1080p'])}
+        for i, host in enumerate(random.sample(hosts, args.sources))]} for number in range(1, args.episodes + 1)]).encode()
+    print(f'{args.episodes} bölüm, {args.episodes * args.sources} kaynak, {len(season) / 1024:.0f} KiB JSON, {args.watchers} izleyici')
+
+    start = time.perf_counter()
+    response = client.post('/import_episodes/1', data={'file': (io.BytesIO(season), 'season.json')}, content_type='multipart/form-data')
+    elapsed = time.perf_counter() - start
+    if response.status_code != 302:
+        raise RuntimeError(f'{response.status_code}: {response.data[:300]}')
+    with app.app_context():
+        episodes = db.session.query(Episode).filter_by(anime_id=1).count()
+        sources = db.session.query(EpisodeSource).count()
+        notified = db.session.query(Notification).filter_by(anime_id=1).count()
+    print(f'toplu içe aktarma: {elapsed * 1000:.0f}ms ({episodes} bölüm, {sources} kaynak, {notified} bildirim)')
+
+    if args.legacy:
+        # Eski yol: her bölüm ayrı bir add_episode isteği, ayrı commit ve izleyici başına bildirim
+        count = min(args.episodes, args.legacy_episodes)
+        start = time.perf_counter()
+        for number in range(1, count + 1):
+            client.post('/add_episode/2', data={'number': number, 'sources': ','.join(f'https://{h}/e/{number}' for h in hosts[:args.sources])})
+        elapsed = time.perf_counter() - start
+        with app.app_context():
+            notified = db.session.query(Notification).filter_by(anime_id=2).count()
+        print(f'tek tek add_episode: {count} bölüm {elapsed * 1000:.0f}ms ({notified} bildirim); '
+              f'{args.episodes} bölüm için tahmini {elapsed / count * args.episodes:.1f}s')
+
+class FakeMirrorHandler(BaseHTTPRequestHandler):
+    # Video kaynağı sunucusu taklidi; davranış sunucu nesnesinde tutulur (bkz. start_fake_mirror)
+    def do_HEAD(self):
+        self._respond(head=True)
+
+    def do_GET(self):
+        self._respond(head=False)
+
+    def _respond(self, head):
+        server = self.server
+        with server.lock:
+            server.active += 1
+            server.peak = max(server.peak, server.active)
+            server.hits += 1
+        try:
+            time.sleep(server.delay)
+            status = 405 if head and server.behavior == 'nohead' else server.status
+            self.send_response(status)
+            self.send_header('Content-Length', '0')
+            self.end_headers()
+        finally:
+            with server.lock:
+                server.active -= 1
+
+    def log_message(self, *args):
+        pass
+
+def start_fake_mirror(behavior, delay=0.0, status=200):
+    server = ThreadingHTTPServer(('127.0.0.1', 0), FakeMirrorHandler)
+    server.daemon_threads = True
+    server.behavior, server.delay, server.status = behavior, delay, status
+    server.lock, server.active, server.peak, server.hits = threading.Lock(), 0, 0, 0
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+def closed_port():
+    sock = socket.socket()
+    sock.bind(('127.0.0.1', 0))
+    port = sock.getsockname()[1]
+    sock.close()
+    return port
+
+def bench_health(args):
+    engine = prepare_database()
+    seed_animes(engine, 0, 1)
+    mirrors = {
+        'fast': start_fake_mirror('fast', delay=0.01),
+        'slow': start_fake_mirror('slow', delay=args.slow),
+        'nohead': start_fake_mirror('nohead', delay=0.05),
+        'notfound': start_fake_mirror('notfound', status=404),
+        'error': start_fake_mirror('error', status=500),
+        'hang': start_fake_mirror('hang', delay=args.timeout * 3),
+    }
+    dead_port = closed_port()
+    url = lambda name, number: f'http://127.0.0.1:{mirrors[name].server_port}/embed/{number}'
+    dead_kinds = ['notfound', 'error', 'hang', 'closed']
+    from models import Episode, EpisodeSource
+    with engine.begin() as conn:
+        conn.execute(Episode.__table__.insert(), [{'anime_id': 1, 'number': n, 'sources': ''} for n in range(1, args.episodes + 1)])
+        rows = []
+        for n in range(1, args.episodes + 1):
+            # Yönetici sırası: yavaş, ölü, HEAD desteklemeyen, hızlı; kontrol sonrası hızlı olan başa gelmeli
+            kind = dead_kinds[n % len(dead_kinds)]
+            dead_url = f'http://127.0.0.1:{dead_port}/embed/{n}' if kind == 'closed' else url(kind, n)
+            for position, source_url in enumerate([url('slow', n), dead_url, url('nohead', n), url('fast', n)]):
+                rows.append({'episode_id': n, 'position': position, 'url': source_url, 'host': '127.0.0.1'})
+        conn.execute(EpisodeSource.__table__.insert(), rows)
+
+    from app import app, source_health
+    from models import db
+    app.config.update(SOURCE_CHECK_CONCURRENCY=args.concurrency, SOURCE_CHECK_PER_HOST=args.per_host,
+                      SOURCE_CHECK_TIMEOUT=args.timeout, SOURCE_CHECK_INTERVAL=0)
+    with app.app_context():
+        for run in range(1, app.config['SOURCE_DEAD_AFTER'] + 1):
+            start = time.perf_counter()
+            checked = source_health.drain()
+            print(f'{run}. tur: {checked} kaynak {time.perf_counter() - start:.2f}s '
+                  f'(en fazla {args.concurrency} eşzamanlı, sunucu başına {args.per_host})')
+        # Zaman aşımına uğrayan isteklerin sunucu tarafındaki işleyicileri bir süre daha uyur; 'hang' için tepe değer yüksek görünür
+        for name, server in mirrors.items():
+            print(f'  {name:<9} istek={server.hits:<5} sunucu tarafı en yüksek eşzamanlı={server.peak}')
+        cost = {'fast': 0.01, 'slow': args.slow, 'nohead': 0.1, 'notfound': 0, 'error': 0, 'hang': args.timeout, 'closed': 0}
+        serial = sum(cost['fast'] + cost['slow'] + cost['nohead'] + cost[dead_kinds[n % len(dead_kinds)]] for n in range(1, args.episodes + 1))
+        print(f'sıralı yoklama tahmini (tur başına): {serial:.0f}s')
+
+        stats = source_health.stats()
+        from sourcehealth import served
+        by_episode = {}
+        for source in EpisodeSource.query:
+            by_episode.setdefault(source.episode_id, []).append(source)
+        first = {episode_id: served(sources)[0].url for episode_id, sources in by_episode.items()}
+        # Yöneticinin girdiği sıra korunur (yavaş kaynak hâlâ position=0)
+        kept = EpisodeSource.query.filter_by(position=0).all()
+        admin_order = sum(1 for source in kept if source.url == url('slow', source.episode_id))
+        fastest_first = sum(1 for n, first_url in first.items() if first_url == url('fast', n))
+        print(f"ölü işaretlenen: {stats['dead']}/{args.episodes} (beklenen {args.episodes}), "
+              f"en hızlı kaynak başta: {fastest_first}/{args.episodes}, yönetici sırası korunan: {admin_order}/{args.episodes}")
+        client = app.test_client()
+        html = client.get('/episode/1').get_data(as_text=True)
+        print('bölüm sayfası ilk kaynak hızlı sunucu:', f'src="{url("fast", 1)}"' in html)
+        if stats['dead'] != args.episodes or fastest_first != args.episodes or admin_order != args.episodes:
+            raise SystemExit(1)
+
+def _db_worker(job):
+    # Ayrı süreçte çalışır (fork); üst süreçten kalan bağlantılar kullanılmaz
+    kind, index, animes, deadline = job
+    from app import app
+    from models import db
+    with app.app_context():
+        for engine in db.engines.values():
+            engine.dispose(close=False)
+    client = app.test_client()
+    rng = random.Random(index)
+    if kind == 'write':
+        client.post('/login', data={'username': f'writer{index}', 'password': 'bench'})
+    samples, errors = [], 0
+    while time.time() < deadline:
+        anime_id = rng.randint(1, animes)
+        start = time.perf_counter()
+        if kind == 'read':
+            response = client.get(f'/anime/{anime_id}')
+        elif rng.random() < 0.5:
+            response = client.post(f'/api/rate/{anime_id}', json={'score': rng.randint(1, 5)})
+        else:
+            response = client.post(f'/api/watchlist/{anime_id}')
+        samples.append((time.perf_counter() - start) * 1000)
+        errors += response.status_code >= 500
+    return kind, samples, errors
+
+def bench_db(args):
+    # Her profil ayrı süreçte ölçülür; motor ve pragmalar uygulama import edilirken kurulur.
+    # Yazarlar ve okuyucular gunicorn worker'ları gibi ayrı süreçlerdir.
+    if args.mode is None:
+        for mode in ('rollback', 'wal'):
+            env = dict(os.environ, DB_SQLITE_TUNING='1' if mode == 'wal' else '0')
+            subprocess.run([sys.executable, os.path.abspath(__file__), 'db', '--mode', mode, '--writers', str(args.writers),
+                            '--readers', str(args.readers), '--seconds', str(args.seconds), '--animes', str(args.animes)], env=env, check=True)
+        return
+    import multiprocessing
+    engine = prepare_database()
+    seed_animes(engine, 0, args.animes)
+    from models import User
+    from werkzeug.security import generate_password_hash
+    password = generate_password_hash('bench', method='pbkdf2:sha256:1000')
+    with engine.begin() as conn:
+        conn.execute(User.__table__.insert(), [{'username': f'writer{i}', 'password': password} for i in range(args.writers)])
+    engine.dispose()
+    from app import app
+    from models import db
+    import database
+    app.config.update(WTF_CSRF_ENABLED=False, CACHE_ENABLED=False)
+    app.logger.disabled = True
+    with app.app_context():
+        journal = database.pragmas(db.engine).get('journal_mode') if app.config['DB_SQLITE_TUNING'] else 'delete (varsayılan)'
+    deadline = time.time() + 2 + args.seconds
+    jobs = [('write', i, args.animes, deadline) for i in range(args.writers)] + [('read', i, args.animes, deadline) for i in range(args.readers)]
+    with multiprocessing.get_context('fork').Pool(len(jobs)) as pool:
+        results = pool.map(_db_worker, jobs)
+    print(f'journal_mode={journal}, {args.writers} yazan + {args.readers} okuyan süreç')
+    for kind, label in (('write', 'yazma (oy/izleme listesi)'), ('read', 'okuma (anime sayfası)')):
+        samples = [ms for result_kind, part, _ in results if result_kind == kind for ms in part]
+        errors = sum(count for result_kind, _, count in results if result_kind == kind)
+        if samples:
+            report(f'  {label}', samples)
+            print(f'  {len(samples) / args.seconds:.0f} istek/sn, {errors} hata (database is locked)')
+
+def bench_audit(args):
+    engine = prepare_database()
+    seed_animes(engine, 0, 100)
+    from app import app
+    from models import db, Anime, Log, User
+    from werkzeug.security import generate_password_hash
+    import audit
+    app.config.update(WTF_CSRF_ENABLED=False, MAL_WORKER_ENABLED=False)
+    with app.app_context():
+        db.session.add(User(username='bench', password=generate_password_hash('bench'), can_edit=True, can_add_user=True, can_delete=True))
+        db.session.commit()
+    client = app.test_client()
+    client.post('/login', data={'username': 'bench', 'password': 'bench'})
+
+    # Değişiklik + log: eski yol log için ikinci bir commit yapıyordu
+    def edit(separate):
+        def run():
+            anime = db.session.get(Anime, random.randint(1, 100))
+            anime.description = random_text(30)
+            if separate:
+                db.session.commit()
+            db.session.add(Log(action='update', description=f'Anime "{anime.name}" düzenlendi.', user_id=1))
+            db.session.commit()
+        return run
+    with app.app_context():
+        report('değişiklik + ayrı log commit (eski)', timed(edit(True), args.repeat))
+        report('değişiklik + log tek transaction', timed(edit(False), args.repeat))
+    form = {'name': 'Bench', 'description': 'x', 'cover_image': 'https://example.com/c.jpg', 'status': 'Bitti', 'anime_type': 'TV'}
+    report('POST /edit_anime', timed(lambda: client.post(f'/edit_anime/{random.randint(1, 100)}', data=dict(form, description=random_text(30))), args.repeat))
+
+    # Son iki yıla yayılmış log geçmişi; id'ler zamanla artar
+    now = datetime.utcnow()
+    span = timedelta(days=730)
+    for start in range(0, args.logs, 50000):
+        count = min(50000, args.logs - start)
+        with engine.begin() as conn:
+            conn.execute(Log.__table__.insert(), [{
+                'action': 'update', 'description': f'Anime "{i}" düzenlendi.', 'user_id': 1, 'target_type': 'anime',
+                'target_id': i % 100 + 1, 'changes': json.dumps({'description': ['eski', 'yeni']}),
+                'timestamp': now - span + span * (i / args.logs)} for i in range(start, start + count)])
+    with app.app_context():
+        def logs_page():
+            db.session.execute(db.select(db.func.count(Log.id))).scalar()
+            client.get('/logs')
+        report(f'/logs + sayım ({args.logs} log)', timed(logs_page, 20))
+        start = time.perf_counter()
+        archived = audit.archive(args.days)
+        elapsed = time.perf_counter() - start
+        remaining = Log.query.count()
+        print(f'arşivleme: {archived} log {elapsed:.1f}s ({archived / max(elapsed, 1e-9):.0f} satır/sn), '
+              f'{len(audit.archive_months())} ay, log tablosunda {remaining} satır kaldı')
+        report(f'/logs + sayım ({remaining} log)', timed(logs_page, 20))
+
+COLD_START_SCRIPT = """
+import json, sys, time
+started = time.perf_counter()
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+statements = []
+event.listen(Engine, 'before_cursor_execute', lambda *args: statements.append(1))
+from app import app
+imported = time.perf_counter()
+import_statements = len(statements)
+response = app.test_client().get('/')
+answered = time.perf_counter()
+print(json.dumps({'import_ms': (imported - started) * 1000, 'first_response_ms': (answered - imported) * 1000,
+                  'total_ms': (answered - started) * 1000, 'status': response.status_code,
+                  'import_queries': import_statements, 'first_response_queries': len(statements) - import_statements,
+                  'requests_loaded': 'requests' in sys.modules}))
+"""
+
+def bench_coldstart(args):
+    # Her ölçüm yeni bir Python sürecidir (Vercel soğuk açılışı gibi): import + ilk istek
+    engine = prepare_database()
+    seed_animes(engine, 0, args.animes)
+    from sqlalchemy import text
+
+    def run(**env):
+        result = subprocess.run([sys.executable, '-c', COLD_START_SCRIPT], cwd=os.path.dirname(os.path.abspath(__file__)),
+                                env=dict(os.environ, **env), capture_output=True, text=True, check=True)
+        sample = json.loads(result.stdout.strip().splitlines()[-1])
+        if sample['status'] != 200:
+            raise RuntimeError(f"ana sayfa {sample['status']} döndü")
+        return sample
+
+    def summary(label, samples):
+        for key in ('import_ms', 'first_response_ms', 'total_ms'):
+            report(f'{label} {key}', [sample[key] for sample in samples])
+        # Sorgu sayısı gürültüsüzdür; uzak veritabanında her biri bir gidiş-dönüştür
+        print(f"{label:<40} sorgu: import={samples[-1]['import_queries']} ilk yanıt={samples[-1]['first_response_queries']}")
+        result = {key: {'p50': statistics.median(sample[key] for sample in samples),
+                        'p95': percentile([sample[key] for sample in samples], 95)} for key in ('import_ms', 'first_response_ms', 'total_ms')}
+        result.update(import_queries=samples[-1]['import_queries'], first_response_queries=samples[-1]['first_response_queries'])
+        return result
+
+    # Depodaki ilk sürüm veritabanının bir kopyasıyla açılış: eski şemadan yükseltme ana sayfayı bozmamalı
+    shipped = os.path.join(os.path.dirname(engine.url.database), 'shipped.db')
+    shutil.copyfile(os.path.join(os.path.dirname(os.path.abspath(__file__)), 'instance', 'anime_site.db'), shipped)
+    upgraded = run(DATABASE_URL=f'sqlite:///{shipped}')
+    print(f"instance/anime_site.db kopyası (eski şemadan yükseltme): ana sayfa {upgraded['status']}, "
+          f"ilk yanıt={upgraded['first_response_ms']:.0f}ms")
+
+    first = run()
+    print(f"ilk açılış (şema hazırlanır): import={first['import_ms']:.0f}ms ilk yanıt={first['first_response_ms']:.0f}ms "
+          f"({first['first_response_queries']} sorgu), requests yüklü: {first['requests_loaded']}")
+    results = {'animes': args.animes, 'repeat': args.repeat, 'first_start': first,
+               'stamped': summary('şema damgası güncel', [run() for _ in range(args.repeat)]),
+               'no_upgrade': summary('DB_AUTO_UPGRADE=0', [run(DB_AUTO_UPGRADE='0') for _ in range(args.repeat)])}
+    if args.legacy:
+        # Eski davranış: her açılışta tüm ensure_*/revizyon adımları (damga silinerek zorlanır)
+        def legacy():
+            with engine.begin() as conn:
+                conn.execute(text("DELETE FROM schema_migration WHERE revision LIKE 'schema:%'"))
+            return run()
+        results['full_check'] = summary('her açılışta tam şema kontrolü', [legacy() for _ in range(args.repeat)])
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(results, f, indent=2)
+        print(f'sonuçlar {args.output} dosyasına yazıldı')
+
+def bench_genres(args):
+    engine = prepare_database()
+    seed_animes(engine, 0, args.animes)
+    from models import Genre, anime_genres
+    with engine.begin() as conn:
+        conn.execute(Genre.__table__.insert(), [{'name': name} for name in ['Editörün Seçimi', 'Hero Section']] +
+                     [{'name': f'Tür {i}'} for i in range(args.genres)])
+        # Vitrin türleri katalogdaki son eklenenlerden bir avuç animede, diğer türler rastgele
+        rows = [{'anime_id': anime_id, 'genre_id': genre_id} for genre_id in (1, 2)
+                for anime_id in random.sample(range(args.animes // 2, args.animes + 1), 12)]
+        rows += [{'anime_id': anime_id, 'genre_id': genre_id} for anime_id in range(1, args.animes + 1)
+                 for genre_id in random.sample(range(3, args.genres + 3), 3)]
+        conn.execute(anime_genres.insert(), rows)
+    from app import app, page_cache, shelf_query
+    from models import db, Anime
+    from shelves import animes_in_order
+    import genres
+    with app.app_context():
+        for name in ('Hero Section', 'Editörün Seçimi'):
+            # Eski yol: her raf için ilişkili EXISTS alt sorgusu
+            report(f'EXISTS rafı {name!r}', timed(lambda: shelf_query().filter(Anime.genres.any(Genre.name == name)).limit(6).all(), args.repeat))
+            page_cache.enabled = False
+            report(f'sıralı id listesi (önbelleksiz) {name!r}', timed(lambda: animes_in_order(shelf_query(), genres.curated_ids(name, 6)), args.repeat))
+            page_cache.enabled = True
+            report(f'sıralı id listesi (önbellekli) {name!r}', timed(lambda: animes_in_order(shelf_query(), genres.curated_ids(name, 6)), args.repeat))
+        report('tür seçenekleri: sorgu (eski)', timed(lambda: [(str(g.id), g.name) for g in Genre.query.filter(
+            Genre.name.notin_(['Editörün Seçimi', 'Hero Section'])).order_by('name').all()], args.repeat))
+        report('tür seçenekleri: kayıt defteri', timed(lambda: genres.registry().choices(include_special=False), args.repeat))
+        db.session.remove()
+
+class CoverHandler(BaseHTTPRequestHandler):
+    def do_GET(self):
+        data = self.server.images.get(self.path)
+        self.send_response(200 if data else 404)
+        self.send_header('Content-Type', 'image/jpeg')
+        self.send_header('Content-Length', str(len(data or b'')))
+        self.end_headers()
+        self.wfile.write(data or b'')
+
+    def log_message(self, *args):
+        pass
+
+def bench_covers(args):
+    from PIL import Image, ImageDraw
+    # Tipik kaynak kapak: büyük, yüksek kaliteli JPEG (gürültülü gradyan; düz renk gerçekçi olmayacak kadar iyi sıkışır)
+    images = {}
+    for i in range(args.covers):
+        image = Image.effect_noise((args.width, args.width * 3 // 2), 40).convert('RGB')
+        ImageDraw.Draw(image).rectangle((i * 7 % args.width, 0, args.width, args.width), fill=(i * 40 % 256, 90, 160))
+        buffer = io.BytesIO()
+        image.save(buffer, 'JPEG', quality=92)
+        images[f'/covers/{i}.jpg'] = buffer.getvalue()
+    server = ThreadingHTTPServer(('127.0.0.1', 0), CoverHandler)
+    server.daemon_threads = True
+    server.images = images
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    print(f'{args.covers} kapak, ortalama {statistics.mean(map(len, images.values())) / 1024:.0f} KB ({args.width}px genişlik)')
+
+    engine = prepare_database()
+    seed_animes(engine, 0, args.covers)
+    from models import Anime
+    with engine.begin() as conn:
+        for i in range(args.covers):
+            conn.execute(Anime.__table__.update().where(Anime.__table__.c.id == i + 1).values(
+                cover_image=f'http://127.0.0.1:{server.server_port}/covers/{i}.jpg'))
+    from app import app, cover_pipeline, page_cache
+    from models import db, CoverImage
+    app.config.update(COVER_DIR=tempfile.mkdtemp(prefix='anime-covers-'), COVER_WORKER_ENABLED=False)
+    client = app.test_client()
+
+    def page_weight():
+        html = client.get('/animes').get_data(as_text=True)
+        # Tarayıcının 200px kart ve 2x ekranda seçeceği dosya: ilk <source>'un 480w adayı, yoksa orijinal
+        total = 0
+        for card in re.findall(r'<picture>(.*?)</picture>', html, re.S):
+            variant = re.search(r'(/covers/\S+) 480w', card)
+            if variant:
+                total += len(client.get(variant.group(1)).data)
+            else:
+                total += len(images[urlparse(re.search(r'<img src="([^"]+)"', card).group(1)).path])
+        return total, html.count('<picture>')
+
+    before, cards = page_weight()
+    print(f'/animes görsel ağırlığı (önce): {before / 1024:8.0f} KB ({cards} kart, orijinal JPEG)')
+    for workers in args.workers:
+        app.config['COVER_WORKERS'] = workers
+        with app.app_context():
+            db.session.execute(CoverImage.__table__.delete())
+            db.session.execute(Anime.__table__.update().values(cover_digest=None))
+            db.session.commit()
+            for name in os.listdir(app.config['COVER_DIR']):
+                shutil.rmtree(os.path.join(app.config['COVER_DIR'], name))
+            cover_pipeline.enqueue_missing()
+            start = time.perf_counter()
+            processed = cover_pipeline.drain()
+            elapsed = time.perf_counter() - start
+            cover_pipeline.stop()
+            stats = cover_pipeline.stats()
+            print(f"süreç havuzu={workers}: {processed} kapak {elapsed:.2f}s ({processed / elapsed:.1f} kapak/s), "
+                  f"hazır={stats.get('ready', 0)} başarısız={stats.get('failed', 0)}, biçimler={','.join(cover_pipeline.formats)}")
+            db.session.remove()
+    page_cache.invalidate('catalog')
+    after, cards = page_weight()
+    print(f'/animes görsel ağırlığı (sonra): {after / 1024:8.0f} KB ({cards} kart, 480w {cover_pipeline.formats[0]}) '
+          f'-> %{100 * (1 - after / before):.1f} daha az')
+    server.shutdown()
+
+def bench_http(args):
+    # Yanıt boyutları ve koşullu GET; 304 dönmeyen bir uç varsa çıkış kodu 1'dir (CI kontrolü)
+    engine = prepare_database()
+    seed_animes(engine, 0, 50)
+    from models import Episode, Notification, User
+    from werkzeug.security import generate_password_hash
+    with engine.begin() as conn:
+        conn.execute(Episode.__table__.insert(), [{'anime_id': 1, 'number': n} for n in range(1, args.episodes + 1)])
+        conn.execute(User.__table__.insert(), [{'username': 'bench', 'password': generate_password_hash('bench'),
+                                                'can_delete': False, 'can_edit': False, 'can_add_user': False}])
+        conn.execute(Notification.__table__.insert(), [{'user_id': 1, 'message': f'{random_text(8)} {i}. bölüm yayınlandı',
+                                                        'timestamp': datetime.utcnow(), 'is_read': False, 'anime_id': 1}
+                                                       for i in range(args.notifications)])
+    from app import app
+    app.config.update(WTF_CSRF_ENABLED=False, ASSET_BUILD_DIR=tempfile.mkdtemp(prefix='anime-assets-'))
+    client = app.test_client()
+    failures = []
+    compressed = {'Accept-Encoding': 'gzip, br'}
+
+    def sizes(label, url, **kwargs):
+        plain = client.get(url, **kwargs)
+        packed = client.get(url, headers=compressed, **kwargs)
+        print(f'{label:<40} {len(plain.data) / 1024:8.1f} KB -> {len(packed.data) / 1024:7.1f} KB '
+              f"({packed.headers.get('Content-Encoding', 'sıkıştırılmamış')}, Cache-Control: {packed.headers.get('Cache-Control')})")
+        return packed
+
+    def revalidation(label, url):
+        first = client.get(url)
+        etag = first.headers.get('ETag')
+        second = client.get(url, headers={'If-None-Match': etag}) if etag else first
+        if second.status_code != 304:
+            failures.append(label)
+        report(f'{label} 200', timed(lambda: client.get(url), args.repeat))
+        report(f'{label} 304 (If-None-Match)', timed(lambda: client.get(url, headers={'If-None-Match': etag}), args.repeat))
+        print(f'  ETag={etag} -> {second.status_code}')
+
+    html = client.get('/').get_data(as_text=True)
+    for filename in dict.fromkeys(re.findall(r'(/static/[^"]+)"', html)):
+        response = sizes(filename, filename)
+        if 'immutable' not in (response.headers.get('Cache-Control') or ''):
+            failures.append(f'{filename} immutable')
+    sizes('/anime/1 (HTML)', '/anime/1')
+    revalidation('/anime/1', '/anime/1')
+    revalidation('/episode/1', '/episode/1')
+    client.post('/login', data={'username': 'bench', 'password': 'bench'})
+    client.get('/')
+    sizes(f'/api/notifications ({args.notifications})', '/api/notifications?limit=50')
+    revalidation('/api/notifications', '/api/notifications')
+    if failures:
+        print('BAŞARISIZ:', ', '.join(failures))
+        raise SystemExit(1)
+
+def bench_metrics(args):
+    # Ölçümün kendi maliyeti (METRICS_ENABLED açık/kapalı) ve route başına sorgu sayıları
+    engine = prepare_database()
+    seed_animes(engine, 0, args.animes)
+    from models import Episode
+    with engine.begin() as conn:
+        conn.execute(Episode.__table__.insert(), [{'anime_id': 1, 'number': n} for n in range(1, 25)])
+    from app import app, metrics, page_cache
+    client = app.test_client()
+    urls = ['/', '/animes', '/animes?sort_by=rating_desc', '/anime/1', '/episode/1', '/support']
+    page_cache.enabled = False
+    for enabled in (False, True):
+        app.config['METRICS_ENABLED'] = enabled
+        for url in urls:
+            client.get(url)
+        report(f"{len(urls)} sayfa, ölçüm {'açık' if enabled else 'kapalı'}", timed(lambda: [client.get(url) for url in urls], args.repeat))
+    page_cache.enabled = True
+    print(f"{'endpoint':<14} {'istek':>6} {'sorgu/istek':>12} {'SQL ms/istek':>13} {'toplam ms/istek':>16}")
+    for (endpoint,), (_, total_statements, count) in sorted(metrics.statements._series.items()):
+        db_total = metrics.db_time._series[(endpoint,)][1]
+        latency = sum(total for (name, _), (_, total, _) in metrics.latency._series.items() if name == endpoint)
+        print(f'{endpoint:<14} {count:>6} {total_statements / count:>12.1f} {db_total / count * 1000:>13.2f} {latency / count * 1000:>16.2f}')
+
+SEED_CHUNK_SIZE = 50000
+
+def insert_chunks(conn, table, rows):
+    # Büyük ölçeklerde bellek sınırlı kalsın diye satırlar parça parça executemany ile yazılır
+    chunk = []
+    for row in rows:
+        chunk.append(row)
+        if len(chunk) == SEED_CHUNK_SIZE:
+            conn.execute(table.insert(), chunk)
+            chunk = []
+    if chunk:
+        conn.execute(table.insert(), chunk)
+
+def seed_dataset(engine, titles, ratings, users, episodes, notifications, logs, seed=42):
+    # Aynı tohumla her çalıştırmada aynı veri üretilir (commit'ler arası karşılaştırma için).
+    # Puan toplamları (rating_sum/count/average) oylardan hesaplanır; mutabakat kontrolü hata vermez.
+    from models import SPECIAL_GENRES, Anime, Episode, Genre, Log, Notification, Rating, User, anime_genres, watchlist
+    from werkzeug.security import generate_password_hash
+    random.seed(seed)
+    rng = random.Random(seed)
+    genre_count = 40
+    password = generate_password_hash('bench', method='pbkdf2:sha256:1000')
+    seed_animes(engine, 0, titles)
+    with engine.begin() as conn:
+        conn.execute(Genre.__table__.insert(), [{'name': name} for name in SPECIAL_GENRES] + [{'name': f'Tür {i}'} for i in range(genre_count)])
+        special = len(SPECIAL_GENRES)
+        insert_chunks(conn, anime_genres, ({'anime_id': anime_id, 'genre_id': genre_id} for anime_id in range(1, titles + 1)
+                                           for genre_id in rng.sample(range(special + 1, special + genre_count + 1), 3)))
+        conn.execute(anime_genres.insert(), [{'anime_id': anime_id, 'genre_id': genre_id} for genre_id in range(1, special + 1)
+                                             for anime_id in rng.sample(range(1, titles + 1), min(12, titles))])
+        insert_chunks(conn, Episode.__table__, ({'anime_id': anime_id, 'number': number}
+                                                for anime_id in range(1, titles + 1) for number in range(1, episodes + 1)))
+        insert_chunks(conn, User.__table__, ({'username': f'user{i}', 'password': password} for i in range(1, users + 1)))
+        # Popülerlik çarpık dağılır: düşük id'li animeler çok daha fazla oy ve izleyici alır
+        popular = lambda: min(titles, int(titles * rng.random() ** 2) + 1)
+        votes = {}
+        per_user = max(1, ratings // users)
+        for user_id in range(1, users + 1):
+            if len(votes) >= ratings:
+                break
+            for anime_id in {popular() for _ in range(min(per_user, titles))}:
+                votes[(user_id, anime_id)] = rng.randint(1, 5)
+        insert_chunks(conn, Rating.__table__, ({'user_id': u, 'anime_id': a, 'score': score} for (u, a), score in votes.items()))
+        totals = {}
+        for (_, anime_id), score in votes.items():
+            total, count = totals.get(anime_id, (0, 0))
+            totals[anime_id] = (total + score, count + 1)
+        conn.execute(Anime.__table__.update().values(rating_sum=0, rating_count=0, average_rating=0.0))
+        from sqlalchemy import bindparam
+        table = Anime.__table__
+        conn.execute(table.update().where(table.c.id == bindparam('anime_id')).values(
+            rating_sum=bindparam('rating_sum'), rating_count=bindparam('rating_count'), average_rating=bindparam('average_rating')),
+            [{'anime_id': anime_id, 'rating_sum': total, 'rating_count': count, 'average_rating': total / count}
+             for anime_id, (total, count) in totals.items()])
+        insert_chunks(conn, watchlist, ({'user_id': user_id, 'anime_id': anime_id} for user_id in range(1, users + 1)
+                                        for anime_id in {popular() for _ in range(min(10, titles))}))
+        now = datetime.utcnow()
+        insert_chunks(conn, Notification.__table__, ({'user_id': user_id, 'anime_id': popular(), 'is_read': n > 2,
+                                                      'message': f'Yeni bölüm yayınlandı ({n})', 'timestamp': now - timedelta(hours=n)}
+                                                     for user_id in range(1, users + 1) for n in range(notifications)))
+        insert_chunks(conn, Log.__table__, ({'action': 'update', 'description': f'Anime {i % titles + 1} düzenlendi.', 'user_id': 1,
+                                             'target_type': 'anime', 'target_id': i % titles + 1, 'timestamp': now - timedelta(minutes=i)}
+                                            for i in range(logs)))
+    return len(votes)
+
+LOAD_SERVER_SCRIPT = """
+import sys
+from werkzeug.serving import make_server
+from app import app
+app.config.update(WTF_CSRF_ENABLED=False, MAL_WORKER_ENABLED=False, COVER_WORKER_ENABLED=False)
+server = make_server('127.0.0.1', int(sys.argv[1]), app, threaded=True)
+print('ready', flush=True)
+server.serve_forever()
+"""
+
+def animes_scenarios(sample_name):
+    # animes() route'unun her filtre/sıralama birleşimi; ad aramasında relevance sıralaması da denenir
+    filters = {'': {}, 'genre': {'genre': 3}, 'year': {'release_year': 2010}, 'type': {'anime_type': 'TV'},
+               'genre+year+type': {'genre': 3, 'release_year': 2010, 'anime_type': 'TV'}, 'query': {'query': sample_name}}
+    scenarios = []
+    for filter_name, params in filters.items():
+        sorts = ['name_asc', 'name_desc', 'rating_desc', 'year_desc', 'top_rated', 'trending'] + (['relevance'] if 'query' in params else [])
+        for sort in sorts:
+            scenarios.append((f"animes[{filter_name or 'hepsi'}|{sort}]", dict(params, sort_by=sort)))
+    return scenarios
+
+def run_load(base_url, args, titles, episodes_total, users, sample_name):
+    import requests
+    scenarios = animes_scenarios(sample_name)
+    public = [('index', 15), ('animes', 25), ('anime', 20), ('episode', 15)]
+    private = public + [('rate_anime', 8), ('toggle_watchlist', 7), ('get_notifications', 10)]
+    samples = {}
+    errors = {}
+    lock = threading.Lock()
+    deadline = time.monotonic() + args.duration
+
+    def client(index):
+        rng = random.Random(index)
+        session = requests.Session()
+        routes = public
+        if index < args.clients * args.auth_ratio:
+            session.post(f'{base_url}/login', data={'username': f'user{index + 1}', 'password': 'bench'}, allow_redirects=False)
+            routes = private
+        names, weights = zip(*routes)
+        local, failed = {}, {}
+        while time.monotonic() < deadline:
+            route = rng.choices(names, weights)[0]
+            anime_id = min(titles, int(titles * rng.random() ** 2) + 1)
+            label, method, url, kwargs = route, 'GET', None, {}
+            if route == 'index':
+                url = '/'
+            elif route == 'animes':
+                label, params = rng.choice(scenarios)
+                url, kwargs = '/animes', {'params': params}
+            elif route == 'anime':
+                url = f'/anime/{anime_id}'
+            elif route == 'episode':
+                url = f'/episode/{rng.randint(1, episodes_total)}'
+            elif route == 'rate_anime':
+                method, url, kwargs = 'POST', f'/api/rate/{anime_id}', {'json': {'score': rng.randint(1, 5)}}
+            elif route == 'toggle_watchlist':
+                method, url = 'POST', f'/api/watchlist/{anime_id}'
+            else:
+                url = '/api/notifications'
+            start = time.perf_counter()
+            try:
+                response = session.request(method, base_url + url, timeout=60, allow_redirects=False, **kwargs)
+                ok = response.status_code < 400
+            except requests.RequestException:
+                ok = False
+            local.setdefault(label, []).append((time.perf_counter() - start) * 1000)
+            if not ok:
+                failed[label] = failed.get(label, 0) + 1
+        with lock:
+            for label, values in local.items():
+                samples.setdefault(label, []).extend(values)
+            for label, count in failed.items():
+                errors[label] = errors.get(label, 0) + count
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=args.clients) as pool:
+        list(pool.map(client, range(args.clients)))
+    elapsed = time.perf_counter() - start
+
+    def summarize(values, failures):
+        return {'count': len(values), 'errors': failures, 'p50_ms': round(percentile(values, 50), 2), 'p95_ms': round(percentile(values, 95), 2),
+                'p99_ms': round(percentile(values, 99), 2), 'throughput_rps': round(len(values) / elapsed, 2)}
+
+    routes = {label: summarize(values, errors.get(label, 0)) for label, values in sorted(samples.items())}
+    # animes satırları ayrıca tek bir route olarak toplanır
+    grouped = [value for label, values in samples.items() if label.startswith('animes[') for value in values]
+    if grouped:
+        routes['animes'] = summarize(grouped, sum(count for label, count in errors.items() if label.startswith('animes[')))
+    everything = [value for values in samples.values() for value in values]
+    return {'elapsed_s': round(elapsed, 2), 'routes': routes, 'total': summarize(everything, sum(errors.values()))}
+
+def git_commit():
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], cwd=os.path.dirname(os.path.abspath(__file__)),
+                              capture_output=True, text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+def bench_load(args):
+    # Her ölçek için yeni bir veritabanı tohumlanır, uygulama ayrı süreçte (çok thread'li werkzeug sunucusu)
+    # başlatılır ve eşzamanlı istemciler karışık trafikle --duration saniye boyunca istek gönderir.
+    results = {'commit': git_commit(), 'created_at': datetime.utcnow().isoformat(timespec='seconds'),
+               'clients': args.clients, 'duration_s': args.duration, 'auth_ratio': args.auth_ratio, 'seed': args.seed, 'scales': []}
+    for titles in args.titles:
+        ratings = args.ratings if args.ratings is not None else min(titles * 10, 1000000)
+        users = args.users or max(args.clients, min(ratings // 50, 20000))
+        engine = prepare_database()
+        start = time.perf_counter()
+        votes = seed_dataset(engine, titles, ratings, users, args.episodes, args.notifications, args.logs, args.seed)
+        seeded = time.perf_counter() - start
+        episodes_total = titles * args.episodes
+        print(f'{titles} anime, {episodes_total} bölüm, {users} kullanıcı, {votes} oy tohumlandı ({seeded:.1f}s)')
+        with engine.connect() as conn:
+            from sqlalchemy import text
+            sample_name = conn.execute(text('SELECT name FROM anime WHERE id = 1')).scalar().split()[0]
+        engine.dispose()
+
+        port = closed_port()
+        server = subprocess.Popen([sys.executable, '-c', LOAD_SERVER_SCRIPT, str(port)], cwd=os.path.dirname(os.path.abspath(__file__)),
+                                  env=dict(os.environ), stdout=subprocess.PIPE, stderr=subprocess.DEVNULL, text=True)
+        try:
+            server.stdout.readline()
+            import requests
+            base_url = f'http://127.0.0.1:{port}'
+            # İlk istek şemayı hazırlar (arama indeksi vb.); ölçüme dahil edilmez
+            start = time.perf_counter()
+            requests.get(base_url + '/', timeout=1800)
+            print(f'  ilk istek (şema hazırlığı): {time.perf_counter() - start:.1f}s')
+            result = run_load(base_url, args, titles, episodes_total, users, sample_name)
+        finally:
+            server.terminate()
+            server.wait()
+        result.update(titles=titles, episodes=episodes_total, users=users, ratings=votes, seed_s=round(seeded, 1))
+        results['scales'].append(result)
+        print(f"  {'route':<36} {'n':>6} {'hata':>5} {'p50':>8} {'p95':>8} {'p99':>8} {'istek/sn':>9}")
+        for label, row in list(result['routes'].items()) + [('TOPLAM', result['total'])]:
+            if label.startswith('animes[') and not args.verbose:
+                continue
+            print(f"  {label:<36} {row['count']:>6} {row['errors']:>5} {row['p50_ms']:>8.1f} {row['p95_ms']:>8.1f} "
+                  f"{row['p99_ms']:>8.1f} {row['throughput_rps']:>9.1f}")
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(results, f, indent=2, ensure_ascii=False)
+        print(f'sonuçlar {args.output} dosyasına yazıldı')
+
+def seed_views(engine, titles, count, days=7, seed=42):
+    # Son günlere yayılmış, popülerliği çarpık bölüm görüntülemeleri
+    from models import WatchEvent
+    rng = random.Random(seed)
+    now = datetime.utcnow()
+    with engine.begin() as conn:
+        insert_chunks(conn, WatchEvent.__table__, ({'owner': f'v:{rng.randrange(count // 5 + 1)}', 'anime_id': min(titles, int(titles * rng.random() ** 3) + 1),
+                                                    'created_at': now - timedelta(seconds=rng.randrange(days * 86400))} for _ in range(count)))
+
+def bench_leaderboards(args):
+    # Sıralama tablosunun tam ve artımlı güncelleme süresi, keşfet sayfasındaki sıralamaların sorgu planı ve süresi
+    engine = prepare_database()
+    seed_dataset(engine, args.titles, args.ratings, max(1000, args.ratings // 50), 1, 0, 0)
+    seed_views(engine, args.titles, args.views)
+    from app import app, leaderboard, page_cache
+    from models import db, Anime, AnimeScore, TrendEvent
+    from sqlalchemy import text
+    app.config.update(LEADERBOARD_WORKER_ENABLED=False, WATCH_HISTORY_WORKER_ENABLED=False)
+    with app.app_context():
+        start = time.perf_counter()
+        updated = leaderboard.refresh()
+        print(f'ilk hesaplama: {updated} satır, {args.views} görüntüleme {time.perf_counter() - start:.2f}s')
+        rng = random.Random(1)
+        now = datetime.utcnow()
+        db.session.execute(TrendEvent.__table__.insert(), [{'anime_id': rng.randint(1, args.titles), 'kind': rng.choice(['rating', 'watchlist']),
+                                                           'weight': 2.0, 'created_at': now} for _ in range(args.events)])
+        db.session.commit()
+        start = time.perf_counter()
+        updated = leaderboard.refresh()
+        print(f'artımlı güncelleme: {args.events} olay, {updated} satır {(time.perf_counter() - start) * 1000:.0f}ms')
+        start = time.perf_counter()
+        leaderboard.rebuild()
+        print(f'yeniden hesaplama (rebuild): {time.perf_counter() - start:.2f}s')
+
+        def top(column, label):
+            rows = db.session.query(Anime.id, Anime.average_rating, Anime.rating_count).join(AnimeScore, AnimeScore.anime_id == Anime.id).order_by(
+                column.desc(), Anime.id.desc()).limit(5).all() if column is not Anime.average_rating else db.session.query(
+                Anime.id, Anime.average_rating, Anime.rating_count).order_by(Anime.average_rating.desc(), Anime.id.desc()).limit(5).all()
+            print(f'  {label:<12} ' + ', '.join(f'#{row.id} ({row.average_rating:.2f}, {row.rating_count} oy)' for row in rows))
+        print('ilk 5:')
+        top(Anime.average_rating, 'rating_desc')
+        top(AnimeScore.bayesian, 'top_rated')
+        top(AnimeScore.trending, 'trending')
+        for sort, column in (('top_rated', 'bayesian'), ('trending', 'trending')):
+            plan = db.session.execute(text(f'EXPLAIN QUERY PLAN SELECT anime.id FROM anime JOIN anime_score ON anime_score.anime_id = anime.id '
+                                           f'ORDER BY anime_score.{column} DESC, anime_score.anime_id DESC LIMIT 19')).all()
+            print(f'  {sort} planı: ' + ' | '.join(row[-1] for row in plan))
+    client = app.test_client()
+    page_cache.enabled = False
+    for sort in ('rating_desc', 'top_rated', 'trending'):
+        for query in ('', '&anime_type=TV'):
+            url = f'/animes?sort_by={sort}{query}'
+            client.get(url)
+            report(url, timed(lambda: client.get(url), args.repeat))
+    client.get('/')
+    report('/ (önbelleksiz, trend ve en beğenilen rafları dahil)', timed(lambda: client.get('/'), args.repeat))
+    page_cache.enabled = True
+
+EXPORT_SCRIPT = """
+import json, os, resource, sys, threading, time
+from app import app
+app.config.update(LEADERBOARD_WORKER_ENABLED=False, WATCH_HISTORY_WORKER_ENABLED=False, MAL_WORKER_ENABLED=False, COVER_WORKER_ENABLED=False,
+                  EXPORT_DIR=os.environ['BENCH_EXPORT_DIR'])
+mode = sys.argv[1]
+client = app.test_client()
+client.get('/robots.txt')
+
+def anonymous_rss():
+    # Dosyaya eşlenmiş sayfalar (SQLite mmap_size) hariç bellek; ru_maxrss bunları da sayar
+    with open('/proc/self/status') as f:
+        return next(int(line.split()[1]) for line in f if line.startswith('RssAnon:')) / 1024
+
+anonymous = {'before': anonymous_rss(), 'peak': 0.0}
+done = threading.Event()
+
+def sample():
+    while not done.wait(0.02):
+        anonymous['peak'] = max(anonymous['peak'], anonymous_rss())
+
+threading.Thread(target=sample, daemon=True).start()
+before = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+start = time.perf_counter()
+size = lines = 0
+
+def download(url, headers=None):
+    global size, lines
+    response = client.get(url, headers=headers or {}, buffered=False)
+    for chunk in response.response:
+        size += len(chunk)
+        if not headers:
+            lines += chunk.count(b'\\n')
+    response.close()
+
+if mode == 'naive':
+    # Karşılaştırma: tüm satırlar önce belleğe alınır, sonra yazılır
+    from sqlalchemy import select
+    from models import db, Anime, Episode
+    with app.app_context():
+        rows = [dict(row._mapping) for row in db.session.execute(select(Anime.id, Anime.name, Anime.description, Anime.updated_at)).all()]
+        rows += [dict(row._mapping) for row in db.session.execute(select(Episode.id, Episode.anime_id, Episode.number, Episode.updated_at)).all()]
+        body = ''.join(json.dumps(row, default=str) + '\\n' for row in rows).encode()
+    size, lines = len(body), len(rows)
+elif mode == 'ndjson':
+    download('/export/catalog.ndjson')
+elif mode == 'ndjson-gzip':
+    download('/export/catalog.ndjson', {'Accept-Encoding': 'gzip'})
+elif mode == 'sitemap':
+    import re
+    response = client.get('/sitemap.xml')
+    for loc in re.findall(r'<loc>([^<]+)</loc>', response.get_data(as_text=True)):
+        download(loc.replace('http://localhost', ''))
+elif mode == 'build':
+    result = app.test_cli_runner().invoke(args=['build-export', '--base-url', 'http://localhost'])
+    if result.exception:
+        raise result.exception
+    size = sum(os.path.getsize(os.path.join(root, name)) for root, _, names in os.walk(app.config['EXPORT_DIR']) for name in names)
+    lines = result.output.count(' KB ->')
+seconds = time.perf_counter() - start
+done.set()
+anonymous['peak'] = max(anonymous['peak'], anonymous_rss())
+peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+print(json.dumps({'seconds': seconds, 'bytes': size, 'lines': lines, 'rss_before_mb': before / 1024, 'rss_peak_mb': peak / 1024,
+                  'anon_before_mb': anonymous['before'], 'anon_peak_mb': anonymous['peak']}))
+"""
+
+def bench_export(args):
+    # Her mod ayrı bir süreçte çalışır; tepe bellek (ru_maxrss) o sürecin açılıştan sonraki artışıdır
+    engine = prepare_database()
+    from models import Episode, Genre, anime_genres
+    start = time.perf_counter()
+    seed_animes(engine, 0, args.titles)
+    rng = random.Random(42)
+    per_title, extra = divmod(args.episodes, args.titles)
+    with engine.begin() as conn:
+        conn.execute(Genre.__table__.insert(), [{'name': f'Tür {i}'} for i in range(40)])
+        insert_chunks(conn, anime_genres, ({'anime_id': anime_id, 'genre_id': genre_id} for anime_id in range(1, args.titles + 1)
+                                           for genre_id in rng.sample(range(1, 41), 3)))
+        insert_chunks(conn, Episode.__table__, ({'anime_id': anime_id, 'number': number} for anime_id in range(1, args.titles + 1)
+                                                for number in range(1, per_title + (anime_id <= extra) + 1)))
+    print(f'{args.titles} anime, {args.episodes} bölüm tohumlandı ({time.perf_counter() - start:.0f}s)')
+    export_dir = tempfile.mkdtemp(prefix='anime-export-')
+
+    def run(mode):
+        result = subprocess.run([sys.executable, '-c', EXPORT_SCRIPT, mode], cwd=os.path.dirname(os.path.abspath(__file__)),
+                                env=dict(os.environ, BENCH_EXPORT_DIR=export_dir), capture_output=True, text=True)
+        if result.returncode:
+            raise RuntimeError(result.stderr[-2000:])
+        return json.loads(result.stdout.strip().splitlines()[-1])
+
+    # İlk süreç şemayı hazırlar (arama indeksi vb.); ölçüme dahil edilmez
+    run('baseline')
+    modes = [('baseline', 'sadece açılış'), ('ndjson', 'NDJSON akışı'), ('ndjson-gzip', 'NDJSON akışı (gzip)'),
+             ('sitemap', 'sitemap indeksi + tüm sayfalar'), ('build', 'flask build-export (gzip dosyalar)')]
+    if args.naive:
+        modes.append(('naive', 'karşılaştırma: .all() ile bellekte'))
+    # gzip modunda satır sayılmaz; build modunda satır yerine yazılan dosya sayısı gösterilir
+    # RSS, SQLite'ın mmap'lediği dosya sayfalarını (en fazla mmap_size) da içerir; anonim bellek uygulamanın kendi kullanımıdır
+    print(f"{'mod':<40} {'süre':>8} {'çıktı':>10} {'satır':>9} {'tepe RSS':>9} {'artış':>7} {'anonim tepe':>12} {'artış':>7}")
+    for mode, label in modes:
+        sample = run(mode)
+        print(f"{label:<40} {sample['seconds']:>7.1f}s {sample['bytes'] / 1048576:>8.1f}MB {sample['lines']:>9} "
+              f"{sample['rss_peak_mb']:>7.0f}MB {sample['rss_peak_mb'] - sample['rss_before_mb']:>5.0f}MB "
+              f"{sample['anon_peak_mb']:>10.0f}MB {sample['anon_peak_mb'] - sample['anon_before_mb']:>5.0f}MB")
+    shutil.rmtree(export_dir, ignore_errors=True)
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Anime platformu performans ölçümleri')
+    commands = parser.add_subparsers(dest='command', required=True)
+
+    index = commands.add_parser('index', help='Ana sayfa gecikmesini katalog büyüdükçe ölçer')
+    index.add_argument('--sizes', type=int, nargs='+', default=[100, 1000, 10000, 100000])
+    index.add_argument('--repeat', type=int, default=50)
+    index.add_argument('--legacy', action='store_true', help='Eski random.sample yöntemini de ölçer')
+    index.set_defaults(func=bench_index)
+
+    search = commands.add_parser('search', help='FTS5 aramasını eski ilike yöntemiyle karşılaştırır')
+    search.add_argument('--sizes', type=int, nargs='+', default=[10000, 100000])
+    search.add_argument('--repeat', type=int, default=20)
+    search.set_defaults(func=bench_search)
+
+    auth = commands.add_parser('auth', help='Giriş yapmış kullanıcı başına istek maliyetini ölçer')
+    auth.add_argument('--watchlist', type=int, default=500, help='Kullanıcının izleme listesindeki anime sayısı')
+    auth.add_argument('--repeat', type=int, default=200)
+    auth.set_defaults(func=bench_auth)
+
+    mal = commands.add_parser('mal', help='MyAnimeList kuyruğunu yerel sahte Jikan sunucusuna karşı ölçer')
+    mal.add_argument('--animes', type=int, default=30)
+    mal.add_argument('--delay', type=float, default=0.5, help='Sahte Jikan yanıt gecikmesi (saniye)')
+    mal.add_argument('--throttle-every', type=int, default=0, help='Her N. isteğe 429 döner')
+    mal.set_defaults(func=bench_mal)
+
+    publish = commands.add_parser('publish', help='Bölüm yayınlama (bildirim dağıtımı) gecikmesini ölçer')
+    publish.add_argument('--watchers', type=int, nargs='+', default=[10, 1000, 100000])
+    publish.add_argument('--repeat', type=int, default=10)
+    publish.add_argument('--legacy', action='store_true', help='Eski kullanıcı başına döngüyü de ölçer')
+    publish.set_defaults(func=bench_publish)
+
+    stream = commands.add_parser('stream', help='Çok sayıda boşta SSE bağlantısıyla bildirim akışını ölçer')
+    stream.add_argument('--connections', type=int, default=2000)
+    stream.add_argument('--users', type=int, default=200)
+    stream.add_argument('--idle', type=float, default=5, help='Yayından önce bağlantıların boşta bekleyeceği süre (saniye)')
+    stream.add_argument('--port', type=int, default=5499)
+    stream.add_argument('--threaded', action='store_true', help='gevent yerine thread\'li sunucuyu ölçer')
+    stream.set_defaults(func=bench_stream)
+
+    ratings = commands.add_parser('ratings', help='Eşzamanlı oylarla puan toplamlarının doğruluğunu ve hızını ölçer')
+    ratings.add_argument('--votes', type=int, default=5000)
+    ratings.add_argument('--users', type=int, default=100)
+    ratings.add_argument('--animes', type=int, default=20)
+    ratings.add_argument('--threads', type=int, default=16)
+    ratings.set_defaults(func=bench_ratings)
+
+    recommend = commands.add_parser('recommend', help='Benzer anime hesaplamasını ve sorgu gecikmesini ölçer')
+    recommend.add_argument('--users', type=int, default=100000)
+    recommend.add_argument('--titles', type=int, default=20000)
+    recommend.add_argument('--interactions', type=int, default=10, help='Kullanıcı başına oy/izleme listesi kaydı')
+    recommend.add_argument('--dirty', type=int, default=100, help='Artımlı güncellemede işaretlenecek anime sayısı')
+    recommend.add_argument('--repeat', type=int, default=200)
+    recommend.set_defaults(func=bench_recommend)
+
+    episodes = commands.add_parser('import', help='Toplu bölüm içe aktarmayı ölçer')
+    episodes.add_argument('--episodes', type=int, default=10000)
+    episodes.add_argument('--sources', type=int, default=3, help='Bölüm başına kaynak sayısı')
+    episodes.add_argument('--watchers', type=int, default=1000)
+    episodes.add_argument('--legacy', action='store_true', help='Eski tek tek add_episode yolunu da ölçer')
+    episodes.add_argument('--legacy-episodes', type=int, default=500, help='Eski yolda ölçülecek bölüm sayısı')
+    episodes.set_defaults(func=bench_import)
+
+    health = commands.add_parser('health', help='Kaynak sağlık kontrolünü yavaş/ölü sahte sunuculara karşı ölçer')
+    health.add_argument('--episodes', type=int, default=300)
+    health.add_argument('--concurrency', type=int, default=50)
+    health.add_argument('--per-host', type=int, default=4)
+    health.add_argument('--timeout', type=float, default=1.0)
+    health.add_argument('--slow', type=float, default=0.5, help='Yavaş sunucunun yanıt gecikmesi (saniye)')
+    health.set_defaults(func=bench_health)
+
+    profile = commands.add_parser('db', help='Eşzamanlı okuma/yazma altında SQLite profilini (WAL) varsayılanla karşılaştırır')
+    profile.add_argument('--writers', type=int, default=4)
+    profile.add_argument('--readers', type=int, default=8)
+    profile.add_argument('--seconds', type=float, default=10)
+    profile.add_argument('--animes', type=int, default=1000)
+    profile.add_argument('--mode', choices=['rollback', 'wal'], help=argparse.SUPPRESS)
+    profile.set_defaults(func=bench_db)
+
+    logs = commands.add_parser('audit', help='Log yazma maliyetini ve arşivlemenin /logs sayfasına etkisini ölçer')
+    logs.add_argument('--logs', type=int, default=1000000)
+    logs.add_argument('--days', type=int, default=90, help='Log tablosunda tutulacak gün sayısı')
+    logs.add_argument('--repeat', type=int, default=200)
+    logs.set_defaults(func=bench_audit)
+
+    coldstart = commands.add_parser('coldstart', help='Yeni süreçte import + ilk yanıt süresini (soğuk açılış) ölçer')
+    coldstart.add_argument('--repeat', type=int, default=20)
+    coldstart.add_argument('--animes', type=int, default=1000)
+    coldstart.add_argument('--legacy', action='store_true', help='Her açılışta tam şema kontrolünü de ölçer')
+    coldstart.add_argument('--output', help='Sonuçların yazılacağı JSON dosyası (CI karşılaştırması için)')
+    coldstart.set_defaults(func=bench_coldstart)
+
+    registry = commands.add_parser('genres', help='Vitrin raflarını ve tür seçeneklerini eski sorgularla karşılaştırır')
+    registry.add_argument('--animes', type=int, default=100000)
+    registry.add_argument('--genres', type=int, default=60)
+    registry.add_argument('--repeat', type=int, default=100)
+    registry.set_defaults(func=bench_genres)
+
+    covers = commands.add_parser('covers', help='Kapak varyantı üretimini ve kart sayfasının görsel ağırlığını ölçer')
+    covers.add_argument('--covers', type=int, default=54)
+    covers.add_argument('--width', type=int, default=1200)
+    covers.add_argument('--workers', type=int, nargs='+', default=[0, 2], help='Süreç havuzu boyutları (0: aynı süreçte)')
+    covers.set_defaults(func=bench_covers)
+
+    http = commands.add_parser('http', help='Sıkıştırmayı, statik dosya önbellek başlıklarını ve 304 yanıtlarını doğrular')
+    http.add_argument('--episodes', type=int, default=500)
+    http.add_argument('--notifications', type=int, default=50)
+    http.add_argument('--repeat', type=int, default=200)
+    http.set_defaults(func=bench_http)
+
+    instrumentation = commands.add_parser('metrics', help='İstek ölçümünün maliyetini ve route başına sorgu sayılarını gösterir')
+    instrumentation.add_argument('--animes', type=int, default=10000)
+    instrumentation.add_argument('--repeat', type=int, default=100)
+    instrumentation.set_defaults(func=bench_metrics)
+
+    leaders = commands.add_parser('leaderboards', help='Trend/en beğenilen sıralamalarının güncelleme ve sorgu maliyeti')
+    leaders.add_argument('--titles', type=int, default=100000)
+    leaders.add_argument('--ratings', type=int, default=1000000)
+    leaders.add_argument('--views', type=int, default=500000)
+    leaders.add_argument('--events', type=int, default=5000, help='Artımlı güncellemede işlenecek yeni olay sayısı')
+    leaders.add_argument('--repeat', type=int, default=20)
+    leaders.set_defaults(func=bench_leaderboards)
+
+    catalog = commands.add_parser('export', help='Akış halinde dışa aktarma ve sitemap üretiminin bellek kullanımı')
+    catalog.add_argument('--titles', type=int, default=100000)
+    catalog.add_argument('--episodes', type=int, default=2000000)
+    catalog.add_argument('--naive', action='store_true', help='Tüm satırları belleğe alan karşılaştırma modunu da çalıştırır')
+    catalog.set_defaults(func=bench_export)
+
+    load = commands.add_parser('load', help='Tohumlanmış veri üzerinde ana route\'lara eşzamanlı yük testi (JSON çıktı)')
+    load.add_argument('--titles', type=int, nargs='+', default=[1000, 10000, 100000])
+    load.add_argument('--ratings', type=int, default=None, help='Varsayılan: anime başına 10, en fazla 1M')
+    load.add_argument('--users', type=int, default=None)
+    load.add_argument('--episodes', type=int, default=12, help='Anime başına bölüm')
+    load.add_argument('--notifications', type=int, default=10, help='Kullanıcı başına bildirim')
+    load.add_argument('--logs', type=int, default=10000)
+    load.add_argument('--clients', type=int, default=16)
+    load.add_argument('--auth-ratio', type=float, default=0.5, help='Giriş yapmış istemcilerin oranı')
+    load.add_argument('--duration', type=float, default=30)
+    load.add_argument('--seed', type=int, default=42)
+    load.add_argument('--verbose', action='store_true', help='animes filtre/sıralama birleşimlerini ayrı ayrı yazdırır')
+    load.add_argument('--output')
+    load.set_defaults(func=bench_load)
+
+    args = parser.parse_args(argv)
+    args.func(args)
+
+if __name__ == '__main__':
+    sys.exit(main())
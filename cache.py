@@ -0,0 +1,218 @@
+import pickle
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+
+_MISSING = object()
+
+class MemoryBackend:
+    # Süreç içi LRU; boyut sınırı aşılınca en eski kullanılan kayıt atılır
+    shared = False
+
+    def __init__(self, max_entries=1024):
+        self.max_entries = max_entries
+        self._entries = OrderedDict()
+        self._versions = {}
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return _MISSING
+            value, expires = entry
+            if expires is not None and expires < time.monotonic():
+                del self._entries[key]
+                return _MISSING
+            self._entries.move_to_end(key)
+            return value
+
+    def set(self, key, value, ttl=None):
+        expires = time.monotonic() + ttl if ttl else None
+        with self._lock:
+            self._entries[key] = (value, expires)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def delete(self, key):
+        with self._lock:
+            self._entries.pop(key, None)
+
+    # Etiket sürümleri LRU dışında tutulur; atılırsa eski kayıtlar geri canlanabilirdi
+    def get_version(self, tag):
+        return self._versions.get(tag, 0)
+
+    def bump_version(self, tag):
+        with self._lock:
+            self._versions[tag] = self._versions.get(tag, 0) + 1
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._versions.clear()
+
+    def __len__(self):
+        return len(self._entries)
+
+class SQLiteBackend:
+    # Aynı makinedeki birden fazla worker'ın paylaştığı önbellek (Redis yerine yerel çözüm)
+    shared = True
+
+    def __init__(self, path, max_entries=10000):
+        self.path = path
+        self.max_entries = max_entries
+        self._local = threading.local()
+        with self._connect() as conn:
+            conn.execute('CREATE TABLE IF NOT EXISTS cache_entry (key TEXT PRIMARY KEY, value BLOB NOT NULL, expires REAL, accessed REAL NOT NULL)')
+            conn.execute('CREATE INDEX IF NOT EXISTS ix_cache_entry_accessed ON cache_entry (accessed)')
+            conn.execute('CREATE TABLE IF NOT EXISTS cache_tag (tag TEXT PRIMARY KEY, version INTEGER NOT NULL)')
+
+    def _connect(self):
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=5, isolation_level=None)
+            conn.execute('PRAGMA journal_mode=WAL')
+            conn.execute('PRAGMA synchronous=NORMAL')
+            self._local.conn = conn
+        return conn
+
+    def get(self, key):
+        conn = self._connect()
+        row = conn.execute('SELECT value, expires FROM cache_entry WHERE key = ?', (key,)).fetchone()
+        if row is None:
+            return _MISSING
+        now = time.time()
+        if row[1] is not None and row[1] < now:
+            conn.execute('DELETE FROM cache_entry WHERE key = ?', (key,))
+            return _MISSING
+        conn.execute('UPDATE cache_entry SET accessed = ? WHERE key = ?', (now, key))
+        return pickle.loads(row[0])
+
+    def set(self, key, value, ttl=None):
+        now = time.time()
+        conn = self._connect()
+        conn.execute('INSERT OR REPLACE INTO cache_entry (key, value, expires, accessed) VALUES (?, ?, ?, ?)',
+                     (key, pickle.dumps(value), now + ttl if ttl else None, now))
+        conn.execute('DELETE FROM cache_entry WHERE key IN (SELECT key FROM cache_entry ORDER BY accessed DESC LIMIT -1 OFFSET ?)',
+                     (self.max_entries,))
+
+    def delete(self, key):
+        self._connect().execute('DELETE FROM cache_entry WHERE key = ?', (key,))
+
+    def get_version(self, tag):
+        row = self._connect().execute('SELECT version FROM cache_tag WHERE tag = ?', (tag,)).fetchone()
+        return row[0] if row else 0
+
+    def bump_version(self, tag):
+        self._connect().execute('INSERT INTO cache_tag (tag, version) VALUES (?, 1) '
+                                'ON CONFLICT(tag) DO UPDATE SET version = version + 1', (tag,))
+
+    def clear(self):
+        conn = self._connect()
+        conn.execute('DELETE FROM cache_entry')
+        conn.execute('DELETE FROM cache_tag')
+
+    def __len__(self):
+        return self._connect().execute('SELECT COUNT(*) FROM cache_entry').fetchone()[0]
+
+class PageCache:
+    # Kayıtlar etiketlerin o anki sürümleriyle anahtarlanır; bir etiketin sürümünü
+    # artırmak o etikete bağlı tüm kayıtları tek işlemle geçersiz kılar.
+    def __init__(self, app=None):
+        self.backend = MemoryBackend()
+        # Ziyaretçiye özel kayıtlar (oturum, izleme geçmişi) ayrı bir LRU'da tutulur; çok sayıda ziyaretçi
+        # paylaşılan sayfa kayıtlarını dışarı atmaz. Etiket sürümleri yine self.backend'dedir.
+        self.user_backend = MemoryBackend()
+        self.default_ttl = 300
+        self.enabled = True
+        self._stats = {'hits': 0, 'misses': 0, 'invalidations': 0}
+        self._stats_lock = threading.Lock()
+        self.debounce = 10
+        # Gecikmeli geçersiz kılınacak etiket -> Timer
+        self._pending = {}
+        self._pending_lock = threading.Lock()
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        app.config.setdefault('CACHE_BACKEND', 'memory')
+        app.config.setdefault('CACHE_MAX_ENTRIES', 1024)
+        app.config.setdefault('CACHE_USER_MAX_ENTRIES', 4096)
+        app.config.setdefault('CACHE_DEFAULT_TIMEOUT', 300)
+        app.config.setdefault('CACHE_SQLITE_PATH', None)
+        app.config.setdefault('CACHE_ENABLED', True)
+        # invalidate_soon ile geçersiz kılınan etiketler en fazla bu kadar saniye eski kalır (0: hemen)
+        app.config.setdefault('CACHE_DEBOUNCE_SECONDS', 10)
+        if app.config['CACHE_BACKEND'] == 'sqlite':
+            path = app.config['CACHE_SQLITE_PATH'] or f'{app.instance_path}/cache.db'
+            self.backend = SQLiteBackend(path, max_entries=app.config['CACHE_MAX_ENTRIES'])
+        else:
+            self.backend = MemoryBackend(max_entries=app.config['CACHE_MAX_ENTRIES'])
+        self.user_backend = MemoryBackend(max_entries=app.config['CACHE_USER_MAX_ENTRIES'])
+        self.default_ttl = app.config['CACHE_DEFAULT_TIMEOUT']
+        self.enabled = app.config['CACHE_ENABLED']
+        self.debounce = app.config['CACHE_DEBOUNCE_SECONDS']
+        app.extensions['page_cache'] = self
+
+    def _count(self, name):
+        with self._stats_lock:
+            self._stats[name] += 1
+
+    def make_key(self, name, tags):
+        versions = ','.join(f'{tag}={self.backend.get_version(tag)}' for tag in sorted(tags))
+        return f'{name}|{versions}'
+
+    def get_or_set(self, name, tags, factory, ttl=None, per_user=False):
+        # per_user: tek bir ziyaretçiye ait kayıt (user_backend'de tutulur)
+        if not self.enabled:
+            return factory()
+        backend = self.user_backend if per_user else self.backend
+        key = self.make_key(name, tags)
+        value = backend.get(key)
+        if value is not _MISSING:
+            self._count('hits')
+            return value
+        self._count('misses')
+        value = factory()
+        backend.set(key, value, ttl or self.default_ttl)
+        return value
+
+    def invalidate(self, *tags):
+        for tag in set(tags):
+            self.backend.bump_version(tag)
+            self._count('invalidations')
+
+    def invalidate_soon(self, *tags):
+        # Sık tekrarlanan değişiklikler (ör. her oy) için: etiket debounce saniye sonra bir kez geçersiz
+        # kılınır; aradaki değişiklikler aynı geçersiz kılmaya katılır
+        if not self.debounce:
+            self.invalidate(*tags)
+            return
+        for tag in set(tags):
+            with self._pending_lock:
+                if tag in self._pending:
+                    continue
+                timer = self._pending[tag] = threading.Timer(self.debounce, self._flush, (tag,))
+                timer.daemon = True
+            timer.start()
+
+    def _flush(self, tag):
+        with self._pending_lock:
+            self._pending.pop(tag, None)
+        self.invalidate(tag)
+
+    def clear(self):
+        self.backend.clear()
+        self.user_backend.clear()
+
+    def stats(self):
+        with self._stats_lock:
+            stats = dict(self._stats)
+        lookups = stats['hits'] + stats['misses']
+        stats['hit_ratio'] = round(stats['hits'] / lookups, 4) if lookups else 0.0
+        stats['entries'] = len(self.backend)
+        stats['user_entries'] = len(self.user_backend)
+        stats['backend'] = type(self.backend).__name__
+        return stats
@@ -0,0 +1,321 @@
+import hashlib
+import io
+import multiprocessing
+import os
+import shutil
+import threading
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor, as_completed
+from concurrent.futures.process import BrokenProcessPool
+from datetime import datetime, timedelta
+from urllib.parse import urlsplit
+from urllib.request import url2pathname
+
+from sqlalchemy import or_, select, update
+from models import db, Anime, CoverImage, dialect_insert
+
+# Varyant adı -> üretilen genişlikler (px); kaynak daha darsa büyütülmez, kaynak genişliğinde yazılır
+VARIANTS = {
+    'thumb': (96, 192),
+    'card': (240, 480),
+    'hero': (960, 1920),
+}
+WIDTHS = sorted({width for widths in VARIANTS.values() for width in widths}, reverse=True)
+# Tercih sırasıyla; Pillow'un bu kurulumda kodlayamadığı biçimler atlanır
+FORMATS = ('avif', 'webp')
+# Kodlayıcı ayarları; AVIF'te speed=8 kaliteden çok az kaybettirip kodlamayı birkaç kat hızlandırır
+SAVE_OPTIONS = {'avif': {'quality': 55, 'speed': 8}, 'webp': {'quality': 80, 'method': 4}}
+MIME_TYPES = {'avif': 'image/avif', 'webp': 'image/webp'}
+
+class CoverError(Exception):
+    pass
+
+def supported_formats(formats=FORMATS):
+    # Pillow bu işlem için isteğe bağlıdır (pip install pillow); yoksa hiçbir varyant üretilmez
+    try:
+        from PIL import features
+    except ImportError:
+        return ()
+    return tuple(fmt for fmt in formats if features.check(fmt))
+
+def variant_name(digest, width, fmt):
+    return f'{digest[:2]}/{digest}-{width}.{fmt}'
+
+def fetch(url, timeout, max_bytes, allow_local=False):
+    # http(s) kapakları akış halinde ve boyut sınırıyla indirilir; file:// sadece allow_local ile (test/içe aktarma)
+    parts = urlsplit(url)
+    if parts.scheme == 'file' or (allow_local and not parts.scheme):
+        if not allow_local:
+            raise CoverError('yerel dosyalara izin verilmiyor')
+        with open(url2pathname(parts.path) if parts.scheme else url, 'rb') as f:
+            data = f.read(max_bytes + 1)
+    elif parts.scheme in ('http', 'https'):
+        import requests
+        with requests.get(url, timeout=timeout, stream=True, headers={'User-Agent': 'AnimeCoverFetcher/1.0'}) as response:
+            if response.status_code != 200:
+                raise CoverError(f'HTTP {response.status_code}')
+            chunks, size = [], 0
+            for chunk in response.iter_content(64 * 1024):
+                chunks.append(chunk)
+                size += len(chunk)
+                if size > max_bytes:
+                    break
+            data = b''.join(chunks)
+    else:
+        raise CoverError('geçersiz URL')
+    if len(data) > max_bytes:
+        raise CoverError(f'dosya {max_bytes // (1024 * 1024)} MB sınırından büyük')
+    return data
+
+def render_variants(data, directory, formats):
+    # Ayrı süreçte çalışır (ProcessPoolExecutor). Dosya adları içerik özetinden türetildiğinden aynı
+    # görsel ikinci kez işlenmez ve üretilen dosyalar hiç değişmez (immutable önbellek başlıkları için).
+    from PIL import Image, ImageOps
+    digest = hashlib.sha256(data).hexdigest()[:32]
+    target = os.path.join(directory, digest[:2])
+    image = Image.open(io.BytesIO(data))
+    source_size = image.size
+    if all(os.path.exists(os.path.join(directory, variant_name(digest, width, fmt))) for width in WIDTHS for fmt in formats):
+        return digest, source_size
+    # JPEG'lerde en büyük varyanta yetecek ölçekte çözülür (tam çözünürlük açılmaz)
+    if image.width > WIDTHS[0]:
+        image.draft('RGB', (WIDTHS[0], image.height * WIDTHS[0] // image.width))
+    image = ImageOps.exif_transpose(image)
+    if image.mode not in ('RGB', 'RGBA'):
+        image = image.convert('RGBA' if 'transparency' in image.info or image.mode in ('LA', 'PA') else 'RGB')
+    os.makedirs(target, exist_ok=True)
+    # Her genişlik bir öncekinden küçültülür; büyükten küçüğe gitmek yeniden örneklemeyi ucuzlatır
+    resized = image
+    previous = None
+    for width in WIDTHS:
+        if resized.width > width:
+            resized = resized.resize((width, max(1, round(resized.height * width / resized.width))), Image.LANCZOS)
+            previous = None
+        for fmt in formats:
+            path = os.path.join(directory, variant_name(digest, width, fmt))
+            if os.path.exists(path):
+                continue
+            temporary = f'{path}.{os.getpid()}.tmp'
+            if previous is not None:
+                # Kaynak bu genişlikten darsa dosya bir öncekinin aynısıdır; tekrar kodlanmaz
+                shutil.copyfile(os.path.join(directory, variant_name(digest, previous, fmt)), temporary)
+            else:
+                resized.save(temporary, format=fmt.upper(), **SAVE_OPTIONS[fmt])
+            os.replace(temporary, path)
+        previous = width
+    return digest, source_size
+
+class CoverPipeline:
+    # Kapaklar bir kez indirilir, boyutlandırılmış WebP/AVIF varyantları içerik adresli olarak diske
+    # yazılır ve şablonlar srcset ile bunları kullanır. Kayıt sırasında indirme yapılmaz; URL kuyruğa
+    # yazılır ve arka plandaki worker (veya flask process-covers) işler.
+    def __init__(self, app=None):
+        self.app = None
+        self.formats = ()
+        self.on_update = None
+        self._executor = None
+        self._thread = None
+        self._thread_lock = threading.Lock()
+        self._wake = threading.Event()
+        self._stop = threading.Event()
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        app.config.setdefault('COVER_DIR', os.path.join(app.instance_path, 'covers'))
+        app.config.setdefault('COVER_URL', '/covers')
+        app.config.setdefault('COVER_FORMATS', FORMATS)
+        # Boyutlandırma süreç havuzunda yapılır; 0 ise aynı süreçte (ör. çoklu süreç açılamayan ortamlar)
+        app.config.setdefault('COVER_WORKERS', os.cpu_count() or 1)
+        app.config.setdefault('COVER_FETCH_THREADS', 8)
+        app.config.setdefault('COVER_FETCH_TIMEOUT', 15)
+        app.config.setdefault('COVER_MAX_BYTES', 10 * 1024 * 1024)
+        app.config.setdefault('COVER_ALLOW_LOCAL', False)
+        app.config.setdefault('COVER_BATCH_SIZE', 50)
+        app.config.setdefault('COVER_MAX_ATTEMPTS', 3)
+        # Başarısız indirme bu kadar saniye sonra tekrar denenir
+        app.config.setdefault('COVER_RETRY_DELAY', 600)
+        app.config.setdefault('COVER_MAX_AGE', 365 * 24 * 3600)
+        app.config.setdefault('COVER_POLL_INTERVAL', 30)
+        app.config.setdefault('COVER_WORKER_ENABLED', True)
+        self.app = app
+        self.formats = supported_formats(app.config['COVER_FORMATS'])
+        app.extensions['cover_pipeline'] = self
+        app.add_template_global(self.sources, 'cover_sources')
+        app.add_template_global(self.url, 'cover_url')
+
+    def url(self, digest, width, fmt):
+        return f"{self.app.config['COVER_URL']}/{variant_name(digest, width, fmt)}"
+
+    def sources(self, digest, variant):
+        # Şablonlar için [(mime türü, srcset)]; kapak henüz işlenmediyse boş liste (orijinal URL kullanılır)
+        if not digest:
+            return []
+        return [(MIME_TYPES[fmt], ', '.join(f'{self.url(digest, width, fmt)} {width}w' for width in VARIANTS[variant]))
+                for fmt in self.formats]
+
+    # assign/enqueue çağıranın transaction'ına katılır; commit'ten sonra wake() çağrılmalıdır
+    def assign(self, anime):
+        # URL daha önce işlendiyse sonuç hemen kullanılır, değilse kuyruğa eklenir. Sorgu autoflush
+        # yapmaz; çağıranın yarım kalmış değişiklikleri (ör. henüz eklenmemiş anime) erken yazılmaz.
+        with db.session.no_autoflush:
+            row = db.session.execute(select(CoverImage.status, CoverImage.digest).where(CoverImage.url == anime.cover_image)).first()
+        anime.cover_digest = row.digest if row is not None and row.status == 'ready' else None
+        if row is None:
+            self.enqueue([anime.cover_image])
+
+    def enqueue(self, urls):
+        now = datetime.utcnow()
+        rows = [{'url': url, 'status': 'pending', 'attempts': 0, 'updated_at': now} for url in set(urls) if url]
+        if rows:
+            db.session.execute(dialect_insert(CoverImage).on_conflict_do_nothing(), rows)
+
+    def enqueue_missing(self, retry_failed=False):
+        # Kapağı işlenmemiş tüm animeler: hazır olanlar bağlanır, hiç görülmemiş URL'ler kuyruğa girer
+        ready = select(CoverImage.digest).where(CoverImage.url == Anime.cover_image, CoverImage.status == 'ready').scalar_subquery()
+        db.session.execute(update(Anime).where(Anime.cover_digest.is_(None)).values(cover_digest=ready))
+        urls = db.session.execute(select(Anime.cover_image).where(Anime.cover_digest.is_(None)).distinct()).scalars().all()
+        self.enqueue(urls)
+        if retry_failed:
+            db.session.execute(update(CoverImage).where(CoverImage.status == 'failed').values(status='pending', attempts=0))
+        db.session.commit()
+        return len(urls)
+
+    def _pool(self):
+        if self._executor is None and self.app.config['COVER_WORKERS']:
+            # fork, thread'leri olan bir süreçte (web sunucusu, worker thread'i) güvenli değildir
+            self._executor = ProcessPoolExecutor(self.app.config['COVER_WORKERS'], mp_context=multiprocessing.get_context('spawn'))
+        return self._executor
+
+    def process(self, urls):
+        # İndirmeler thread'lerde (G/Ç), boyutlandırma süreç havuzunda (CPU) paralel yürür.
+        # {url: (digest, (genişlik, yükseklik), hata, tekrar denenebilir mi)} döner.
+        config = self.app.config
+        directory = config['COVER_DIR']
+        results = {}
+        renders = {}
+        pool = self._pool()
+        with ThreadPoolExecutor(config['COVER_FETCH_THREADS']) as fetchers:
+            downloads = {fetchers.submit(fetch, url, config['COVER_FETCH_TIMEOUT'], config['COVER_MAX_BYTES'],
+                                         config['COVER_ALLOW_LOCAL']): url for url in urls}
+            for future in as_completed(downloads):
+                url = downloads[future]
+                try:
+                    data = future.result()
+                except (OSError, CoverError) as e:
+                    results[url] = (None, None, str(e) or e.__class__.__name__, True)
+                    continue
+                if pool is None:
+                    renders[url] = data
+                else:
+                    renders[pool.submit(render_variants, data, directory, self.formats)] = url
+        if pool is None:
+            for url, data in renders.items():
+                results[url] = self._render(lambda: render_variants(data, directory, self.formats))
+        else:
+            for future in as_completed(renders):
+                results[renders[future]] = self._render(future.result)
+        return results
+
+    def _render(self, run):
+        try:
+            digest, size = run()
+        except BrokenProcessPool as e:
+            # Alt süreç öldü (bellek yetersizliği vb.); havuz yeniden kurulur, görsel tekrar denenir
+            self._executor = None
+            return None, None, str(e), True
+        except Exception as e:
+            # Bozuk/desteklenmeyen görsel (PIL.UnidentifiedImageError, DecompressionBombError, ...); tekrar denenmez
+            return None, None, (str(e) or e.__class__.__name__), False
+        return digest, size, None, False
+
+    def record(self, results):
+        # Sonuçları yazar ve kapağı değişen anime id'lerini döner
+        config = self.app.config
+        now = datetime.utcnow()
+        rows = {row.url: row for row in CoverImage.query.filter(CoverImage.url.in_(list(results)))}
+        ready = {}
+        for url, (digest, size, error, retry) in results.items():
+            row = rows.get(url)
+            if row is None:
+                continue
+            row.updated_at = now
+            if digest:
+                row.status, row.digest, row.error = 'ready', digest, None
+                row.width, row.height = size
+                ready[url] = digest
+            else:
+                row.attempts = row.attempts + 1 if retry else config['COVER_MAX_ATTEMPTS']
+                row.error = error[:200]
+                row.status = 'failed' if row.attempts >= config['COVER_MAX_ATTEMPTS'] else 'pending'
+        changed = []
+        if ready:
+            changed = db.session.execute(select(Anime.id).where(Anime.cover_image.in_(list(ready)))).scalars().all()
+            for url, digest in ready.items():
+                db.session.execute(update(Anime).where(Anime.cover_image == url).values(cover_digest=digest))
+        db.session.commit()
+        return changed
+
+    def run_once(self):
+        # Bir grup bekleyen URL'yi işler; işlenen URL sayısını döner
+        retry_before = datetime.utcnow() - timedelta(seconds=self.app.config['COVER_RETRY_DELAY'])
+        urls = db.session.execute(select(CoverImage.url).where(CoverImage.status == 'pending', or_(
+            CoverImage.attempts == 0, CoverImage.updated_at < retry_before)).order_by(
+            CoverImage.updated_at, CoverImage.id).limit(self.app.config['COVER_BATCH_SIZE'])).scalars().all()
+        # İndirme/boyutlandırma sürerken transaction açık tutulmaz
+        db.session.commit()
+        if not urls:
+            return 0
+        if not self.formats:
+            raise CoverError('Pillow kurulu değil veya WebP/AVIF desteklemiyor')
+        changed = self.record(self.process(urls))
+        if changed and self.on_update is not None:
+            self.on_update(changed)
+        return len(urls)
+
+    def drain(self):
+        total = 0
+        while True:
+            processed = self.run_once()
+            if not processed:
+                return total
+            total += processed
+
+    def run_forever(self):
+        while not self._stop.is_set():
+            processed = 0
+            try:
+                processed = self.run_once()
+            except Exception:
+                self.app.logger.exception('Kapak işleme hatası')
+                db.session.rollback()
+            finally:
+                db.session.remove()
+            if not processed:
+                self._wake.wait(self.app.config['COVER_POLL_INTERVAL'])
+                self._wake.clear()
+
+    def _run(self):
+        with self.app.app_context():
+            self.run_forever()
+
+    def wake(self):
+        if not self.app.config['COVER_WORKER_ENABLED'] or not self.formats:
+            return
+        with self._thread_lock:
+            if self._thread is None or not self._thread.is_alive():
+                self._stop.clear()
+                self._thread = threading.Thread(target=self._run, name='cover-pipeline', daemon=True)
+                self._thread.start()
+        self._wake.set()
+
+    def stop(self, timeout=None):
+        self._stop.set()
+        self._wake.set()
+        if self._thread is not None:
+            self._thread.join(timeout)
+        if self._executor is not None:
+            self._executor.shutdown()
+            self._executor = None
+
+    def stats(self):
+        return dict(db.session.execute(select(CoverImage.status, db.func.count(CoverImage.id)).group_by(CoverImage.status)).all())
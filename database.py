@@ -0,0 +1,91 @@
+import os
+from functools import wraps
+
+from flask import g, has_app_context
+from flask_sqlalchemy.session import Session
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+REPLICA_BIND = 'replica'
+
+# Her yeni SQLite bağlantısında uygulanır. WAL'da okuyucular yazanı beklemez; synchronous=NORMAL
+# WAL ile güvenlidir (sadece elektrik kesintisinde son commit kaybolabilir) ve commit başına fsync'i kaldırır.
+SQLITE_PRAGMAS = {
+    'journal_mode': 'WAL',
+    'synchronous': 'NORMAL',
+    'busy_timeout': 5000,
+    'cache_size': -64000,
+    'mmap_size': 256 * 1024 * 1024,
+    'temp_store': 'MEMORY',
+}
+
+def database_url(value):
+    # Heroku/Render tarzı postgres:// adresleri SQLAlchemy'nin beklediği biçime çevrilir
+    if value and value.startswith('postgres://'):
+        return 'postgresql://' + value[len('postgres://'):]
+    return value
+
+def engine_options(url, config):
+    if url.startswith('sqlite'):
+        if ':memory:' in url or url.rstrip('/') == 'sqlite:':
+            return {}
+        # timeout, sqlite3'ün kilit bekleme süresidir (busy_timeout pragması ile aynı değer)
+        return {'pool_size': config['DB_POOL_SIZE'], 'max_overflow': config['DB_MAX_OVERFLOW'],
+                'connect_args': {'timeout': SQLITE_PRAGMAS['busy_timeout'] / 1000, 'check_same_thread': False}}
+    return {'pool_size': config['DB_POOL_SIZE'], 'max_overflow': config['DB_MAX_OVERFLOW'],
+            'pool_timeout': config['DB_POOL_TIMEOUT'], 'pool_recycle': config['DB_POOL_RECYCLE'], 'pool_pre_ping': True}
+
+def configure(app):
+    # db.init_app'ten önce çağrılmalı; motorlar init_app sırasında bu ayarlarla oluşturulur
+    config = app.config
+    config.setdefault('SQLALCHEMY_DATABASE_URI', database_url(os.environ.get('DATABASE_URL', 'sqlite:///anime_site.db')))
+    config.setdefault('DB_REPLICA_URL', database_url(os.environ.get('DATABASE_REPLICA_URL')))
+    config.setdefault('DB_POOL_SIZE', int(os.environ.get('DB_POOL_SIZE', 10)))
+    config.setdefault('DB_MAX_OVERFLOW', int(os.environ.get('DB_MAX_OVERFLOW', 20)))
+    config.setdefault('DB_POOL_TIMEOUT', 30)
+    config.setdefault('DB_POOL_RECYCLE', 1800)
+    config.setdefault('DB_SQLITE_TUNING', os.environ.get('DB_SQLITE_TUNING', '1') != '0')
+    # Kapalıysa şema açılışta kontrol edilmez; dağıtımda flask db-upgrade çalıştırılmalı
+    config.setdefault('DB_AUTO_UPGRADE', os.environ.get('DB_AUTO_UPGRADE', '1') != '0')
+    config.setdefault('SQLALCHEMY_ENGINE_OPTIONS', engine_options(config['SQLALCHEMY_DATABASE_URI'], config))
+    if config['DB_REPLICA_URL']:
+        binds = config.setdefault('SQLALCHEMY_BINDS', {})
+        binds.setdefault(REPLICA_BIND, dict(engine_options(config['DB_REPLICA_URL'], config), url=config['DB_REPLICA_URL']))
+    if config['DB_SQLITE_TUNING']:
+        event.listen(Engine, 'connect', apply_sqlite_pragmas)
+
+def apply_sqlite_pragmas(dbapi_connection, connection_record):
+    if type(dbapi_connection).__module__.split('.')[0] not in ('sqlite3', 'pysqlite2'):
+        return
+    cursor = dbapi_connection.cursor()
+    try:
+        for name, value in SQLITE_PRAGMAS.items():
+            cursor.execute(f'PRAGMA {name}={value}')
+    finally:
+        cursor.close()
+
+def pragmas(engine):
+    if engine.dialect.name != 'sqlite':
+        return {}
+    with engine.connect() as conn:
+        return {name: conn.exec_driver_sql(f'PRAGMA {name}').scalar() for name in SQLITE_PRAGMAS}
+
+class RoutingSession(Session):
+    # read_replica ile işaretli route'larda okumalar replikaya gider. Yazmalar (flush veya
+    # INSERT/UPDATE/DELETE) her zaman birincil veritabanına gider; isteğin ilk yazmasından
+    # sonra kendi yazdığını görebilmesi için okumalar da birincile döner.
+    def get_bind(self, mapper=None, clause=None, bind=None, **kwargs):
+        if bind is None and has_app_context() and g.get('use_replica') and REPLICA_BIND in self._db.engines:
+            if self._flushing or getattr(clause, 'is_dml', False):
+                self.info['wrote'] = True
+            elif not self.info.get('wrote'):
+                return self._db.engines[REPLICA_BIND]
+        return super().get_bind(mapper=mapper, clause=clause, bind=bind, **kwargs)
+
+def read_replica(view):
+    # Herkese açık, salt okunur route'lar için; replika tanımlı değilse etkisizdir
+    @wraps(view)
+    def wrapper(*args, **kwargs):
+        g.use_replica = True
+        return view(*args, **kwargs)
+    return wrapper
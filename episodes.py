@@ -0,0 +1,147 @@
+import csv
+import io
+import json
+import re
+from collections import namedtuple
+from urllib.parse import urlparse
+from sqlalchemy import delete, select, update
+from models import db, Episode, EpisodeSource
+import notifications
+
+IMPORT_CHUNK_SIZE = 1000
+MIGRATE_CHUNK_SIZE = 1000
+QUALITY_PATTERN = re.compile(r'(?<!\d)(2160|1440|1080|720|480|360)p(?![a-z])', re.IGNORECASE)
+SEPARATOR_PATTERN = re.compile(r'[,\s]+')
+
+ImportResult = namedtuple('ImportResult', 'added updated sources message')
+
+def source_row(value, position):
+    # value bir URL ya da {'url', 'quality', 'host'} sözlüğüdür
+    if isinstance(value, dict):
+        url = str(value.get('url') or '').strip()
+        quality = value.get('quality')
+        host = value.get('host')
+    else:
+        url, quality, host = str(value).strip(), None, None
+    if not url:
+        raise ValueError('Boş kaynak URL\'si')
+    if quality is None:
+        match = QUALITY_PATTERN.search(url)
+        quality = match.group(1) + 'p' if match else None
+    return {'position': position, 'url': url, 'quality': quality,
+            'host': (host or urlparse(url).hostname or '').lower()[:100]}
+
+def parse_sources(text):
+    # Formdaki virgül/satır sonu ile ayrılmış URL listesi
+    return [source_row(url, position) for position, url in enumerate(u for u in SEPARATOR_PATTERN.split(text or '') if u)]
+
+def set_sources(episode, text):
+    episode.sources = [EpisodeSource(**row) for row in parse_sources(text)]
+
+def sources_text(episode):
+    return ', '.join(source.url for source in episode.sources)
+
+def parse_import(data, filename=''):
+    # JSON: [{"number": 1, "sources": ["https://...", {"url": "...", "quality": "1080p"}]}, ...]
+    #       veya {"episodes": [...]}
+    # CSV:  başlıkta number ve url (kaynak başına bir satır) ya da sources (virgülle ayrılmış) sütunu;
+    #       isteğe bağlı quality ve host sütunları
+    if isinstance(data, bytes):
+        data = data.decode('utf-8-sig')
+    if filename.lower().endswith('.json') or data.lstrip()[:1] in ('[', '{'):
+        try:
+            items = json.loads(data)
+        except json.JSONDecodeError as e:
+            raise ValueError(f'Geçersiz JSON: {e}')
+        if isinstance(items, dict):
+            items = items.get('episodes', [])
+        if not isinstance(items, list):
+            raise ValueError('JSON bir bölüm listesi veya {"episodes": [...]} olmalı')
+        episodes = {}
+        for item in items:
+            if not isinstance(item, dict):
+                raise ValueError(f'Geçersiz bölüm kaydı (number ve sources alanları olan bir nesne olmalı): {item!r:.100}')
+            sources = item.get('sources') or []
+            if isinstance(sources, str):
+                sources = [url for url in SEPARATOR_PATTERN.split(sources) if url]
+            elif not isinstance(sources, list):
+                raise ValueError(f'Geçersiz kaynak listesi: {sources!r:.100}')
+            episodes.setdefault(_number(item.get('number')), []).extend(sources)
+    else:
+        reader = csv.DictReader(io.StringIO(data))
+        if not reader.fieldnames or 'number' not in reader.fieldnames or not {'url', 'sources'} & set(reader.fieldnames):
+            raise ValueError('CSV başlığında number ve url (veya sources) sütunları olmalı')
+        episodes = {}
+        for row in reader:
+            sources = episodes.setdefault(_number(row.get('number')), [])
+            if row.get('url'):
+                sources.append({'url': row['url'], 'quality': row.get('quality') or None, 'host': row.get('host') or None})
+            if row.get('sources'):
+                sources.extend(url for url in SEPARATOR_PATTERN.split(row['sources']) if url)
+    return [{'number': number, 'sources': [source_row(value, position) for position, value in enumerate(sources)]}
+            for number, sources in episodes.items()]
+
+def _number(value):
+    try:
+        number = int(str(value).strip())
+    except (TypeError, ValueError):
+        raise ValueError(f'Geçersiz bölüm numarası: {value!r}')
+    if number < 0:
+        raise ValueError(f'Geçersiz bölüm numarası: {value!r}')
+    return number
+
+def _chunks(rows, size):
+    for start in range(0, len(rows), size):
+        yield rows[start:start + size]
+
+def import_episodes(anime, episodes, chunk_size=IMPORT_CHUNK_SIZE):
+    # Tüm sezon tek transaction'da, parça parça çoklu INSERT ile yazılır. Var olan bölüm
+    # numaralarının kaynakları değiştirilir. Yeni bölümler için izleyicilere tek bir toplu
+    # bildirim düşülür. Commit çağıranındır.
+    existing = dict(db.session.execute(select(Episode.number, Episode.id).where(Episode.anime_id == anime.id)).all())
+    new_numbers = sorted(item['number'] for item in episodes if item['number'] not in existing)
+    for chunk in _chunks(new_numbers, chunk_size):
+        db.session.execute(Episode.__table__.insert(), [{'anime_id': anime.id, 'number': number, 'sources': ''} for number in chunk])
+    replaced = [existing[item['number']] for item in episodes if item['number'] in existing]
+    for chunk in _chunks(replaced, chunk_size):
+        db.session.execute(delete(EpisodeSource).where(EpisodeSource.episode_id.in_(chunk)))
+
+    ids = existing if not new_numbers else dict(db.session.execute(
+        select(Episode.number, Episode.id).where(Episode.anime_id == anime.id)).all())
+    rows = [dict(source, episode_id=ids[item['number']]) for item in episodes for source in item['sources']]
+    for chunk in _chunks(rows, chunk_size):
+        db.session.execute(EpisodeSource.__table__.insert(), chunk)
+
+    message = None
+    if new_numbers:
+        if len(new_numbers) == 1:
+            message = f"{anime.name} animesinin {new_numbers[0]}. bölümü yayınlandı!"
+        else:
+            message = f"{anime.name} animesine {len(new_numbers)} yeni bölüm eklendi ({new_numbers[0]}-{new_numbers[-1]}. bölümler)!"
+        notifications.fan_out(anime.id, message)
+    return ImportResult(len(new_numbers), len(replaced), len(rows), message)
+
+def remove_for_anime(anime_id):
+    # Episode'ların toplu silinmesi ORM cascade'ini atladığından kaynaklar ayrıca silinir
+    db.session.execute(delete(EpisodeSource).where(EpisodeSource.episode_id.in_(
+        select(Episode.id).where(Episode.anime_id == anime_id))))
+
+def migrate_legacy_sources(chunk_size=MIGRATE_CHUNK_SIZE):
+    # Eski episode.sources metnini episode_source satırlarına taşır; taşınan bölüm sayısını döner
+    migrated = 0
+    while True:
+        rows = db.session.execute(select(Episode.id, Episode.legacy_sources).where(
+            Episode.legacy_sources != '').limit(chunk_size)).all()
+        if not rows:
+            return migrated
+        sources = []
+        for episode_id, text in rows:
+            for position, url in enumerate(url for url in text.split(',') if url.strip()):
+                sources.append(dict(source_row(url, position), episode_id=episode_id))
+        ids = [row.id for row in rows]
+        db.session.execute(delete(EpisodeSource).where(EpisodeSource.episode_id.in_(ids)))
+        if sources:
+            db.session.execute(EpisodeSource.__table__.insert(), sources)
+        db.session.execute(update(Episode).where(Episode.id.in_(ids)).values(legacy_sources=''))
+        db.session.commit()
+        migrated += len(rows)
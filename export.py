@@ -0,0 +1,224 @@
+import gzip
+import json
+import os
+import zlib
+from datetime import datetime, timedelta, timezone
+from xml.sax.saxutils import escape
+from sqlalchemy import func, select
+from models import db, Anime, Episode, Genre, Log, anime_genres
+from assets import write_atomic
+
+TYPES = ('genre', 'anime', 'episode', 'deleted')
+ANIME_COLUMNS = (Anime.id, Anime.name, Anime.description, Anime.cover_image, Anime.release_year, Anime.status, Anime.anime_type,
+                 Anime.average_rating, Anime.rating_count, Anime.mal_id, Anime.mal_score, Anime.mal_url, Anime.updated_at)
+# Sitemap protokolü: dosya başına en fazla 50.000 adres
+SITEMAP_PAGE_SIZE = 50000
+SITEMAP_KINDS = ('anime', 'episode')
+SITEMAP_NS = 'http://www.sitemaps.org/schemas/sitemap/0.9'
+# Satırlar bu boyutta parçalar halinde yazılır (WSGI'a her satır için ayrı yazma yapılmaz)
+CHUNK_BYTES = 64 * 1024
+MANIFEST = 'manifest.json'
+# URL şablonlarındaki yer tutucu id; adres her satır için url_for çağrılmadan üretilir
+PLACEHOLDER_ID = 987654321
+
+def parse_since(value):
+    # ISO 8601 (2024-05-01T12:00:00, Z veya saat dilimi olabilir) veya Unix zamanı; UTC'ye çevrilir
+    if not value:
+        return None
+    try:
+        return datetime.utcfromtimestamp(float(value))
+    except (ValueError, OverflowError, OSError):
+        # Sayı değil veya platformun tarih aralığı dışında (ör. -1e20, 1e30, inf)
+        pass
+    try:
+        parsed = datetime.fromisoformat(value.replace('Z', '+00:00'))
+    except ValueError:
+        return None
+    if parsed.tzinfo is not None:
+        parsed = parsed.astimezone(timezone.utc).replace(tzinfo=None)
+    return parsed
+
+def isoformat(value):
+    return value.replace(microsecond=0).isoformat() + 'Z' if value else None
+
+def link_template(url):
+    # url_for(..., id=PLACEHOLDER_ID) çıktısı -> '.../anime/{}'
+    return url.replace(str(PLACEHOLDER_ID), '{}')
+
+def last_modified():
+    # Kataloğun son değişiklik zamanı: anime/bölüm değişiklikleri ve silmeler (updated_at indekslerinden okunur);
+    # tür tablosunun updated_at sütunu yok, eklenen/silinen türler log tablosundan okunur
+    return max(filter(None, [
+        db.session.execute(select(func.max(Anime.updated_at))).scalar(),
+        db.session.execute(select(func.max(Episode.updated_at))).scalar(),
+        db.session.execute(select(func.max(Log.timestamp)).where(Log.action == 'delete', Log.target_type.in_(('anime', 'episode')))).scalar(),
+        db.session.execute(select(func.max(Log.timestamp)).where(Log.target_type == 'genre')).scalar(),
+    ]), default=None)
+
+def _partitions(statement, size):
+    # Sunucu tarafı cursor (PostgreSQL) / satır satır okuma (SQLite); bellekte en fazla bir parça tutulur
+    return db.session.execute(statement.execution_options(yield_per=size)).partitions()
+
+def genre_rows(excluded_ids):
+    for genre_id, name in db.session.execute(select(Genre.id, Genre.name).order_by(Genre.id)):
+        if genre_id not in excluded_ids:
+            yield {'type': 'genre', 'id': genre_id, 'name': name}
+
+def anime_rows(since, anime_url, excluded_ids, size):
+    statement = select(*ANIME_COLUMNS).order_by(Anime.id)
+    if since is not None:
+        statement = statement.where(Anime.updated_at > since)
+    for rows in _partitions(statement, size):
+        # Parçadaki animelerin türleri tek sorguda, (anime_id, genre_id) birincil anahtar aralığından okunur
+        genre_ids = {}
+        for anime_id, genre_id in db.session.execute(select(anime_genres.c.anime_id, anime_genres.c.genre_id).where(
+                anime_genres.c.anime_id.between(rows[0].id, rows[-1].id))):
+            if genre_id not in excluded_ids:
+                genre_ids.setdefault(anime_id, []).append(genre_id)
+        for row in rows:
+            yield {'type': 'anime', 'id': row.id, 'name': row.name, 'description': row.description, 'cover_image': row.cover_image,
+                   'release_year': row.release_year, 'status': row.status, 'anime_type': row.anime_type,
+                   'average_rating': row.average_rating, 'rating_count': row.rating_count, 'mal_id': row.mal_id,
+                   'mal_score': row.mal_score, 'mal_url': row.mal_url, 'genre_ids': sorted(genre_ids.get(row.id, ())),
+                   'url': anime_url.format(row.id), 'updated_at': isoformat(row.updated_at)}
+
+def episode_rows(since, episode_url, size):
+    statement = select(Episode.id, Episode.anime_id, Episode.number, Episode.updated_at).order_by(Episode.id)
+    if since is not None:
+        statement = statement.where(Episode.updated_at > since)
+    for rows in _partitions(statement, size):
+        for row in rows:
+            yield {'type': 'episode', 'id': row.id, 'anime_id': row.anime_id, 'number': row.number,
+                   'url': episode_url.format(row.id), 'updated_at': isoformat(row.updated_at)}
+
+def deleted_rows(since):
+    # Silinen anime/bölümler log tablosundan; silinen animenin bölümleri ayrıca listelenmez.
+    # Loglar arşive taşındıktan sonra (audit.RETENTION_DAYS) o tarihten eski since için tam dışa aktarma gerekir.
+    if since is None:
+        return
+    for target_type, target_id, timestamp in db.session.execute(select(Log.target_type, Log.target_id, Log.timestamp).where(
+            Log.action == 'delete', Log.target_type.in_(('anime', 'episode')), Log.timestamp > since).order_by(Log.timestamp, Log.id)):
+        yield {'type': 'deleted', 'kind': target_type, 'id': target_id, 'deleted_at': isoformat(timestamp)}
+
+def buffered(pieces, size=CHUNK_BYTES):
+    buffer, length = [], 0
+    for piece in pieces:
+        buffer.append(piece)
+        length += len(piece)
+        if length >= size:
+            yield ''.join(buffer).encode()
+            buffer, length = [], 0
+    if buffer:
+        yield ''.join(buffer).encode()
+
+def gzip_stream(chunks, level=6):
+    # Akış halinde gzip; her parça sıkıştırılıp hemen gönderilir (tüm yanıt bellekte tutulmaz)
+    compressor = zlib.compressobj(level, zlib.DEFLATED, 31)
+    for chunk in chunks:
+        data = compressor.compress(chunk)
+        if data:
+            yield data
+    yield compressor.flush()
+
+def sitemap_pages(kind):
+    # [(sayfa, son değişiklik)]; sayfa n, id'si (n*50000, (n+1)*50000] aralığındaki kayıtlardır.
+    # Aralıklar id'ye göre olduğundan sayfa OFFSET olmadan birincil anahtar aralığından okunur.
+    model = Anime if kind == 'anime' else Episode
+    page = ((model.id - 1) // SITEMAP_PAGE_SIZE).label('page')
+    return db.session.execute(select(page, func.max(model.updated_at)).group_by(page).order_by(page)).all()
+
+def sitemap_index(entries):
+    # entries: [(adres, son değişiklik)]
+    yield f'<?xml version="1.0" encoding="UTF-8"?>\n<sitemapindex xmlns="{SITEMAP_NS}">\n'
+    for loc, lastmod in entries:
+        yield f'<sitemap><loc>{escape(loc)}</loc>' + (f'<lastmod>{isoformat(lastmod)}</lastmod>' if lastmod else '') + '</sitemap>\n'
+    yield '</sitemapindex>\n'
+
+def sitemap_urls(kind, page, url, size):
+    model = Anime if kind == 'anime' else Episode
+    yield f'<?xml version="1.0" encoding="UTF-8"?>\n<urlset xmlns="{SITEMAP_NS}">\n'
+    statement = select(model.id, model.updated_at).where(
+        model.id > page * SITEMAP_PAGE_SIZE, model.id <= (page + 1) * SITEMAP_PAGE_SIZE).order_by(model.id)
+    for rows in _partitions(statement, size):
+        for row in rows:
+            yield (f'<url><loc>{escape(url.format(row.id))}</loc>'
+                   + (f'<lastmod>{row.updated_at.date().isoformat()}</lastmod>' if row.updated_at else '') + '</url>\n')
+    yield '</urlset>\n'
+
+class CatalogExport:
+    # Anime, tür ve bölümlerin NDJSON dökümü ve sitemap'i; veritabanı parça parça okunup yanıt akış halinde
+    # yazılır (bellek kullanımı katalog büyüklüğünden bağımsızdır). flask build-export aynı çıktıları
+    # EXPORT_DIR'e gzip'li dosyalar olarak yazar; katalog o zamandan beri değişmediyse dosyalar sunulur.
+    def __init__(self, app=None):
+        self.app = None
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        app.config.setdefault('EXPORT_DIR', os.path.join(app.instance_path, 'export'))
+        app.config.setdefault('EXPORT_YIELD_PER', 1000)
+        app.config.setdefault('EXPORT_COMPRESS_LEVEL', 6)
+        # İstemcilere önerilen bir sonraki since, son değişiklikten bu kadar saniye öncesidir (commit'i
+        # dışa aktarma sırasında tamamlanan yazmalar kaçmasın; tekrar gelen kayıtlar zararsızdır)
+        app.config.setdefault('EXPORT_SINCE_OVERLAP', 60)
+        self.app = app
+        app.extensions['catalog_export'] = self
+
+    @property
+    def size(self):
+        return self.app.config['EXPORT_YIELD_PER']
+
+    def ndjson(self, since, types, modified, urls, excluded_ids):
+        # İlk satır meta bilgidir; next_since bir sonraki artımlı dışa aktarmada kullanılır
+        overlap = timedelta(seconds=self.app.config['EXPORT_SINCE_OVERLAP'])
+        yield json.dumps({'type': 'meta', 'generated_at': isoformat(datetime.utcnow()), 'since': isoformat(since),
+                          'last_modified': isoformat(modified), 'next_since': isoformat(modified - overlap) if modified else None,
+                          'types': list(types)}, ensure_ascii=False) + '\n'
+        sources = {
+            'genre': lambda: genre_rows(excluded_ids),
+            'anime': lambda: anime_rows(since, urls['anime'], excluded_ids, self.size),
+            'episode': lambda: episode_rows(since, urls['episode'], self.size),
+            'deleted': lambda: deleted_rows(since),
+        }
+        for kind in TYPES:
+            if kind in types:
+                for row in sources[kind]():
+                    yield json.dumps(row, ensure_ascii=False) + '\n'
+
+    def manifest(self):
+        try:
+            with open(os.path.join(self.app.config['EXPORT_DIR'], MANIFEST)) as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return None
+
+    def prebuilt(self, name, modified, base_url):
+        # Önceden üretilmiş dosya, katalog o zamandan beri değişmediyse ve aynı adres için üretildiyse kullanılır
+        manifest = self.manifest()
+        if manifest is None or manifest.get('last_modified') != isoformat(modified) or manifest.get('base_url') != base_url:
+            return None
+        path = os.path.join(self.app.config['EXPORT_DIR'], name + '.gz')
+        return path if name in manifest.get('files', ()) and os.path.isfile(path) else None
+
+    def write(self, name, chunks):
+        # gzip dosyası geçici adla yazılıp yerine taşınır; (sıkıştırılmamış bayt, dosya bayt) döner
+        path = os.path.join(self.app.config['EXPORT_DIR'], name + '.gz')
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        temporary = f'{path}.{os.getpid()}.tmp'
+        size = 0
+        with gzip.open(temporary, 'wb', compresslevel=self.app.config['EXPORT_COMPRESS_LEVEL']) as f:
+            for chunk in chunks:
+                f.write(chunk)
+                size += len(chunk)
+        os.replace(temporary, path)
+        return size, os.path.getsize(path)
+
+    def build(self, modified, base_url, files):
+        # files: {ad: parça üreteci fabrikası}; manifest en son yazılır, yarım kalan derleme sunulmaz
+        written = {}
+        for name, chunks in files.items():
+            written[name] = self.write(name, chunks())
+        write_atomic(os.path.join(self.app.config['EXPORT_DIR'], MANIFEST), json.dumps({
+            'last_modified': isoformat(modified), 'base_url': base_url, 'built_at': isoformat(datetime.utcnow()),
+            'files': sorted(written)}, indent=2).encode())
+        return written
@@ -1,11 +1,13 @@
 from flask_wtf import FlaskForm
+from flask_wtf.file import FileAllowed, FileField, FileRequired
 from wtforms import StringField, PasswordField, TextAreaField, SubmitField, BooleanField, SelectField, IntegerField
 from wtforms.validators import DataRequired, Length, Optional, EqualTo, ValidationError
 from wtforms_sqlalchemy.fields import QuerySelectMultipleField
-from models import Genre, User
+from models import User
+import genres
 
 def get_genres():
-    return Genre.query.all()
+    return genres.registry().genres
 
 class RegistrationForm(FlaskForm):
     username = StringField('Kullanıcı Adı', validators=[DataRequired(), Length(min=3, max=20)])
@@ -28,6 +30,10 @@ class EpisodeForm(FlaskForm):
     sources = TextAreaField("Kaynaklar (virgülle ayrılmış URL'ler)", validators=[DataRequired()])
     submit = SubmitField('Bölüm Ekle')
 
+class EpisodeImportForm(FlaskForm):
+    file = FileField('Bölüm Dosyası (CSV veya JSON)', validators=[FileRequired(), FileAllowed(['csv', 'json'], 'Sadece CSV veya JSON dosyası yüklenebilir.')])
+    submit = SubmitField('Bölümleri İçe Aktar')
+
 class AnimeForm(FlaskForm):
     name = StringField('Anime Adı', validators=[DataRequired(), Length(min=1, max=150)])
     description = TextAreaField('Açıklama', validators=[DataRequired()])
@@ -42,7 +48,7 @@ class AnimeForm(FlaskForm):
         ('Film', 'Film'),
         ('OVA', 'OVA')
     ], validators=[Optional()])
-    genres = QuerySelectMultipleField('Türler', query_factory=get_genres, get_label='name', allow_blank=True)
+    genres = QuerySelectMultipleField('Türler', query_factory=get_genres, get_pk=lambda genre: genre.id, get_label='name', allow_blank=True)
     mal_score = StringField('MyAnimeList Puanı', validators=[Optional()])
     mal_url = StringField('MyAnimeList URL', validators=[Optional()])
     submit = SubmitField('Anime Ekle/Güncelle')
@@ -61,6 +67,9 @@ class AnimeSearchForm(FlaskForm):
         ('name_desc', 'İsme Göre (Z-A)'),
         ('rating_desc', 'Puana Göre (En Yüksek)'),
         ('year_desc', 'Yıla Göre (En Yeni)'),
+        ('top_rated', 'En Beğenilenler'),
+        ('trending', 'Bu Hafta Trend'),
+        ('relevance', 'Alaka Düzeyine Göre'),
     ], default='name_asc', validators=[Optional()])
     submit = SubmitField('Filtrele')
 
@@ -0,0 +1,48 @@
+from collections import namedtuple
+from flask import current_app
+from sqlalchemy import select
+from models import db, SPECIAL_GENRES, Genre, anime_genres
+
+GenreEntry = namedtuple('GenreEntry', 'id name')
+# Türler sadece yönetici panelinden değişir; değişince 'genres' etiketiyle hemen yenilenir. Bellek önbelleği
+# süreç başınadır ve etiket yenilemesi diğer worker'lara ulaşmaz; orada kopya kısa süre tutulur
+REGISTRY_TTL = 24 * 3600
+LOCAL_REGISTRY_TTL = 60
+
+class GenreRegistry:
+    # Tür tablosunun bellekteki kopyası: isme göre sıralı liste, id/isim eşlemeleri ve özel türler
+    def __init__(self, rows):
+        self.genres = [GenreEntry(genre_id, name) for genre_id, name in rows]
+        self.by_id = {genre.id: genre for genre in self.genres}
+        self.by_name = {genre.name: genre for genre in self.genres}
+        self.special_ids = frozenset(genre.id for genre in self.genres if genre.name in SPECIAL_GENRES)
+
+    def special_id(self, name):
+        genre = self.by_name.get(name)
+        return genre.id if genre else None
+
+    def choices(self, include_special=True):
+        return [(str(genre.id), genre.name) for genre in self.genres if include_special or genre.id not in self.special_ids]
+
+    def excluding(self, genre_ids):
+        genre_ids = set(genre_ids)
+        return [genre for genre in self.genres if genre.id not in genre_ids]
+
+def load():
+    return GenreRegistry(db.session.execute(select(Genre.id, Genre.name).order_by(Genre.name)).all())
+
+def registry_ttl():
+    return REGISTRY_TTL if current_app.extensions['page_cache'].backend.shared else LOCAL_REGISTRY_TTL
+
+def registry():
+    return current_app.extensions['page_cache'].get_or_set('genre_registry', ['genres'], load, ttl=registry_ttl())
+
+def curated_ids(name, limit):
+    # Özel türdeki (vitrin) animelerin sıralı id listesi; anime_genres'in (genre_id, anime_id)
+    # indeksinden okunur ve tür etiketiyle önbelleklenir (anime türe eklenip çıkarılınca düşer)
+    genre_id = registry().special_id(name)
+    if genre_id is None:
+        return []
+    return current_app.extensions['page_cache'].get_or_set(f'curated:{genre_id}:{limit}', [f'genre:{genre_id}'], lambda: list(
+        db.session.execute(select(anime_genres.c.anime_id).where(anime_genres.c.genre_id == genre_id).order_by(
+            anime_genres.c.anime_id).limit(limit)).scalars()), ttl=registry_ttl())
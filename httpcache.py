@@ -0,0 +1,83 @@
+import gzip
+import hashlib
+import os
+
+from flask import request
+from assets import brotli_module
+
+# Sıkıştırılan dinamik yanıtlar; SSE akışı ve dosyalar (direct_passthrough) hiç sıkıştırılmaz
+COMPRESS_MIMETYPES = {'application/json', 'text/html', 'application/x-ndjson', 'application/xml', 'text/xml', 'text/plain'}
+
+def not_modified(tag):
+    # If-None-Match zayıf karşılaştırılır; sıkıştırılan yanıtların ETag'i zayıf (W/"...") gider
+    return request.if_none_match.contains_weak(tag)
+
+def state_tag(*parts):
+    # Sayfanın veritabanındaki değişiklik izinden (ve sürüm bilgilerinden) kısa, kararlı bir ETag
+    return hashlib.sha1(repr(parts).encode()).hexdigest()[:20]
+
+def revalidate(response, tag):
+    # Tarayıcı kopyayı saklar ama her kullanımda sorar; değişmediyse gövdesiz 304 alır
+    response.set_etag(tag)
+    response.cache_control.no_cache = True
+    return response
+
+class HttpCache:
+    def __init__(self, app=None):
+        self.app = None
+        self._release = None
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        app.config.setdefault('HTTP_COMPRESS_ENABLED', True)
+        app.config.setdefault('HTTP_COMPRESS_MIN_SIZE', 1024)
+        app.config.setdefault('HTTP_COMPRESS_LEVEL', 6)
+        app.config.setdefault('HTTP_BROTLI_QUALITY', 4)
+        # Dağıtım sürümü HTML ETag'lerine katılır; verilmezse şablon ve kaynak dosyalarından türetilir
+        app.config.setdefault('RELEASE', os.environ.get('RELEASE') or os.environ.get('VERCEL_GIT_COMMIT_SHA'))
+        self.app = app
+        app.extensions['http_cache'] = self
+        app.after_request(self.compress)
+
+    @property
+    def release(self):
+        if self._release is None:
+            self._release = self.app.config['RELEASE'] or self.fingerprint()
+        return self._release
+
+    def fingerprint(self):
+        # Şablon veya kod değişince (yeni dağıtım) eski ETag'ler geçersiz olur; içerik değil boyut/mtime okunur
+        root = self.app.root_path
+        entries = []
+        for directory in (root, os.path.join(root, self.app.template_folder or 'templates')):
+            for name in sorted(os.listdir(directory)):
+                if name.endswith(('.py', '.html')):
+                    stat = os.stat(os.path.join(directory, name))
+                    entries.append(f'{name}:{stat.st_size}:{stat.st_mtime_ns}')
+        return hashlib.sha1('|'.join(entries).encode()).hexdigest()[:10]
+
+    def compress(self, response):
+        config = self.app.config
+        if (not config['HTTP_COMPRESS_ENABLED'] or response.direct_passthrough or response.is_streamed
+                or response.status_code != 200 or 'Content-Encoding' in response.headers
+                or response.mimetype not in COMPRESS_MIMETYPES):
+            return response
+        response.vary.add('Accept-Encoding')
+        accepted = request.accept_encodings
+        brotli = brotli_module() if 'br' in accepted else None
+        if brotli is None and 'gzip' not in accepted:
+            return response
+        data = response.get_data()
+        if len(data) < config['HTTP_COMPRESS_MIN_SIZE']:
+            return response
+        if brotli is not None:
+            response.set_data(brotli.compress(data, quality=config['HTTP_BROTLI_QUALITY']))
+            response.headers['Content-Encoding'] = 'br'
+        else:
+            response.set_data(gzip.compress(data, compresslevel=config['HTTP_COMPRESS_LEVEL'], mtime=0))
+            response.headers['Content-Encoding'] = 'gzip'
+        etag, weak = response.get_etag()
+        if etag and not weak:
+            response.set_etag(etag, weak=True)
+        return response
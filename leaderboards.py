@@ -0,0 +1,230 @@
+import math
+import threading
+from datetime import datetime, timedelta
+from sqlalchemy import bindparam, delete, func, insert, literal, select, union_all, update
+from models import db, Anime, AnimeScore, JobState, TrendEvent, WatchEvent
+
+# Trend skoru log2(Σ ağırlık · 2^((t - EPOCH) / yarı ömür)) olarak saklanır. Şimdiki sönümlü skor
+# 2^(trending - (şimdi - EPOCH) / yarı ömür) olur; çıkarılan terim her anime için aynı olduğundan
+# sıralama için satırların periyodik olarak yeniden yazılması gerekmez, olaylar sadece eklenir.
+EPOCH = datetime(2024, 1, 1)
+# Hiç etkileşimi olmayan animeler (sütun NOT NULL; sıralama tek indeks taramasıyla kalır)
+NO_TREND = -1e9
+VIEWS_JOB = 'leaderboard_views'
+EVENTS_JOB = 'leaderboard_events'
+MEAN_JOB = 'leaderboard_mean'
+PROCESS_CHUNK_SIZE = 5000
+WRITE_CHUNK_SIZE = 1000
+
+def exponent(at, half_life):
+    return (at - EPOCH).total_seconds() / half_life
+
+def log2_sum(a, b):
+    # log2(2^a + 2^b), taşma olmadan
+    high, low = max(a, b), min(a, b)
+    return high + math.log2(1.0 + 2.0 ** (low - high))
+
+class Leaderboard:
+    # Oy, izleme listesi ve bölüm görüntüleme olaylarından iki sıralama tutulur: oy sayısıyla ağırlıklı
+    # (bayesian) puan ve zaman-sönümlü trend. Sayfalar sadece anime_score indekslerinden okur; olaylar
+    # arka plandaki worker (veya flask refresh-leaderboards) tarafından artımlı olarak işlenir.
+    def __init__(self, app=None):
+        self.app = None
+        self.on_update = None
+        self._thread = None
+        self._thread_lock = threading.Lock()
+        self._stop = threading.Event()
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        # Bayesian ortalamada her animeye eklenen, katalog ortalamasında sanal oy sayısı
+        app.config.setdefault('LEADERBOARD_PRIOR_VOTES', 10)
+        app.config.setdefault('LEADERBOARD_HALF_LIFE_HOURS', 72)
+        app.config.setdefault('LEADERBOARD_WEIGHTS', {'view': 1.0, 'watchlist': 3.0, 'rating': 2.0})
+        # Anasayfa rafında gösterilmesi için gereken en düşük şimdiki trend skoru (ör. 1 = şimdi 1 görüntüleme)
+        app.config.setdefault('LEADERBOARD_TRENDING_MIN', 1.0)
+        # Olaylar bu süre tutulur (yeniden hesaplama için); 10 yarı ömürden sonra katkı binde birin altındadır
+        app.config.setdefault('LEADERBOARD_RETENTION_DAYS', 30)
+        # Katalog ortalaması bu kadar değişince tüm bayesian puanlar yeniden hesaplanır
+        app.config.setdefault('LEADERBOARD_MEAN_TOLERANCE', 0.01)
+        app.config.setdefault('LEADERBOARD_REFRESH_INTERVAL', 60)
+        app.config.setdefault('LEADERBOARD_WORKER_ENABLED', True)
+        self.app = app
+        app.extensions['leaderboard'] = self
+        app.before_request(self._ensure_worker)
+
+    @property
+    def half_life(self):
+        return self.app.config['LEADERBOARD_HALF_LIFE_HOURS'] * 3600
+
+    def weight(self, kind):
+        return self.app.config['LEADERBOARD_WEIGHTS'].get(kind, 1.0)
+
+    # record/remove_anime çağıranın transaction'ına katılır; commit çağıran tarafından yapılır
+    def record(self, anime_id, kind, factor=1.0):
+        db.session.execute(insert(TrendEvent).values(anime_id=anime_id, kind=kind, weight=self.weight(kind) * factor,
+                                                     created_at=datetime.utcnow()))
+
+    def remove_anime(self, anime_id):
+        db.session.execute(delete(AnimeScore).where(AnimeScore.anime_id == anime_id))
+        db.session.execute(delete(TrendEvent).where(TrendEvent.anime_id == anime_id))
+
+    def bayesian(self, mean):
+        prior = float(self.app.config['LEADERBOARD_PRIOR_VOTES'])
+        return (prior * mean + func.coalesce(Anime.rating_sum, 0)) / (prior + func.coalesce(Anime.rating_count, 0))
+
+    def catalog_mean(self):
+        total, count = db.session.execute(select(func.sum(Anime.rating_sum), func.sum(Anime.rating_count))).one()
+        return total / count if count else 0.0
+
+    def trending_floor(self, now=None):
+        # Şimdiki skoru LEADERBOARD_TRENDING_MIN'den düşük olanlar (saklanan ölçekte)
+        return exponent(now or datetime.utcnow(), self.half_life) + math.log2(self.app.config['LEADERBOARD_TRENDING_MIN'])
+
+    def _state(self, name):
+        return db.session.get(JobState, name) or JobState(name=name, value=None)
+
+    def _save(self, state, value, now):
+        state.value = str(value)
+        state.updated_at = now
+        db.session.merge(state)
+
+    def _events(self, model, state, now, increments):
+        # İşlenmemiş olayların katkıları anime başına log2 ölçeğinde toplanır; id sırasıyla parça parça
+        last_id = int(state.value or 0)
+        columns = [model.id, model.anime_id, model.created_at]
+        if model is TrendEvent:
+            columns.append(TrendEvent.weight)
+        processed = 0
+        while True:
+            rows = db.session.execute(select(*columns).where(model.id > last_id).order_by(model.id).limit(PROCESS_CHUNK_SIZE)).all()
+            if not rows:
+                break
+            for row in rows:
+                anime_id, created_at = row[1], row[2]
+                event_weight = row[3] if model is TrendEvent else self.weight('view')
+                if event_weight <= 0:
+                    continue
+                value = math.log2(event_weight) + exponent(created_at, self.half_life)
+                increments[anime_id] = log2_sum(increments[anime_id], value) if anime_id in increments else value
+            last_id = rows[-1].id
+            processed += len(rows)
+        if processed:
+            self._save(state, last_id, now)
+        return processed
+
+    def refresh(self):
+        # Yeni animelere satır açar, oyu değişenlerin bayesian puanını ve olay gelen animelerin trend
+        # skorunu günceller. Güncellenen skor satırı sayısını döner (0 ise listeler değişmemiştir).
+        now = datetime.utcnow()
+        mean = self.catalog_mean()
+        bayesian = self.bayesian(mean)
+        added = db.session.execute(insert(AnimeScore).from_select(
+            ['anime_id', 'bayesian', 'trending', 'updated_at'],
+            select(Anime.id, bayesian, literal(NO_TREND), literal(now)).where(~select(AnimeScore.anime_id).where(
+                AnimeScore.anime_id == Anime.id).exists()))).rowcount
+
+        increments = {}
+        events = self._state(EVENTS_JOB)
+        rated_from = int(events.value or 0)
+        self._events(TrendEvent, events, now, increments)
+        self._events(WatchEvent, self._state(VIEWS_JOB), now, increments)
+
+        rescore = select(bayesian).where(Anime.id == AnimeScore.anime_id).scalar_subquery()
+        mean_state = self._state(MEAN_JOB)
+        if mean_state.value is None or abs(float(mean_state.value) - mean) > self.app.config['LEADERBOARD_MEAN_TOLERANCE']:
+            # Katalog ortalaması kaydı: tüm puanlar tek UPDATE ile yeniden hesaplanır
+            rescored = db.session.execute(update(AnimeScore).values(bayesian=rescore, updated_at=now)).rowcount
+            self._save(mean_state, mean, now)
+        else:
+            rated = db.session.execute(select(TrendEvent.anime_id).where(
+                TrendEvent.id > rated_from, TrendEvent.kind == 'rating').distinct()).scalars().all()
+            rescored = 0
+            for start in range(0, len(rated), WRITE_CHUNK_SIZE):
+                rescored += db.session.execute(update(AnimeScore).where(AnimeScore.anime_id.in_(rated[start:start + WRITE_CHUNK_SIZE])).values(
+                    bayesian=rescore, updated_at=now)).rowcount
+
+        rows = []
+        if increments:
+            ids = list(increments)
+            current = {}
+            for start in range(0, len(ids), WRITE_CHUNK_SIZE):
+                current.update(db.session.execute(select(AnimeScore.anime_id, AnimeScore.trending).where(
+                    AnimeScore.anime_id.in_(ids[start:start + WRITE_CHUNK_SIZE]))).all())
+            rows = [{'key': anime_id, 'trending': log2_sum(current[anime_id], value), 'updated_at': now}
+                    for anime_id, value in increments.items() if anime_id in current]
+            table = AnimeScore.__table__
+            for start in range(0, len(rows), WRITE_CHUNK_SIZE):
+                db.session.connection().execute(table.update().where(table.c.anime_id == bindparam('key')).values(
+                    trending=bindparam('trending'), updated_at=bindparam('updated_at')), rows[start:start + WRITE_CHUNK_SIZE])
+
+        # Saklama süresini aşan ve işlenmiş olaylar silinir
+        cutoff = now - timedelta(days=self.app.config['LEADERBOARD_RETENTION_DAYS'])
+        db.session.execute(delete(TrendEvent).where(TrendEvent.created_at < cutoff, TrendEvent.id <= int(events.value or 0)))
+        db.session.commit()
+        return added + rescored + len(rows)
+
+    def rebuild(self):
+        # Trend skorları saklanan olaylardan (ve saklama süresi içindeki görüntülemelerden) baştan hesaplanır
+        now = datetime.utcnow()
+        cutoff = now - timedelta(days=self.app.config['LEADERBOARD_RETENTION_DAYS'])
+        first_view = db.session.execute(select(func.min(WatchEvent.id)).where(WatchEvent.created_at >= cutoff)).scalar()
+        if first_view is None:
+            first_view = (db.session.execute(select(func.max(WatchEvent.id))).scalar() or 0) + 1
+        db.session.execute(update(AnimeScore).values(trending=NO_TREND))
+        self._save(self._state(VIEWS_JOB), first_view - 1, now)
+        self._save(self._state(EVENTS_JOB), 0, now)
+        db.session.execute(delete(JobState).where(JobState.name == MEAN_JOB))
+        db.session.commit()
+        return self.refresh()
+
+    def run_once(self):
+        updated = self.refresh()
+        if updated and self.on_update is not None:
+            self.on_update()
+        return updated
+
+    def run_forever(self):
+        while not self._stop.is_set():
+            try:
+                self.run_once()
+            except Exception:
+                self.app.logger.exception('Sıralama listesi worker hatası')
+                db.session.rollback()
+            finally:
+                db.session.remove()
+            self._stop.wait(self.app.config['LEADERBOARD_REFRESH_INTERVAL'])
+
+    def _run(self):
+        with self.app.app_context():
+            self.run_forever()
+
+    def _ensure_worker(self):
+        # Worker ilk istekte başlatılır; kapalıysa listeler flask refresh-leaderboards ile (cron) güncellenir
+        if not self.app.config['LEADERBOARD_WORKER_ENABLED'] or (self._thread is not None and self._thread.is_alive()):
+            return
+        with self._thread_lock:
+            if self._thread is None or not self._thread.is_alive():
+                self._stop.clear()
+                self._thread = threading.Thread(target=self._run, name='leaderboard', daemon=True)
+                self._thread.start()
+
+    def stop(self, timeout=None):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(timeout)
+
+def leaderboard_animes(query, floor, limit=6):
+    # (trend, en beğenilenler) rafları tek sorguda: her liste kendi indeksinden sınırlı bir alt sorgu,
+    # UNION ALL ile birleşip anime kartlarına bağlanır
+    trending = select(AnimeScore.anime_id, literal(0).label('shelf'), AnimeScore.trending.label('score')).where(
+        AnimeScore.trending >= floor).order_by(AnimeScore.trending.desc(), AnimeScore.anime_id.desc()).limit(limit).subquery()
+    top_rated = select(AnimeScore.anime_id, literal(1).label('shelf'), AnimeScore.bayesian.label('score')).order_by(
+        AnimeScore.bayesian.desc(), AnimeScore.anime_id.desc()).limit(limit).subquery()
+    ranked = union_all(select(trending), select(top_rated)).subquery()
+    shelves = ([], [])
+    for anime, shelf in query.join(ranked, ranked.c.anime_id == Anime.id).add_columns(ranked.c.shelf).order_by(
+            ranked.c.shelf, ranked.c.score.desc(), ranked.c.anime_id.desc()):
+        shelves[shelf].append(anime)
+    return shelves
@@ -0,0 +1,293 @@
+import json
+import os
+import threading
+import time
+import uuid
+from datetime import datetime, timedelta
+
+from sqlalchemy import func, insert, literal, select
+from models import db, Anime, MalJob, MalCacheEntry
+from search import tokenize
+
+# Worker'ı çöken işler bu süreden sonra tekrar kuyruğa alınır (saniye)
+CLAIM_TIMEOUT = 600
+# Periyodik puan yenilemesinin gerekip gerekmediği bu aralıkla kontrol edilir (saniye)
+REFRESH_CHECK_INTERVAL = 60
+
+class JikanError(Exception):
+    pass
+
+class TokenBucket:
+    # Saniyede `rate` token dolar; token yoksa çağıran thread bekler
+    def __init__(self, rate, capacity=None):
+        self.rate = float(rate)
+        self.capacity = float(capacity or rate)
+        self._tokens = self.capacity
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def acquire(self):
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+                self._updated = now
+                if self._tokens >= 1:
+                    self._tokens -= 1
+                    return
+                wait = (1 - self._tokens) / self.rate
+            time.sleep(wait)
+
+    def pause(self, seconds):
+        # 429 sonrası kova eksiye çekilir; Retry-After dolana kadar yeni istek çıkmaz
+        with self._lock:
+            self._tokens = min(self._tokens, 0) - seconds * self.rate
+
+def normalize_title(title):
+    return ' '.join(tokenize(title))
+
+def _retry_after(response, default):
+    try:
+        return max(float(response.headers.get('Retry-After', default)), 0)
+    except ValueError:
+        return default
+
+class JikanClient:
+    # Bağlantılar tek bir requests.Session üzerinden yeniden kullanılır. requests ilk istemci
+    # oluşturulurken import edilir; uygulamanın soğuk açılışına eklenmez.
+    def __init__(self, base_url, rate_per_second=3, timeout=10, retries=3, backoff=1.0):
+        import requests
+        from requests.adapters import HTTPAdapter
+        self.base_url = base_url.rstrip('/')
+        self.timeout = timeout
+        self.retries = retries
+        self.backoff = backoff
+        self.bucket = TokenBucket(rate_per_second)
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=4)
+        self.session.mount('http://', adapter)
+        self.session.mount('https://', adapter)
+        self.requests_made = 0
+
+    def _get(self, path, params=None):
+        import requests
+        url = f'{self.base_url}{path}'
+        error = None
+        for attempt in range(self.retries + 1):
+            self.bucket.acquire()
+            self.requests_made += 1
+            delay = self.backoff * 2 ** attempt
+            try:
+                response = self.session.get(url, params=params, timeout=self.timeout)
+            except requests.exceptions.RequestException as e:
+                error = e
+            else:
+                if response.status_code == 200:
+                    return response.json().get('data')
+                if response.status_code == 404:
+                    return None
+                error = JikanError(f'HTTP {response.status_code}')
+                if response.status_code == 429:
+                    self.bucket.pause(_retry_after(response, delay))
+                    continue
+                if response.status_code < 500:
+                    break
+            if attempt < self.retries:
+                time.sleep(delay)
+        raise JikanError(f'{url}: {error}')
+
+    def _cached(self, key, max_age, fetch):
+        # Bulunamayan sonuçlar da (payload NULL) önbelleklenir, aynı başlık tekrar sorulmaz
+        now = datetime.utcnow()
+        entry = db.session.get(MalCacheEntry, key)
+        if entry is not None and entry.fetched_at >= now - timedelta(seconds=max_age):
+            return json.loads(entry.payload) if entry.payload else None
+        data = fetch()
+        db.session.merge(MalCacheEntry(key=key, payload=json.dumps(data) if data is not None else None, fetched_at=now))
+        return data
+
+    def search_anime(self, title, max_age):
+        def fetch():
+            results = self._get('/anime', {'q': title, 'limit': 1})
+            return results[0] if results else None
+        data = self._cached(f'q:{normalize_title(title)}', max_age, fetch)
+        if data and data.get('mal_id'):
+            db.session.merge(MalCacheEntry(key=f"id:{data['mal_id']}", payload=json.dumps(data), fetched_at=datetime.utcnow()))
+        return data
+
+    def get_anime(self, mal_id, max_age):
+        return self._cached(f'id:{mal_id}', max_age, lambda: self._get(f'/anime/{mal_id}'))
+
+class MalEnricher:
+    # Kayıt sırasında Jikan'a gidilmez; iş kuyruğa yazılır ve arka plandaki worker işler
+    def __init__(self, app=None):
+        self.app = None
+        self._client = None
+        self.worker_id = f'{os.getpid()}-{uuid.uuid4().hex[:8]}'
+        self._thread = None
+        self._thread_lock = threading.Lock()
+        self._wake = threading.Event()
+        self._stop = threading.Event()
+        self._next_refresh_check = 0
+        self.on_update = None
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        app.config.setdefault('JIKAN_BASE_URL', os.environ.get('JIKAN_BASE_URL', 'https://api.jikan.moe/v4'))
+        app.config.setdefault('MAL_RATE_PER_SECOND', 3)
+        app.config.setdefault('MAL_HTTP_TIMEOUT', 10)
+        app.config.setdefault('MAL_HTTP_RETRIES', 3)
+        app.config.setdefault('MAL_BACKOFF', 1.0)
+        app.config.setdefault('MAL_BATCH_SIZE', 20)
+        app.config.setdefault('MAL_MAX_ATTEMPTS', 5)
+        app.config.setdefault('MAL_CACHE_TTL', 7 * 24 * 3600)
+        app.config.setdefault('MAL_REFRESH_INTERVAL', 24 * 3600)
+        app.config.setdefault('MAL_POLL_INTERVAL', 5)
+        app.config.setdefault('MAL_WORKER_ENABLED', True)
+        self.app = app
+        app.extensions['mal_enricher'] = self
+
+    @property
+    def client(self):
+        if self._client is None:
+            config = self.app.config
+            self._client = JikanClient(config['JIKAN_BASE_URL'], rate_per_second=config['MAL_RATE_PER_SECOND'],
+                                       timeout=config['MAL_HTTP_TIMEOUT'], retries=config['MAL_HTTP_RETRIES'],
+                                       backoff=config['MAL_BACKOFF'])
+        return self._client
+
+    # enqueue çağıranın transaction'ına katılır; commit'ten sonra wake() çağrılmalıdır
+    def enqueue(self, anime_id, kind='lookup'):
+        pending = db.session.query(MalJob.id).filter_by(anime_id=anime_id, kind=kind, status='pending').first()
+        if pending is None:
+            db.session.add(MalJob(anime_id=anime_id, kind=kind, run_after=datetime.utcnow()))
+
+    def enqueue_refresh(self):
+        # mal_id'si olan ve bekleyen yenileme işi bulunmayan tüm animeler tek INSERT ... SELECT ile eklenir
+        queued = select(MalJob.anime_id).where(MalJob.kind == 'refresh', MalJob.status.in_(('pending', 'running')))
+        rows = select(Anime.id, literal('refresh'), literal('pending'), literal(0), literal(datetime.utcnow())).where(
+            Anime.mal_id.isnot(None), Anime.id.notin_(queued))
+        result = db.session.execute(insert(MalJob).from_select(['anime_id', 'kind', 'status', 'attempts', 'run_after'], rows))
+        # Biten işler en az bir yenileme aralığı saklanır; son yenilemenin zamanı buradan okunur
+        keep_after = datetime.utcnow() - timedelta(seconds=2 * self.app.config['MAL_REFRESH_INTERVAL'])
+        MalJob.query.filter(MalJob.status == 'done', MalJob.created_at < keep_after).delete(synchronize_session=False)
+        db.session.commit()
+        return result.rowcount
+
+    def refresh_due(self):
+        last = db.session.query(func.max(MalJob.created_at)).filter(MalJob.kind == 'refresh').scalar()
+        return last is None or last < datetime.utcnow() - timedelta(seconds=self.app.config['MAL_REFRESH_INTERVAL'])
+
+    def claim(self, limit):
+        now = datetime.utcnow()
+        MalJob.query.filter(MalJob.status == 'running', MalJob.claimed_at < now - timedelta(seconds=CLAIM_TIMEOUT)).update(
+            {'status': 'pending', 'claimed_by': None}, synchronize_session=False)
+        ids = [row.id for row in db.session.query(MalJob.id).filter(MalJob.status == 'pending', MalJob.run_after <= now)
+               .order_by(MalJob.id).limit(limit)]
+        if ids:
+            # status='pending' koşulu, aynı işi başka bir worker'ın da almasını engeller
+            MalJob.query.filter(MalJob.id.in_(ids), MalJob.status == 'pending').update(
+                {'status': 'running', 'claimed_by': self.worker_id, 'claimed_at': now}, synchronize_session=False)
+        db.session.commit()
+        if not ids:
+            return []
+        return MalJob.query.filter_by(claimed_by=self.worker_id, status='running').order_by(MalJob.id).all()
+
+    def enrich(self, anime, kind):
+        config = self.app.config
+        if kind == 'refresh' and anime.mal_id:
+            data = self.client.get_anime(anime.mal_id, config['MAL_REFRESH_INTERVAL'])
+            if not data or data.get('score') == anime.mal_score:
+                return False
+            anime.mal_score = data.get('score')
+            return True
+        # Yönetici puanı elle girdiyse arama yapılmaz (eski update_mal_data davranışı)
+        if anime.mal_score:
+            return False
+        data = self.client.search_anime(anime.name, config['MAL_CACHE_TTL'])
+        if not data:
+            return False
+        anime.mal_id = data.get('mal_id')
+        anime.mal_score = data.get('score')
+        anime.mal_url = data.get('url')
+        return True
+
+    def run_once(self):
+        # Bir grup işi alır, hepsini tek commit ile yazar; işlenen iş sayısını döner
+        config = self.app.config
+        jobs = self.claim(config['MAL_BATCH_SIZE'])
+        updated = []
+        for job in jobs:
+            anime = db.session.get(Anime, job.anime_id)
+            try:
+                if anime is not None and self.enrich(anime, job.kind):
+                    updated.append(anime.id)
+                job.status = 'done'
+                job.last_error = None
+            except JikanError as e:
+                job.attempts += 1
+                job.last_error = str(e)
+                if job.attempts >= config['MAL_MAX_ATTEMPTS']:
+                    job.status = 'failed'
+                else:
+                    job.status = 'pending'
+                    job.run_after = datetime.utcnow() + timedelta(seconds=config['MAL_BACKOFF'] * 30 * 2 ** job.attempts)
+            job.claimed_by = None
+        db.session.commit()
+        if updated and self.on_update is not None:
+            self.on_update(updated)
+        return len(jobs)
+
+    def drain(self):
+        total = 0
+        while True:
+            processed = self.run_once()
+            if not processed:
+                return total
+            total += processed
+
+    def run_forever(self):
+        poll_interval = self.app.config['MAL_POLL_INTERVAL']
+        while not self._stop.is_set():
+            processed = 0
+            try:
+                if time.monotonic() >= self._next_refresh_check:
+                    self._next_refresh_check = time.monotonic() + REFRESH_CHECK_INTERVAL
+                    if self.refresh_due():
+                        self.enqueue_refresh()
+                processed = self.run_once()
+            except Exception:
+                self.app.logger.exception('MyAnimeList worker hatası')
+                db.session.rollback()
+            finally:
+                db.session.remove()
+            if not processed:
+                self._wake.wait(poll_interval)
+                self._wake.clear()
+
+    def _run(self):
+        with self.app.app_context():
+            self.run_forever()
+
+    def wake(self):
+        # Worker ilk iş kuyruğa girdiğinde başlatılır
+        if not self.app.config['MAL_WORKER_ENABLED']:
+            return
+        with self._thread_lock:
+            if self._thread is None or not self._thread.is_alive():
+                self._stop.clear()
+                self._thread = threading.Thread(target=self._run, name='mal-enricher', daemon=True)
+                self._thread.start()
+        self._wake.set()
+
+    def stop(self, timeout=None):
+        self._stop.set()
+        self._wake.set()
+        if self._thread is not None:
+            self._thread.join(timeout)
+
+    def stats(self):
+        counts = dict(db.session.query(MalJob.status, func.count(MalJob.id)).group_by(MalJob.status).all())
+        return {'jobs': counts, 'http_requests': self._client.requests_made if self._client else 0,
+                'worker_alive': bool(self._thread and self._thread.is_alive())}
@@ -0,0 +1,228 @@
+import cProfile
+import hmac
+import io
+import ipaddress
+import itertools
+import os
+import pstats
+import threading
+import time
+from bisect import bisect_left
+from collections import deque
+from datetime import datetime
+
+from flask import Response, abort, before_render_template, current_app, g, has_app_context, has_request_context, request, template_rendered
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+# Saniye cinsinden gecikme kovaları (Prometheus varsayılanlarına yakın)
+LATENCY_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+STATEMENT_BUCKETS = (0, 1, 2, 3, 5, 8, 13, 21, 34, 55, 89, 144, 233)
+# İstek dışında (worker thread'leri, CLI) çalışan sorgular bu etiketle sayılır
+BACKGROUND = 'background'
+
+def _escape(value):
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+def _labels(names, values, extra=()):
+    pairs = [f'{name}="{_escape(value)}"' for name, value in itertools.chain(zip(names, values), extra)]
+    return '{' + ','.join(pairs) + '}' if pairs else ''
+
+class Counter:
+    def __init__(self, name, description, labels=()):
+        self.name, self.description, self.labels = name, description, labels
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def inc(self, labels=(), amount=1):
+        with self._lock:
+            self._values[labels] = self._values.get(labels, 0) + amount
+
+    def render(self):
+        yield f'# HELP {self.name} {self.description}'
+        yield f'# TYPE {self.name} counter'
+        with self._lock:
+            values = sorted(self._values.items())
+        for labels, value in values:
+            yield f'{self.name}{_labels(self.labels, labels)} {value}'
+
+class Histogram:
+    def __init__(self, name, description, labels=(), buckets=LATENCY_BUCKETS):
+        self.name, self.description, self.labels, self.buckets = name, description, labels, buckets
+        # etiket değerleri -> [kova sayıları (+Inf dahil), toplam, adet]
+        self._series = {}
+        self._lock = threading.Lock()
+
+    def observe(self, labels, value):
+        index = bisect_left(self.buckets, value)
+        with self._lock:
+            series = self._series.get(labels)
+            if series is None:
+                series = self._series[labels] = [[0] * (len(self.buckets) + 1), 0.0, 0]
+            series[0][index] += 1
+            series[1] += value
+            series[2] += 1
+
+    def render(self):
+        yield f'# HELP {self.name} {self.description}'
+        yield f'# TYPE {self.name} histogram'
+        with self._lock:
+            series = sorted((labels, (list(counts), total, count)) for labels, (counts, total, count) in self._series.items())
+        for labels, (counts, total, count) in series:
+            for bound, cumulative in zip(self.buckets + ('+Inf',), itertools.accumulate(counts)):
+                yield f'{self.name}_bucket{_labels(self.labels, labels, [("le", bound)])} {cumulative}'
+            yield f'{self.name}_sum{_labels(self.labels, labels)} {total:.6f}'
+            yield f'{self.name}_count{_labels(self.labels, labels)} {count}'
+
+@event.listens_for(Engine, 'before_cursor_execute')
+def _statement_started(conn, cursor, statement, parameters, context, executemany):
+    if context is not None:
+        context._metrics_started = time.perf_counter()
+
+@event.listens_for(Engine, 'after_cursor_execute')
+def _statement_finished(conn, cursor, statement, parameters, context, executemany):
+    started = getattr(context, '_metrics_started', None)
+    if started is None or not has_app_context():
+        return
+    metrics = current_app.extensions.get('metrics')
+    if metrics is not None:
+        metrics.record_statement(statement, parameters, time.perf_counter() - started)
+
+class Metrics:
+    # İstek başına gecikme, SQL sayısı/süresi ve şablon süresi ölçülür; /metrics Prometheus metin biçiminde
+    # sunar. Değerler süreç içidir (her worker kendi sayaçlarını tutar; Prometheus örnekleri toplar).
+    def __init__(self, app=None):
+        self.app = None
+        # Profil isteyen kullanıcının ve /metrics'i token olmadan okuyanın yetkisini app belirler (ör. sadece yöneticiler)
+        self.can_profile = lambda: False
+        self.can_view = lambda: False
+        # Ek metrik satırları üreten fonksiyonlar (ör. sayfa önbelleği istatistikleri)
+        self.collectors = []
+        self.profiles = deque(maxlen=20)
+        self._profile_ids = itertools.count(1)
+        self.requests = Counter('http_requests_total', 'İşlenen istekler', ('endpoint', 'method', 'status'))
+        self.latency = Histogram('http_request_duration_seconds', 'İstek süresi (yanıt gövdesi akışı hariç)', ('endpoint', 'method'))
+        self.statements = Histogram('db_statements_per_request', 'İstek başına SQL ifadesi sayısı', ('endpoint',), STATEMENT_BUCKETS)
+        self.db_time = Histogram('db_request_duration_seconds', 'İstek başına toplam SQL süresi (cursor.execute; satırların okunması hariç)', ('endpoint',))
+        self.statement_time = Histogram('db_statement_duration_seconds', 'SQL ifadesi süresi', ('endpoint',))
+        self.slow_statements = Counter('db_slow_statements_total', 'Eşiği aşan SQL ifadeleri', ('endpoint',))
+        self.templates = Histogram('template_render_duration_seconds', 'Şablon render süresi (iç içe şablonlar dahil)', ('template',))
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        app.config.setdefault('METRICS_ENABLED', True)
+        # Bu sürelerden uzun SQL ifadeleri ve istekler uyarı olarak loglanır
+        app.config.setdefault('METRICS_SLOW_QUERY_MS', 200)
+        app.config.setdefault('METRICS_SLOW_REQUEST_MS', 1000)
+        # /metrics'i "Authorization: Bearer <token>" ile veya can_view() (yöneticiler) okur; herkese açık değildir
+        app.config.setdefault('METRICS_TOKEN', os.environ.get('METRICS_TOKEN'))
+        # Açılırsa aynı makineden (127.0.0.1/::1) gelen istekler token'sız okur. Önde bir proxy varsa
+        # tüm istekler yerel görünür; o durumda açılmamalı.
+        app.config.setdefault('METRICS_ALLOW_LOOPBACK', os.environ.get('METRICS_ALLOW_LOOPBACK') == '1')
+        app.config.setdefault('METRICS_PROFILE_PARAM', '_profile')
+        app.config.setdefault('METRICS_PROFILE_LIMIT', 40)
+        self.app = app
+        app.extensions['metrics'] = self
+        app.before_request(self._start)
+        app.after_request(self._finish)
+        before_render_template.connect(self._template_started, app)
+        template_rendered.connect(self._template_finished, app)
+        app.add_url_rule('/metrics', 'metrics', self.export)
+
+    def _endpoint(self):
+        return (request.endpoint or 'unmatched') if has_request_context() else BACKGROUND
+
+    def _start(self):
+        if not self.app.config['METRICS_ENABLED']:
+            return
+        g.metrics = {'started': time.perf_counter(), 'statements': 0, 'db': 0.0, 'templates': 0.0, 'template_stack': []}
+        if request.args.get(self.app.config['METRICS_PROFILE_PARAM']) and self.can_profile():
+            g.metrics['profiler'] = profiler = cProfile.Profile()
+            profiler.enable()
+
+    def record_statement(self, statement, parameters, duration):
+        if not self.app.config['METRICS_ENABLED']:
+            return
+        endpoint = self._endpoint()
+        current = g.get('metrics') if has_request_context() else None
+        if current is not None:
+            current['statements'] += 1
+            current['db'] += duration
+        self.statement_time.observe((endpoint,), duration)
+        if duration * 1000 >= self.app.config['METRICS_SLOW_QUERY_MS']:
+            self.slow_statements.inc((endpoint,))
+            self.app.logger.warning('Yavaş sorgu (%.1f ms, %s): %s %s', duration * 1000, endpoint,
+                                    ' '.join(statement.split())[:1000], repr(parameters)[:200])
+
+    def _template_started(self, sender, template, context, **extra):
+        if has_request_context() and 'metrics' in g:
+            g.metrics['template_stack'].append(time.perf_counter())
+
+    def _template_finished(self, sender, template, context, **extra):
+        if not has_request_context() or 'metrics' not in g or not g.metrics['template_stack']:
+            return
+        stack = g.metrics['template_stack']
+        duration = time.perf_counter() - stack.pop()
+        self.templates.observe((template.name or 'string',), duration)
+        # İç içe render edilen şablonlar (raflar) üsttekinin süresine zaten dahildir
+        if not stack:
+            g.metrics['templates'] += duration
+
+    def _finish(self, response):
+        current = g.pop('metrics', None)
+        if current is None:
+            return response
+        profiler = current.get('profiler')
+        if profiler is not None:
+            profiler.disable()
+        elapsed = time.perf_counter() - current['started']
+        endpoint = self._endpoint()
+        self.requests.inc((endpoint, request.method, str(response.status_code)))
+        self.latency.observe((endpoint, request.method), elapsed)
+        self.statements.observe((endpoint,), current['statements'])
+        self.db_time.observe((endpoint,), current['db'])
+        response.headers['Server-Timing'] = (f'app;dur={elapsed * 1000:.1f}, db;dur={current["db"] * 1000:.1f};desc="{current["statements"]} sorgu", '
+                                             f'tpl;dur={current["templates"] * 1000:.1f}')
+        if elapsed * 1000 >= self.app.config['METRICS_SLOW_REQUEST_MS']:
+            self.app.logger.warning('Yavaş istek (%.0f ms, %s %s): %d sorgu %.0f ms, şablon %.0f ms', elapsed * 1000, request.method,
+                                    request.full_path, current['statements'], current['db'] * 1000, current['templates'] * 1000)
+        if profiler is not None:
+            response.headers['X-Profile-Id'] = str(self.save_profile(profiler, endpoint, elapsed, current))
+        return response
+
+    def save_profile(self, profiler, endpoint, elapsed, current):
+        output = io.StringIO()
+        stats = pstats.Stats(profiler, stream=output)
+        stats.strip_dirs().sort_stats('cumulative').print_stats(self.app.config['METRICS_PROFILE_LIMIT'])
+        profile_id = next(self._profile_ids)
+        self.profiles.appendleft({'id': profile_id, 'endpoint': endpoint, 'path': request.full_path, 'created_at': datetime.utcnow().isoformat(),
+                                  'duration_ms': round(elapsed * 1000, 2), 'statements': current['statements'],
+                                  'db_ms': round(current['db'] * 1000, 2), 'report': output.getvalue()})
+        return profile_id
+
+    def profile(self, profile_id):
+        return next((profile for profile in self.profiles if profile['id'] == profile_id), None)
+
+    def authorized(self):
+        token = self.app.config['METRICS_TOKEN']
+        if token and hmac.compare_digest(request.headers.get('Authorization', ''), f'Bearer {token}'):
+            return True
+        if self.app.config['METRICS_ALLOW_LOOPBACK']:
+            try:
+                if ipaddress.ip_address(request.remote_addr or '').is_loopback:
+                    return True
+            except ValueError:
+                pass
+        return self.can_view()
+
+    def export(self):
+        if not self.authorized():
+            abort(401)
+        lines = []
+        for metric in (self.requests, self.latency, self.statements, self.db_time, self.statement_time, self.slow_statements, self.templates):
+            lines.extend(metric.render())
+        for collector in self.collectors:
+            lines.extend(collector())
+        return Response('\n'.join(lines) + '\n', content_type='text/plain; version=0.0.4; charset=utf-8',
+                        headers={'Cache-Control': 'no-store'})
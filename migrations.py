@@ -0,0 +1,149 @@
+import hashlib
+import threading
+from datetime import datetime
+from flask import current_app
+from sqlalchemy import inspect, select, update
+from sqlalchemy.exc import DBAPIError
+from models import (db, SPECIAL_GENRES, Anime, AnimeScore, AnimeSimilarity, CoverImage, Episode, EpisodeSource, Genre, GenreAffinity,
+                    JobState, LogArchive, MalCacheEntry, MalJob, Notification, SchemaMigration, SimilarityDirty, SourceCheck, TrendEvent,
+                    WatchEvent, dialect_insert, ensure_columns, ensure_indexes, ensure_tables)
+import episodes
+import ratings
+import search
+
+# (revizyon, açıklama, fonksiyon) kayıt sırasıyla uygulanır; uygulananlar schema_migration tablosunda tutulur.
+# Tablo/sütun/indeks eklemeleri prepare() içindeki ensure_* adımlarıyla yapılır; buradakiler bir kez çalışması
+# gereken (veri taşıma, koşullu indeks) adımlardır ve birden fazla süreç aynı anda çalıştırsa da zararsızdır.
+REVISIONS = []
+# Sonradan eklenen modeller; mevcut veritabanlarında tabloları prepare() ile oluşturulur
+# (notification tablosu ilk sürümle gelen instance/anime_site.db'de yoktur)
+LATE_MODELS = (Notification, MalJob, MalCacheEntry, WatchEvent, GenreAffinity, JobState, AnimeSimilarity, SimilarityDirty, EpisodeSource,
+               SourceCheck, SchemaMigration, LogArchive, CoverImage, AnimeScore, TrendEvent)
+
+_prepared = set()
+_prepare_lock = threading.Lock()
+
+def revision(name, description):
+    def register(upgrade):
+        REVISIONS.append((name, description, upgrade))
+        return upgrade
+    return register
+
+# Sık filtrelenen sütunlar; her biri bir indeksin ilk sütunu olmalı
+LOOKUP_COLUMNS = [('episode', 'anime_id'), ('rating', 'anime_id'), ('rating', 'user_id'),
+                  ('notification', 'user_id'), ('log', 'timestamp')]
+
+def covering_index(inspector, table_name, column):
+    # Sütunla başlayan bir indeks (veya birincil anahtar) varsa adını döner
+    for index in inspector.get_indexes(table_name):
+        if index['column_names'] and index['column_names'][0] == column:
+            return index['name']
+    primary_key = inspector.get_pk_constraint(table_name)['constrained_columns']
+    if primary_key and primary_key[0] == column:
+        return 'PRIMARY KEY'
+    return None
+
+def index_coverage(engine):
+    inspector = inspect(engine)
+    tables = set(inspector.get_table_names())
+    return {f'{table}.{column}': covering_index(inspector, table, column) if table in tables else None
+            for table, column in LOOKUP_COLUMNS}
+
+@revision('0001_lookup_indexes', 'Episode/Rating/Notification/Log arama sütunlarına indeks')
+def lookup_indexes(engine):
+    # Modeldeki birleşik indeksler bu sütunlarla başlar; eksik olan varsa modeldeki karşılığı,
+    # o da yoksa tek sütunlu bir indeks oluşturulur
+    inspector = inspect(engine)
+    tables = set(inspector.get_table_names())
+    for table_name, column in LOOKUP_COLUMNS:
+        # Olmayan tablo atlanır; oluşturulduğunda modeldeki indeksleriyle birlikte gelir
+        if table_name not in tables or covering_index(inspector, table_name, column):
+            continue
+        table = db.metadata.tables[table_name]
+        index = next((index for index in table.indexes if index.columns.keys()[0] == column), None)
+        if index is None:
+            index = db.Index(f'ix_{table_name}_{column}', table.c[column])
+        index.create(engine, checkfirst=True)
+
+@revision('0002_episode_sources', 'episode.sources metnini episode_source tablosuna taşı')
+def episode_sources(engine):
+    episodes.migrate_legacy_sources()
+
+@revision('0003_special_genres', 'Özel türleri (Editörün Seçimi, Hero Section) ekle')
+def special_genres(engine):
+    existing = set(db.session.execute(select(Genre.name).where(Genre.name.in_(SPECIAL_GENRES))).scalars())
+    db.session.add_all(Genre(name=name) for name in SPECIAL_GENRES if name not in existing)
+
+@revision('0004_change_timestamps', 'Mevcut anime ve bölümlere değişiklik zamanı yaz')
+def change_timestamps(engine):
+    # Sütun eklenmeden önceki kayıtlar ilk tam dışa aktarmaya girer; sonraki since sorguları bunları tekrar vermez
+    for model in (Anime, Episode):
+        db.session.execute(update(model).where(model.updated_at.is_(None)).values(updated_at=db.func.now()))
+
+def applied():
+    return set(db.session.execute(select(SchemaMigration.revision)).scalars())
+
+def upgrade(engine):
+    # Uygulanmamış revizyonları sırayla çalıştırır; uygulananların adlarını döner
+    done = applied()
+    ran = []
+    for name, _, upgrade_step in REVISIONS:
+        if name in done:
+            continue
+        upgrade_step(engine)
+        db.session.execute(dialect_insert(SchemaMigration).values(revision=name, applied_at=datetime.utcnow()).on_conflict_do_nothing())
+        db.session.commit()
+        ran.append(name)
+    return ran
+
+def status():
+    done = applied()
+    return [(name, description, name in done) for name, description, _ in REVISIONS]
+
+def schema_stamp():
+    # Modeldeki tablo/sütun/indeks adları veya revizyon listesi değişince damga da değişir
+    parts = [f"{table.name}:{','.join(table.columns.keys())}:{','.join(sorted(index.name for index in table.indexes))}"
+             for table in db.metadata.sorted_tables]
+    parts += [name for name, _, _ in REVISIONS]
+    return 'schema:' + hashlib.sha1('\n'.join(parts).encode()).hexdigest()[:12]
+
+def prepare(engine):
+    # Eksik tablo/sütun/indeksleri ekler, revizyonları uygular ve şema damgasını yazar.
+    # Her adım tekrar çalıştırılabilir; uygulanan revizyonların adlarını döner.
+    ensure_tables(engine, *LATE_MODELS)
+    added_columns = ensure_columns(engine)
+    ratings.ensure_unique_votes(engine)
+    ensure_indexes(engine)
+    if 'anime.rating_sum' in added_columns:
+        ratings.reconcile()
+    search.ensure_search_index()
+    ran = upgrade(engine)
+    db.session.execute(dialect_insert(SchemaMigration).values(revision=schema_stamp(), applied_at=datetime.utcnow()).on_conflict_do_nothing())
+    db.session.commit()
+    return ran
+
+def is_current():
+    try:
+        current = db.session.execute(select(SchemaMigration.revision).where(SchemaMigration.revision == schema_stamp())).first() is not None
+    except DBAPIError:
+        # schema_migration tablosu henüz yok
+        current = False
+    db.session.rollback()
+    return current
+
+def ensure_current(sender=None, **kwargs):
+    # appcontext_pushed sinyaline bağlanır; süreç ve veritabanı başına bir kez çalışır.
+    # Şema damgası güncelse tek bir sorgudur, değilse prepare() çalışır. Başarısız güncelleme
+    # bir kez loglanır ve istekler sunulmaya devam eder (tekrar deneme flask db-upgrade ile yapılır).
+    key = str(db.engine.url)
+    if key in _prepared:
+        return
+    with _prepare_lock:
+        if key not in _prepared:
+            try:
+                if not is_current():
+                    prepare(db.engine)
+            except Exception:
+                db.session.rollback()
+                current_app.logger.exception('Şema güncellemesi başarısız; flask db-upgrade ile tekrar deneyin')
+            _prepared.add(key)
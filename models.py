@@ -1,16 +1,25 @@
+import json
 from flask_sqlalchemy import SQLAlchemy
+from sqlalchemy import inspect, text
+from sqlalchemy.dialects import postgresql, sqlite
+from sqlalchemy.schema import CreateColumn
+from database import RoutingSession
 
-db = SQLAlchemy()
+db = SQLAlchemy(session_options={'class_': RoutingSession})
 
 # Many-to-many ilişki için yardımcı tablolar
 anime_genres = db.Table('anime_genres',
     db.Column('anime_id', db.Integer, db.ForeignKey('anime.id'), primary_key=True),
-    db.Column('genre_id', db.Integer, db.ForeignKey('genre.id'), primary_key=True)
+    db.Column('genre_id', db.Integer, db.ForeignKey('genre.id'), primary_key=True),
+    # Türe göre anime listeleri (vitrin rafları, kişisel öneriler) birincil anahtarın tersinden okunur
+    db.Index('ix_anime_genres_genre_id_anime_id', 'genre_id', 'anime_id')
 )
 
 watchlist = db.Table('watchlist',
     db.Column('user_id', db.Integer, db.ForeignKey('user.id'), primary_key=True),
-    db.Column('anime_id', db.Integer, db.ForeignKey('anime.id'), primary_key=True)
+    db.Column('anime_id', db.Integer, db.ForeignKey('anime.id'), primary_key=True),
+    # Birincil anahtar user_id ile başlar; bir animeyi izleyenler bu indeksten okunur
+    db.Index('ix_watchlist_anime_id_user_id', 'anime_id', 'user_id')
 )
 
 class User(db.Model):
@@ -21,7 +30,8 @@ class User(db.Model):
     can_edit = db.Column(db.Boolean, default=False)
     can_add_user = db.Column(db.Boolean, default=False)
     logs = db.relationship('Log', backref='user', lazy=True)
-    watchlist_animes = db.relationship('Anime', secondary=watchlist, lazy='subquery',
+    # Yükleme stratejisi her route'ta ayrıca belirlenir (bkz. app.py'deki options(...) çağrıları)
+    watchlist_animes = db.relationship('Anime', secondary=watchlist, lazy=True,
         backref=db.backref('watchlisted_by', lazy=True))
     ratings = db.relationship('Rating', backref='user', lazy=True)
     notifications = db.relationship('Notification', backref='user', lazy=True, cascade="all, delete-orphan")
@@ -40,7 +50,9 @@ class Anime(db.Model):
     name = db.Column(db.String(100), nullable=False)
     description = db.Column(db.Text, nullable=False)
     cover_image = db.Column(db.String(200), nullable=False)
-    episodes = db.relationship('Episode', backref='anime', lazy=True, cascade="all, delete-orphan")
+    # İşlenmiş kapak varyantlarının içerik özeti (bkz. covers.py); NULL ise orijinal URL kullanılır
+    cover_digest = db.Column(db.String(32), nullable=True)
+    episodes = db.relationship('Episode', backref='anime', lazy=True, cascade="all, delete-orphan", order_by='Episode.number')
     
     release_year = db.Column(db.Integer, nullable=True)
     status = db.Column(db.String(50), nullable=True)
@@ -49,21 +61,80 @@ class Anime(db.Model):
     # Yeni Puanlama Alanları
     average_rating = db.Column(db.Float, default=0.0)
     rating_count = db.Column(db.Integer, default=0)
+    # Oyların toplamı; rate_anime ortalamayı yeniden hesaplamadan farkla günceller (bkz. ratings.py)
+    rating_sum = db.Column(db.Integer, nullable=False, default=0, server_default='0')
 
     # MyAnimeList Integration
     mal_id = db.Column(db.Integer, nullable=True)
     mal_score = db.Column(db.Float, nullable=True)
     mal_url = db.Column(db.String(200), nullable=True)
+    # Son değişiklik zamanı (dışa aktarma ve sitemap'in since/If-Modified-Since sorguları; bkz. export.py)
+    updated_at = db.Column(db.DateTime, nullable=True, default=db.func.now(), onupdate=db.func.now())
 
-    genres = db.relationship('Genre', secondary=anime_genres, lazy='subquery',
+    genres = db.relationship('Genre', secondary=anime_genres, lazy=True,
         backref=db.backref('animes', lazy=True))
     ratings = db.relationship('Rating', backref='anime', lazy=True, cascade="all, delete-orphan")
 
+    # Keşfet sayfasındaki her sıralama seçeneği için (sütun, id) indeksleri
+    __table_args__ = (
+        db.Index('ix_anime_name_id', 'name', 'id'),
+        db.Index('ix_anime_average_rating_id', 'average_rating', 'id'),
+        db.Index('ix_anime_release_year_id', 'release_year', 'id'),
+        db.Index('ix_anime_updated_at_id', 'updated_at', 'id'),
+    )
+
 class Episode(db.Model):
     id = db.Column(db.Integer, primary_key=True)
     number = db.Column(db.Integer, nullable=False)
-    sources = db.Column(db.Text, nullable=False)
+    # Eski virgülle birleştirilmiş kaynak metni; açılışta episode_source tablosuna taşınıp boşaltılır (bkz. episodes.py)
+    legacy_sources = db.Column('sources', db.Text, nullable=False, default='', server_default='')
     anime_id = db.Column(db.Integer, db.ForeignKey('anime.id'), nullable=False)
+    sources = db.relationship('EpisodeSource', lazy=True, order_by='EpisodeSource.position',
+        cascade="all, delete-orphan")
+    updated_at = db.Column(db.DateTime, nullable=True, default=db.func.now(), onupdate=db.func.now())
+
+    __table_args__ = (
+        db.Index('ix_episode_anime_id_number', 'anime_id', 'number'),
+        db.Index('ix_episode_updated_at_id', 'updated_at', 'id'),
+    )
+
+class EpisodeSource(db.Model):
+    id = db.Column(db.Integer, primary_key=True)
+    episode_id = db.Column(db.Integer, db.ForeignKey('episode.id', ondelete='CASCADE'), nullable=False)
+    position = db.Column(db.Integer, nullable=False, default=0)
+    host = db.Column(db.String(100), nullable=False)
+    url = db.Column(db.Text, nullable=False)
+    quality = db.Column(db.String(20), nullable=True)
+    # Son sağlık kontrolü (bkz. sourcehealth.py); latency_ms başarılı yanıtların hareketli ortalamasıdır
+    checked_at = db.Column(db.DateTime, nullable=True)
+    last_status = db.Column(db.Integer, nullable=True)
+    last_error = db.Column(db.String(200), nullable=True)
+    latency_ms = db.Column(db.Float, nullable=True)
+    failures = db.Column(db.Integer, nullable=False, default=0, server_default='0')
+    is_dead = db.Column(db.Boolean, nullable=False, default=False, server_default='0')
+
+    __table_args__ = (
+        db.Index('ix_episode_source_episode_id_position', 'episode_id', 'position'),
+        db.Index('ix_episode_source_checked_at', 'checked_at'),
+        db.Index('ix_episode_source_is_dead_checked_at', 'is_dead', 'checked_at'),
+    )
+
+class SourceCheck(db.Model):
+    # Kaynak başına kontrol geçmişi; SOURCE_CHECK_RETENTION_DAYS'ten eskiler silinir
+    id = db.Column(db.Integer, primary_key=True)
+    source_id = db.Column(db.Integer, db.ForeignKey('episode_source.id', ondelete='CASCADE'), nullable=False)
+    checked_at = db.Column(db.DateTime, nullable=False)
+    status = db.Column(db.Integer, nullable=True)
+    latency_ms = db.Column(db.Float, nullable=True)
+    error = db.Column(db.String(200), nullable=True)
+
+    __table_args__ = (
+        db.Index('ix_source_check_source_id_id', 'source_id', 'id'),
+        db.Index('ix_source_check_checked_at', 'checked_at'),
+    )
+
+# Yönetici tarafından silinemeyen, vitrin raflarını belirleyen türler
+SPECIAL_GENRES = ["Editörün Seçimi", "Hero Section"]
 
 class Genre(db.Model):
     id = db.Column(db.Integer, primary_key=True)
@@ -75,12 +146,47 @@ class Rating(db.Model):
     user_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=False)
     anime_id = db.Column(db.Integer, db.ForeignKey('anime.id'), nullable=False)
 
+    # Kullanıcı başına tek oy (upsert hedefi); (anime_id, score) mutabakat toplamlarını tablodan okumadan verir
+    __table_args__ = (
+        db.Index('uq_rating_user_id_anime_id', 'user_id', 'anime_id', unique=True),
+        db.Index('ix_rating_anime_id_score', 'anime_id', 'score'),
+    )
+
 class Log(db.Model):
     id = db.Column(db.Integer, primary_key=True)
     action = db.Column(db.String(50), nullable=False)
     description = db.Column(db.Text, nullable=False)
     timestamp = db.Column(db.DateTime, server_default=db.func.now())
     user_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=True)
+    # Etkilenen kayıt ('anime', 12) ve alan bazında {alan: [eski, yeni]} JSON farkı
+    target_type = db.Column(db.String(30), nullable=True)
+    target_id = db.Column(db.Integer, nullable=True)
+    changes = db.Column(db.Text, nullable=True)
+
+    __table_args__ = (
+        db.Index('ix_log_timestamp_id', 'timestamp', 'id'),
+        db.Index('ix_log_target', 'target_type', 'target_id', 'id'),
+    )
+
+    @property
+    def change_items(self):
+        return sorted(json.loads(self.changes).items()) if self.changes else []
+
+class LogArchive(db.Model):
+    # Saklama süresini aşan loglar buraya taşınır; month ('2026-09') bölüm anahtarıdır
+    id = db.Column(db.Integer, primary_key=True)
+    month = db.Column(db.String(7), nullable=False)
+    action = db.Column(db.String(50), nullable=False)
+    description = db.Column(db.Text, nullable=False)
+    timestamp = db.Column(db.DateTime, nullable=True)
+    user_id = db.Column(db.Integer, nullable=True)
+    target_type = db.Column(db.String(30), nullable=True)
+    target_id = db.Column(db.Integer, nullable=True)
+    changes = db.Column(db.Text, nullable=True)
+
+    __table_args__ = (
+        db.Index('ix_log_archive_month_id', 'month', 'id'),
+    )
 
 class Notification(db.Model):
     id = db.Column(db.Integer, primary_key=True)
@@ -88,4 +194,155 @@ class Notification(db.Model):
     timestamp = db.Column(db.DateTime, server_default=db.func.now())
     is_read = db.Column(db.Boolean, default=False, nullable=False)
     user_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=False)
-    anime_id = db.Column(db.Integer, db.ForeignKey('anime.id'), nullable=True) # Optional: link notification to an anime
\ No newline at end of file
+    anime_id = db.Column(db.Integer, db.ForeignKey('anime.id'), nullable=True) # Optional: link notification to an anime
+
+    # (user_id, id): artımlı okuma ve son bildirim id'si; (user_id, is_read, timestamp): okunmamış sayısı;
+    # (is_read, timestamp): compact() süresi dolmuş okunmuş bildirimleri tablo taranmadan bulur
+    __table_args__ = (
+        db.Index('ix_notification_user_id_id', 'user_id', 'id'),
+        db.Index('ix_notification_user_is_read_timestamp', 'user_id', 'is_read', 'timestamp'),
+        db.Index('ix_notification_is_read_timestamp', 'is_read', 'timestamp'),
+    )
+
+class MalJob(db.Model):
+    # MyAnimeList zenginleştirme kuyruğu; işleri arka plandaki worker (mal.py) işler
+    id = db.Column(db.Integer, primary_key=True)
+    anime_id = db.Column(db.Integer, db.ForeignKey('anime.id', ondelete='CASCADE'), nullable=False)
+    kind = db.Column(db.String(20), nullable=False)  # 'lookup' veya 'refresh'
+    status = db.Column(db.String(20), nullable=False, default='pending')
+    attempts = db.Column(db.Integer, nullable=False, default=0)
+    run_after = db.Column(db.DateTime, nullable=False, server_default=db.func.now())
+    claimed_by = db.Column(db.String(64), nullable=True)
+    claimed_at = db.Column(db.DateTime, nullable=True)
+    last_error = db.Column(db.Text, nullable=True)
+    created_at = db.Column(db.DateTime, server_default=db.func.now())
+
+    __table_args__ = (
+        db.Index('ix_mal_job_status_run_after', 'status', 'run_after'),
+        db.Index('ix_mal_job_anime_id', 'anime_id'),
+    )
+
+class CoverImage(db.Model):
+    # Kapak URL'si başına bir satır; aynı kapağı kullanan animeler tek indirmeyi paylaşır
+    id = db.Column(db.Integer, primary_key=True)
+    url = db.Column(db.String(200), nullable=False, unique=True)
+    status = db.Column(db.String(10), nullable=False, default='pending')  # pending / ready / failed
+    digest = db.Column(db.String(32), nullable=True)
+    width = db.Column(db.Integer, nullable=True)
+    height = db.Column(db.Integer, nullable=True)
+    attempts = db.Column(db.Integer, nullable=False, default=0)
+    error = db.Column(db.String(200), nullable=True)
+    updated_at = db.Column(db.DateTime, nullable=False)
+
+    __table_args__ = (
+        db.Index('ix_cover_image_status_updated_at', 'status', 'updated_at'),
+    )
+
+class MalCacheEntry(db.Model):
+    # Jikan yanıtları normalize edilmiş başlık ('q:...') veya mal_id ('id:...') ile saklanır
+    key = db.Column(db.String(255), primary_key=True)
+    payload = db.Column(db.Text, nullable=True)
+    fetched_at = db.Column(db.DateTime, nullable=False)
+
+def ensure_indexes(engine):
+    # create_all mevcut tablolara sonradan eklenen indeksleri oluşturmaz
+    existing_tables = set(inspect(engine).get_table_names())
+    for table in db.metadata.sorted_tables:
+        if table.name in existing_tables:
+            for index in table.indexes:
+                index.create(engine, checkfirst=True)
+
+class WatchEvent(db.Model):
+    # Salt eklenen izleme geçmişi; owner 'u:<kullanıcı id>' veya anonimler için 'v:<ziyaretçi id>'
+    id = db.Column(db.Integer, primary_key=True)
+    owner = db.Column(db.String(40), nullable=False)
+    anime_id = db.Column(db.Integer, db.ForeignKey('anime.id', ondelete='CASCADE'), nullable=False)
+    episode_id = db.Column(db.Integer, nullable=True)
+    created_at = db.Column(db.DateTime, nullable=False)
+
+    __table_args__ = (
+        db.Index('ix_watch_event_owner_id', 'owner', 'id'),
+    )
+
+class GenreAffinity(db.Model):
+    # score, updated_at anındaki zaman-sönümlü değerdir; okunurken şimdiye sönümlenir (bkz. affinity.py)
+    owner = db.Column(db.String(40), primary_key=True)
+    genre_id = db.Column(db.Integer, db.ForeignKey('genre.id', ondelete='CASCADE'), primary_key=True)
+    score = db.Column(db.Float, nullable=False, default=0.0)
+    updated_at = db.Column(db.DateTime, nullable=False)
+
+class JobState(db.Model):
+    # Arka plan işlerinin kaldığı yer (ör. işlenen son olay id'si)
+    name = db.Column(db.String(50), primary_key=True)
+    value = db.Column(db.Text, nullable=True)
+    updated_at = db.Column(db.DateTime, nullable=True)
+
+class AnimeSimilarity(db.Model):
+    # Her anime için önceden hesaplanmış en benzer K anime (bkz. recommendations.py)
+    anime_id = db.Column(db.Integer, db.ForeignKey('anime.id', ondelete='CASCADE'), primary_key=True)
+    rank = db.Column(db.Integer, primary_key=True)
+    similar_id = db.Column(db.Integer, db.ForeignKey('anime.id', ondelete='CASCADE'), nullable=False)
+    score = db.Column(db.Float, nullable=False)
+
+    __table_args__ = (
+        db.Index('ix_anime_similarity_similar_id', 'similar_id'),
+    )
+
+class SimilarityDirty(db.Model):
+    # Oyu, izleme listesi veya türleri değişen animeler; artımlı güncelleme bunları yeniden hesaplar
+    anime_id = db.Column(db.Integer, primary_key=True)
+
+class AnimeScore(db.Model):
+    # Sıralama listeleri (bkz. leaderboards.py): bayesian oy sayısıyla ağırlıklı puan, trending zaman-sönümlü
+    # etkileşim skorunun log2 ölçeğindeki değeri (sabit bir başlangıç anına göre; sıralama için sönümleme gerekmez)
+    anime_id = db.Column(db.Integer, db.ForeignKey('anime.id', ondelete='CASCADE'), primary_key=True)
+    bayesian = db.Column(db.Float, nullable=False, default=0.0)
+    trending = db.Column(db.Float, nullable=False, default=-1e9)
+    updated_at = db.Column(db.DateTime, nullable=True)
+
+    __table_args__ = (
+        db.Index('ix_anime_score_bayesian_anime_id', 'bayesian', 'anime_id'),
+        db.Index('ix_anime_score_trending_anime_id', 'trending', 'anime_id'),
+    )
+
+class TrendEvent(db.Model):
+    # Oy ve izleme listesi olayları; bölüm görüntülemeleri watch_event tablosundan okunur
+    id = db.Column(db.Integer, primary_key=True)
+    anime_id = db.Column(db.Integer, db.ForeignKey('anime.id', ondelete='CASCADE'), nullable=False)
+    kind = db.Column(db.String(20), nullable=False)
+    weight = db.Column(db.Float, nullable=False)
+    created_at = db.Column(db.DateTime, nullable=False)
+
+    __table_args__ = (
+        db.Index('ix_trend_event_created_at', 'created_at'),
+    )
+
+class SchemaMigration(db.Model):
+    # Uygulanmış şema revizyonları (bkz. migrations.py)
+    revision = db.Column(db.String(100), primary_key=True)
+    applied_at = db.Column(db.DateTime, nullable=False)
+
+def dialect_insert(target):
+    # ON CONFLICT (upsert) destekleyen insert; SQLite ve PostgreSQL
+    dialect = postgresql if db.engine.dialect.name == 'postgresql' else sqlite
+    return dialect.insert(target)
+
+def ensure_columns(engine):
+    # create_all mevcut tablolara sonradan eklenen sütunları da eklemez; eklenenler 'tablo.sütun' olarak döner
+    inspector = inspect(engine)
+    existing_tables = set(inspector.get_table_names())
+    added = []
+    with engine.begin() as conn:
+        for table in db.metadata.sorted_tables:
+            if table.name not in existing_tables:
+                continue
+            existing_columns = {column['name'] for column in inspector.get_columns(table.name)}
+            for column in table.columns:
+                if column.name not in existing_columns:
+                    conn.execute(text(f'ALTER TABLE {table.name} ADD COLUMN {CreateColumn(column).compile(dialect=engine.dialect)}'))
+                    added.append(f'{table.name}.{column.name}')
+    return added
+
+def ensure_tables(engine, *models):
+    # Sonradan eklenen modellerin tabloları mevcut veritabanlarında da oluşturulur
+    db.metadata.create_all(engine, tables=[model.__table__ for model in models])
@@ -0,0 +1,66 @@
+from datetime import datetime, timedelta
+from sqlalchemy import delete, func, insert, literal, select
+from models import db, Notification, watchlist
+
+# İlk yüklemede ve tek yanıtta dönecek en fazla bildirim sayısı
+PAGE_SIZE = 20
+# Okunmuş bildirimlerin saklanacağı süre (gün)
+RETENTION_DAYS = 30
+COMPACT_CHUNK_SIZE = 5000
+# Bağlı kullanıcı sayısı bunu aşarsa IN listesi yerine animenin tüm izleyicileri okunur
+WATCHER_LOOKUP_IN_LIMIT = 500
+
+def fan_out(anime_id, message):
+    # İzleyen kullanıcılar yüklenmeden tek INSERT ... SELECT ile bildirim yazılır.
+    # Çağıranın transaction'ına katılır; eklenen satır sayısını döner.
+    rows = select(watchlist.c.user_id, literal(anime_id), literal(message), literal(False)).where(watchlist.c.anime_id == anime_id)
+    result = db.session.execute(insert(Notification).from_select(['user_id', 'anime_id', 'message', 'is_read'], rows))
+    return result.rowcount
+
+def watcher_ids(anime_id, among):
+    # Animeyi izleyenlerden `among` kümesinde olanlar (ör. o an akışa bağlı kullanıcılar)
+    if not among:
+        return set()
+    query = db.session.query(watchlist.c.user_id).filter(watchlist.c.anime_id == anime_id)
+    if len(among) <= WATCHER_LOOKUP_IN_LIMIT:
+        query = query.filter(watchlist.c.user_id.in_(among))
+    return {row[0] for row in query} & among
+
+def state(user_id):
+    # (son bildirim id'si, okunmamış sayısı) tek sorguda, iki indeks aramasıyla okunur
+    latest = select(func.max(Notification.id)).where(Notification.user_id == user_id).scalar_subquery()
+    unread = select(func.count()).select_from(Notification).where(
+        Notification.user_id == user_id, Notification.is_read.is_(False)).scalar_subquery()
+    latest_id, unread_count = db.session.execute(select(latest, unread)).one()
+    return latest_id or 0, unread_count
+
+def etag(user_id, latest_id, unread_count, *args):
+    return '-'.join(str(part) for part in (user_id, latest_id, unread_count) + args)
+
+def since(user_id, after_id=0, limit=PAGE_SIZE):
+    # after_id'den yeni bildirimler, en yeniden eskiye; after_id=0 ise son `limit` kayıt
+    query = Notification.query.filter(Notification.user_id == user_id)
+    if after_id:
+        query = query.filter(Notification.id > after_id)
+    return query.order_by(Notification.id.desc()).limit(limit).all()
+
+def serialize(notification):
+    return {'id': notification.id, 'message': notification.message, 'timestamp': notification.timestamp.isoformat(),
+            'is_read': notification.is_read, 'anime_id': notification.anime_id}
+
+def compact(retention_days=RETENTION_DAYS, chunk_size=COMPACT_CHUNK_SIZE):
+    # Okunmuş ve süresi dolmuş bildirimler (is_read, timestamp) indeksinden parça parça seçilip silinir;
+    # her parça ayrı commit edilir (kısa kilitler). Zamanı olmayan eski kayıtlar süresi dolmuş sayılır.
+    # İki koşul ayrı sorgulanır; OR ile birleşince indeksin timestamp aralığı kullanılmaz.
+    cutoff = datetime.utcnow() - timedelta(days=retention_days)
+    deleted = 0
+    for expired in (Notification.timestamp.is_(None), Notification.timestamp < cutoff):
+        chunk = select(Notification.id).where(Notification.is_read.is_(True), expired).limit(chunk_size)
+        while True:
+            ids = db.session.execute(chunk).scalars().all()
+            if ids:
+                deleted += db.session.execute(delete(Notification).where(Notification.id.in_(ids))).rowcount
+                db.session.commit()
+            if len(ids) < chunk_size:
+                break
+    return deleted
@@ -0,0 +1,129 @@
+import base64
+import json
+from datetime import datetime
+from sqlalchemy import and_, or_
+
+def encode_cursor(values, tag=''):
+    payload = [{'$dt': v.isoformat()} if isinstance(v, datetime) else v for v in values]
+    raw = json.dumps({'t': tag, 'v': payload}, separators=(',', ':')).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip('=')
+
+def decode_cursor(token, tag=''):
+    # Bozuk veya başka bir sıralamaya ait cursor'lar yok sayılır, ilk sayfa gösterilir
+    if not token:
+        return None
+    try:
+        data = json.loads(base64.urlsafe_b64decode(token + '=' * (-len(token) % 4)))
+    except ValueError:
+        return None
+    if not isinstance(data, dict) or data.get('t') != tag or not isinstance(data.get('v'), list):
+        return None
+    values = []
+    for value in data['v']:
+        if isinstance(value, dict):
+            if set(value) != {'$dt'} or not isinstance(value['$dt'], str):
+                return None
+            try:
+                value = datetime.fromisoformat(value['$dt'])
+            except ValueError:
+                return None
+        elif value is not None and not isinstance(value, (str, int, float)):
+            return None
+        values.append(value)
+    return values
+
+def _fits(column, value, nullable):
+    # Cursor değeri sütunun Python tipine uymalı; tipi bilinmeyen ifadelerde (ör. arama skoru) sayı olması yeterlidir
+    if value is None:
+        return nullable
+    try:
+        expected = column.type.python_type
+    except NotImplementedError:
+        expected = float
+    if isinstance(value, bool):
+        return expected is bool
+    # Veritabanının 64 bitlik tamsayı aralığı dışındaki sayılar bağlanırken hata verir
+    if isinstance(value, int) and not -2 ** 63 <= value < 2 ** 63:
+        return False
+    if expected is float:
+        return isinstance(value, (int, float))
+    return isinstance(value, expected)
+
+class KeysetPage:
+    def __init__(self, items, next_cursor=None, prev_cursor=None, total=None):
+        self.items = items
+        self.next_cursor = next_cursor
+        self.prev_cursor = prev_cursor
+        self.total = total
+
+    @property
+    def has_next(self):
+        return self.next_cursor is not None
+
+    @property
+    def has_prev(self):
+        return self.prev_cursor is not None
+
+def _beyond(columns, values, descending):
+    # (a, b, c) > (x, y, z) karşılaştırmasının sütun yönlerine göre açılımı
+    clauses = []
+    for i, (column, value, desc) in enumerate(zip(columns, values, descending)):
+        parts = [c == v for c, v in zip(columns[:i], values[:i])]
+        parts.append(column < value if desc else column > value)
+        clauses.append(and_(*parts))
+    return or_(*clauses)
+
+def _ordered(columns, descending):
+    return [c.desc() if desc else c.asc() for c, desc in zip(columns, descending)]
+
+def keyset_paginate(query, key, per_page, after=None, before=None, tag='', nullable=False):
+    # key: [(sütun, azalan_mı), ...]; son sütun benzersiz olmalı (genelde id).
+    # nullable=True ise ilk sütundaki NULL'lar en küçük değer kabul edilir ve ayrı bir
+    # segmentte okunur; böylece her iki segment de indeks üzerinden aralık taramasıyla gelir.
+    backward = False
+    cursor = decode_cursor(after, tag)
+    if cursor is None and before:
+        cursor = decode_cursor(before, tag)
+        backward = cursor is not None
+    if cursor is not None and (len(cursor) != len(key) or not all(
+            _fits(column, value, nullable and i == 0) for i, ((column, _), value) in enumerate(zip(key, cursor)))):
+        cursor, backward = None, False
+    columns = [column for column, _ in key]
+    descending = [desc != backward for _, desc in key]
+    limit = per_page + 1
+
+    segments = ['value']
+    if nullable:
+        segments = ['value', 'null'] if descending[0] else ['null', 'value']
+        if cursor is not None:
+            segments = segments[segments.index('null' if cursor[0] is None else 'value'):]
+
+    rows = []
+    for position, segment in enumerate(segments):
+        if len(rows) >= limit:
+            break
+        segment_query = query.add_columns(*columns)
+        use_cursor = cursor is not None and position == 0
+        if segment == 'null':
+            segment_query = segment_query.filter(columns[0].is_(None))
+            if use_cursor:
+                segment_query = segment_query.filter(_beyond(columns[1:], cursor[1:], descending[1:]))
+            order = _ordered(columns[1:], descending[1:])
+        else:
+            if nullable:
+                segment_query = segment_query.filter(columns[0].isnot(None))
+            if use_cursor:
+                segment_query = segment_query.filter(_beyond(columns, cursor, descending))
+            order = _ordered(columns, descending)
+        rows.extend(segment_query.order_by(None).order_by(*order).limit(limit - len(rows)).all())
+
+    has_more = len(rows) > per_page
+    rows = rows[:per_page]
+    if backward:
+        rows.reverse()
+    items = [row[0] for row in rows]
+    first_key = encode_cursor(list(rows[0][1:]), tag) if rows else None
+    last_key = encode_cursor(list(rows[-1][1:]), tag) if rows else None
+    if backward:
+        return KeysetPage(items, next_cursor=last_key, prev_cursor=first_key if has_more else None)
+    return KeysetPage(items, next_cursor=last_key if has_more else None, prev_cursor=first_key if cursor is not None else None)
@@ -0,0 +1,95 @@
+import json
+import queue
+import threading
+import time
+
+# Yavaş okuyan bir bağlantının kuyruğu dolarsa yeni olaylar atılır; istemci zaten
+# her olayda ?since= ile eksik bildirimleri çektiği için bir sinyal yeterlidir.
+SUBSCRIPTION_QUEUE_SIZE = 16
+
+class Subscription:
+    def __init__(self, user_id):
+        self.user_id = user_id
+        self._queue = queue.Queue(maxsize=SUBSCRIPTION_QUEUE_SIZE)
+
+    def push(self, event):
+        try:
+            self._queue.put_nowait(event)
+        except queue.Full:
+            pass
+
+    def get(self, timeout):
+        try:
+            return self._queue.get(timeout=timeout)
+        except queue.Empty:
+            return None
+
+class NotificationHub:
+    # Süreç içi yayın merkezi: add_episode() yayınlar, /api/notifications/stream dinler.
+    # threading ilkelleri gevent monkey patch altında işbirlikçi çalışır (bkz. serve.py).
+    def __init__(self, app=None):
+        self._subscribers = {}
+        self._lock = threading.Lock()
+        self.published = 0
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        app.config.setdefault('NOTIFICATION_STREAM_ENABLED', True)
+        # Proxy'lerin boşta bağlantıyı kesmemesi için gönderilen yorum satırı aralığı (saniye)
+        app.config.setdefault('NOTIFICATION_STREAM_KEEPALIVE', 25)
+        # Başka süreçlerde yazılan bildirimler için veritabanının kontrol edilme aralığı (saniye)
+        app.config.setdefault('NOTIFICATION_STREAM_RECHECK', 60)
+        # Bağlantı bu süreden sonra kapatılır, istemci otomatik yeniden bağlanır (saniye)
+        app.config.setdefault('NOTIFICATION_STREAM_MAX_AGE', 3600)
+        app.extensions['notification_hub'] = self
+
+    def subscribe(self, user_id):
+        subscription = Subscription(user_id)
+        with self._lock:
+            self._subscribers.setdefault(user_id, set()).add(subscription)
+        return subscription
+
+    def unsubscribe(self, subscription):
+        with self._lock:
+            subscriptions = self._subscribers.get(subscription.user_id)
+            if subscriptions is not None:
+                subscriptions.discard(subscription)
+                if not subscriptions:
+                    del self._subscribers[subscription.user_id]
+
+    def connected_users(self):
+        with self._lock:
+            return set(self._subscribers)
+
+    def publish(self, user_ids, event):
+        with self._lock:
+            targets = [s for user_id in user_ids for s in self._subscribers.get(user_id, ())]
+        for subscription in targets:
+            subscription.push(event)
+        self.published += len(targets)
+        return len(targets)
+
+    def stats(self):
+        with self._lock:
+            return {'users': len(self._subscribers), 'connections': sum(len(s) for s in self._subscribers.values()),
+                    'published': self.published}
+
+def format_event(event, data=None):
+    return f'event: {event}\ndata: {json.dumps(data or {})}\n\n'
+
+def stream(subscription, keepalive, recheck, max_age, check=None):
+    # SSE gövdesi; check() her `recheck` saniyede bir çağrılır ve yeni bildirim varsa True döner
+    started = last_check = time.monotonic()
+    yield 'retry: 5000\n\n'
+    while time.monotonic() - started < max_age:
+        event = subscription.get(timeout=min(keepalive, recheck))
+        if event is not None:
+            yield format_event(*event)
+            continue
+        if check is not None and time.monotonic() - last_check >= recheck:
+            last_check = time.monotonic()
+            if check():
+                yield format_event('notification')
+                continue
+        yield ': keepalive\n\n'
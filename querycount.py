@@ -0,0 +1,85 @@
+import threading
+from contextlib import contextmanager
+from functools import wraps
+from flask import current_app, g, has_app_context, request
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+_local = threading.local()
+
+class QueryBudgetExceeded(AssertionError):
+    pass
+
+class QueryCounter:
+    def __init__(self):
+        self.count = 0
+        self.statements = []
+
+    def record(self, statement):
+        self.count += 1
+        self.statements.append(statement)
+
+def _active_counters():
+    return getattr(_local, 'counters', [])
+
+@event.listens_for(Engine, 'before_cursor_execute')
+def _count_statement(conn, cursor, statement, parameters, context, executemany):
+    for counter in _active_counters():
+        counter.record(statement)
+    if has_app_context() and 'request_queries' in g:
+        g.request_queries.record(statement)
+
+@contextmanager
+def count_queries():
+    counter = QueryCounter()
+    _local.counters = _active_counters() + [counter]
+    try:
+        yield counter
+    finally:
+        _local.counters = [c for c in _active_counters() if c is not counter]
+
+@contextmanager
+def assert_max_queries(budget):
+    # Testlerde: with assert_max_queries(3): client.get('/anime/1')
+    with count_queries() as counter:
+        yield counter
+    if counter.count > budget:
+        raise QueryBudgetExceeded(f'{counter.count} sorgu çalıştı, bütçe {budget}:\n' + '\n'.join(counter.statements))
+
+def query_budget(budget):
+    # Route'un veri büyüklüğünden bağımsız olarak çalıştırabileceği en fazla sorgu sayısı
+    def decorator(f):
+        @wraps(f)
+        def decorated_function(*args, **kwargs):
+            return f(*args, **kwargs)
+        decorated_function.query_budget = budget
+        return decorated_function
+    return decorator
+
+class QueryBudget:
+    # QUERY_BUDGET_ENFORCE açıkken (varsayılan: TESTING) bütçesini aşan route AssertionError fırlatır
+    def __init__(self, app=None):
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        app.config.setdefault('QUERY_BUDGET_ENFORCE', None)
+        app.before_request(self._start)
+        app.after_request(self._check)
+
+    def _enforced(self, app):
+        enforce = app.config['QUERY_BUDGET_ENFORCE']
+        return app.testing if enforce is None else enforce
+
+    def _start(self):
+        g.request_queries = QueryCounter()
+
+    def _check(self, response):
+        if not self._enforced(current_app) or 'request_queries' not in g:
+            return response
+        view = current_app.view_functions.get(request.endpoint)
+        budget = getattr(view, 'query_budget', None)
+        if budget is not None and g.request_queries.count > budget:
+            raise QueryBudgetExceeded(f'{request.endpoint}: {g.request_queries.count} sorgu çalıştı, bütçe {budget}:\n'
+                                      + '\n'.join(g.request_queries.statements))
+        return response
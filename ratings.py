@@ -0,0 +1,68 @@
+from sqlalchemy import case, func, inspect, select, update
+from models import db, Anime, Rating, dialect_insert
+
+UNIQUE_VOTE_INDEX = 'uq_rating_user_id_anime_id'
+RECONCILE_CHUNK_SIZE = 1000
+
+def _upsert(values):
+    statement = dialect_insert(Rating).values(**values)
+    return statement.on_conflict_do_update(index_elements=['user_id', 'anime_id'], set_={'score': statement.excluded.score})
+
+def vote(user_id, anime_id, score):
+    # Oy ve anime toplamları tek transaction'da, ortalama yeniden hesaplanmadan farkla yazılır.
+    # Anime bulunamazsa None, aksi halde (ortalama, oy sayısı) döner; commit çağıranındır.
+    #
+    # İlk UPDATE yazma kilidini alır (SQLite'ta veritabanı, PostgreSQL'de anime satırı);
+    # aynı animeye gelen eşzamanlı oylar buradan sonra sırayla ilerler, böylece okunan
+    # eski oy ile yazılan fark arasında başka bir yazma araya giremez.
+    locked = db.session.execute(update(Anime).where(Anime.id == anime_id).values(rating_sum=Anime.rating_sum))
+    if not locked.rowcount:
+        return None
+    previous = db.session.execute(select(Rating.score).where(Rating.user_id == user_id, Rating.anime_id == anime_id)).scalar()
+    db.session.execute(_upsert({'user_id': user_id, 'anime_id': anime_id, 'score': score}))
+    delta_sum = score - (previous or 0)
+    delta_count = 0 if previous is not None else 1
+    new_sum = Anime.rating_sum + delta_sum
+    new_count = func.coalesce(Anime.rating_count, 0) + delta_count
+    result = db.session.execute(update(Anime).where(Anime.id == anime_id).values(
+        rating_sum=new_sum,
+        rating_count=new_count,
+        average_rating=case((new_count > 0, func.cast(new_sum, db.Float) / new_count), else_=0.0),
+    ).returning(Anime.average_rating, Anime.rating_count)).one()
+    return result.average_rating, result.rating_count
+
+def ensure_unique_votes(engine):
+    # Benzersiz indeks eklenmeden önce eski veritabanlarındaki mükerrer oylar temizlenir (en son oy kalır)
+    if 'rating' not in inspect(engine).get_table_names():
+        return 0
+    if any(index['name'] == UNIQUE_VOTE_INDEX for index in inspect(engine).get_indexes('rating')):
+        return 0
+    keep = select(func.max(Rating.id)).group_by(Rating.user_id, Rating.anime_id)
+    with engine.begin() as conn:
+        return conn.execute(Rating.__table__.delete().where(Rating.id.notin_(keep))).rowcount
+
+def reconcile(fix=True, chunk_size=RECONCILE_CHUNK_SIZE):
+    # Anime üzerindeki toplamları ham oy tablosuyla karşılaştırır; id aralıkları halinde ilerler.
+    # Uyuşmayan anime id'lerini döner; fix=True ise düzeltip commit eder.
+    mismatched = []
+    last_id = 0
+    while True:
+        ids = [row.id for row in db.session.query(Anime.id).filter(Anime.id > last_id).order_by(Anime.id).limit(chunk_size)]
+        if not ids:
+            break
+        totals = select(Rating.anime_id, func.sum(Rating.score).label('total'), func.count().label('votes')).where(
+            Rating.anime_id.between(ids[0], ids[-1])).group_by(Rating.anime_id).subquery()
+        rows = db.session.query(Anime.id, Anime.rating_sum, Anime.rating_count, Anime.average_rating, totals.c.total, totals.c.votes).outerjoin(
+            totals, totals.c.anime_id == Anime.id).filter(Anime.id.between(ids[0], ids[-1])).all()
+        for row in rows:
+            total, votes = row.total or 0, row.votes or 0
+            average = total / votes if votes else 0.0
+            if row.rating_sum != total or (row.rating_count or 0) != votes or abs((row.average_rating or 0.0) - average) > 1e-9:
+                mismatched.append(row.id)
+                if fix:
+                    db.session.execute(update(Anime).where(Anime.id == row.id).values(
+                        rating_sum=total, rating_count=votes, average_rating=average))
+        if fix:
+            db.session.commit()
+        last_id = ids[-1]
+    return mismatched
@@ -0,0 +1,201 @@
+from collections import defaultdict
+from datetime import datetime
+from itertools import chain
+from sqlalchemy import delete, func, select
+from models import db, Anime, AnimeSimilarity, Genre, JobState, Rating, SimilarityDirty, anime_genres, dialect_insert, watchlist
+
+# Anime başına saklanan komşu sayısı
+TOP_K = 20
+# Benzer listeleri her değiştiğinde artan sayaç (job_state); sayfa ETag'leri buradan okur
+VERSION_JOB = 'recommendations_version'
+# Ortak izleyici/oy (kosinüs) benzerliği ile tür benzerliğinin karışım ağırlıkları
+COLLABORATIVE_WEIGHT = 0.8
+GENRE_WEIGHT = 0.2
+# Benzerlik matrisi bu kadar satırlık bloklar halinde yoğun hesaplanır (bellek: blok x anime sayısı)
+BLOCK_SIZE = 256
+WRITE_CHUNK_SIZE = 5000
+
+class SimilarityModel:
+    # Kullanıcı x anime etkileşim matrisi (sütunları normalize) ve anime x tür matrisi (satırları normalize)
+    def __init__(self, anime_ids, interactions, genres):
+        self.anime_ids = anime_ids
+        self.interactions = interactions
+        self.genres = genres
+
+    def positions(self, anime_ids):
+        import numpy as np
+        anime_ids = np.asarray(anime_ids, dtype=np.int64)
+        positions = np.searchsorted(self.anime_ids, anime_ids)
+        positions = np.minimum(positions, len(self.anime_ids) - 1)
+        return positions[self.anime_ids[positions] == anime_ids]
+
+    def scores(self, positions):
+        # positions satırları için tüm animelere karşı benzerlik skorları (yoğun blok)
+        import numpy as np
+        collaborative = (self.interactions[:, positions].T @ self.interactions).toarray()
+        genre = (self.genres[positions] @ self.genres.T).toarray()
+        scores = COLLABORATIVE_WEIGHT * collaborative + GENRE_WEIGHT * genre
+        scores[np.arange(len(positions)), positions] = 0.0
+        return scores
+
+def _array(statement, width):
+    # Satırlar tek tek Row nesnesi olarak değil, düz bir int akışı olarak NumPy'a aktarılır
+    import numpy as np
+    return np.fromiter(chain.from_iterable(db.session.execute(statement).tuples()), dtype=np.int64).reshape(-1, width)
+
+def load_model(excluded_genres=()):
+    # NumPy/SciPy sadece bu toplu iş için gerekir; sayfalar önceden hesaplanmış tablodan okur
+    import numpy as np
+    from scipy import sparse
+
+    anime_ids = _array(select(Anime.id).order_by(Anime.id), 1).ravel()
+    ratings = _array(select(Rating.user_id, Rating.anime_id, Rating.score), 3)
+    watched = _array(select(watchlist.c.user_id, watchlist.c.anime_id), 2)
+    tagged = _array(select(anime_genres.c.anime_id, anime_genres.c.genre_id).join(
+        Genre, Genre.id == anime_genres.c.genre_id).where(Genre.name.notin_(excluded_genres)), 2)
+
+    def matrix(rows, columns, values, shape):
+        keep = np.isin(columns, anime_ids)
+        return sparse.csr_matrix((values[keep], (rows[keep], np.searchsorted(anime_ids, columns[keep]))), shape=shape)
+
+    # Oylar 0.6-1.0, izleme listesi 1.0 ağırlık alır; ikisi birden varsa büyük olan geçerli
+    user_ids, user_index = np.unique(np.concatenate([ratings[:, 0], watched[:, 0]]), return_inverse=True)
+    shape = (len(user_ids), len(anime_ids))
+    rated = matrix(user_index[:len(ratings)], ratings[:, 1], 0.5 + ratings[:, 2] / 10.0, shape)
+    listed = matrix(user_index[len(ratings):], watched[:, 1], np.ones(len(watched)), shape)
+    interactions = rated.maximum(listed).tocsc()
+    norms = np.sqrt(np.asarray(interactions.multiply(interactions).sum(axis=0)).ravel())
+    interactions = (interactions @ sparse.diags(np.divide(1.0, norms, out=np.zeros_like(norms), where=norms > 0))).tocsc()
+
+    genre_ids, genre_index = np.unique(tagged[:, 1], return_inverse=True)
+    genres = sparse.csr_matrix((np.ones(len(tagged)), (np.searchsorted(anime_ids, tagged[:, 0]), genre_index)),
+                               shape=(len(anime_ids), len(genre_ids))) if len(tagged) else sparse.csr_matrix((len(anime_ids), 1))
+    row_norms = np.sqrt(np.asarray(genres.multiply(genres).sum(axis=1)).ravel())
+    genres = (sparse.diags(np.divide(1.0, row_norms, out=np.zeros_like(row_norms), where=row_norms > 0)) @ genres).tocsr()
+    return SimilarityModel(anime_ids, interactions, genres)
+
+def top_k(model, positions, scores, k=TOP_K):
+    # (anime_id, rank, similar_id, score) satırları; sıfır skorlu komşular atlanır
+    import numpy as np
+    k = min(k, scores.shape[1] - 1)
+    if k <= 0:
+        return []
+    candidates = np.argpartition(-scores, k - 1, axis=1)[:, :k]
+    candidate_scores = np.take_along_axis(scores, candidates, axis=1)
+    order = np.argsort(-candidate_scores, axis=1, kind='stable')
+    candidates = np.take_along_axis(candidates, order, axis=1)
+    candidate_scores = np.take_along_axis(candidate_scores, order, axis=1)
+    rows = []
+    for row, position in enumerate(positions):
+        anime_id = int(model.anime_ids[position])
+        for rank, (similar, score) in enumerate(zip(candidates[row], candidate_scores[row])):
+            if score <= 0:
+                break
+            rows.append({'anime_id': anime_id, 'rank': rank, 'similar_id': int(model.anime_ids[similar]), 'score': float(score)})
+    return rows
+
+def _write(rows):
+    for start in range(0, len(rows), WRITE_CHUNK_SIZE):
+        db.session.execute(AnimeSimilarity.__table__.insert(), rows[start:start + WRITE_CHUNK_SIZE])
+
+def rebuild(excluded_genres=(), k=TOP_K, block_size=BLOCK_SIZE):
+    # Tüm komşu listelerini baştan hesaplar ve tek transaction'da değiştirir; yazılan satır sayısını döner
+    import numpy as np
+    dirty = db.session.execute(select(SimilarityDirty.anime_id)).scalars().all()
+    model = load_model(excluded_genres)
+    db.session.execute(delete(AnimeSimilarity))
+    written = 0
+    for start in range(0, len(model.anime_ids), block_size):
+        positions = np.arange(start, min(start + block_size, len(model.anime_ids)))
+        rows = top_k(model, positions, model.scores(positions), k)
+        _write(rows)
+        written += len(rows)
+    if dirty:
+        db.session.execute(delete(SimilarityDirty).where(SimilarityDirty.anime_id.in_(dirty)))
+    bump_version()
+    db.session.commit()
+    return written
+
+def update_incremental(excluded_genres=(), k=TOP_K, block_size=BLOCK_SIZE):
+    # Sadece işaretlenen animelerin listeleri yeniden hesaplanır. Benzerlik simetrik olduğundan
+    # aynı satır, diğer animelerin listelerindeki skoru da verir: listesinde işaretli anime
+    # bulunanlar güncellenir, işaretli animeyi en zayıf komşusundan yüksek bulanlara eklenir.
+    # Listesi değişen anime id'lerini döner.
+    import numpy as np
+    dirty = db.session.execute(select(SimilarityDirty.anime_id)).scalars().all()
+    if not dirty:
+        return set()
+    model = load_model(excluded_genres)
+    changed = set()
+    dirty_positions = model.positions(dirty)
+    for start in range(0, len(dirty_positions), block_size):
+        positions = dirty_positions[start:start + block_size]
+        block_ids = [int(anime_id) for anime_id in model.anime_ids[positions]]
+        scores = model.scores(positions)
+
+        db.session.execute(delete(AnimeSimilarity).where(AnimeSimilarity.anime_id.in_(block_ids)))
+        _write(top_k(model, positions, scores, k))
+        changed.update(block_ids)
+
+        # Diğer animelerin en zayıf komşu skoru ve liste uzunluğu
+        threshold = np.zeros(len(model.anime_ids))
+        counts = np.zeros(len(model.anime_ids), dtype=np.int64)
+        stats = db.session.execute(select(AnimeSimilarity.anime_id, func.min(AnimeSimilarity.score), func.count()).group_by(AnimeSimilarity.anime_id)).all()
+        if stats:
+            stat_ids = np.array([row[0] for row in stats], dtype=np.int64)
+            stat_positions = np.searchsorted(model.anime_ids, stat_ids)
+            valid = (stat_positions < len(model.anime_ids))
+            valid[valid] = model.anime_ids[stat_positions[valid]] == stat_ids[valid]
+            threshold[stat_positions[valid]] = np.array([row[1] for row in stats])[valid]
+            counts[stat_positions[valid]] = np.array([row[2] for row in stats])[valid]
+        eligible = (scores > threshold) | ((counts < k) & (scores > 0))
+        eligible[:, positions] = False
+        listing = db.session.execute(select(AnimeSimilarity.anime_id).where(
+            AnimeSimilarity.similar_id.in_(block_ids), AnimeSimilarity.anime_id.notin_(block_ids))).scalars().all()
+        affected = {int(model.anime_ids[p]) for p in np.nonzero(eligible.any(axis=0))[0]} | set(listing)
+        if not affected:
+            continue
+
+        lists = defaultdict(dict)
+        for row in db.session.execute(select(AnimeSimilarity.anime_id, AnimeSimilarity.similar_id, AnimeSimilarity.score).where(
+                AnimeSimilarity.anime_id.in_(affected))):
+            lists[row.anime_id][row.similar_id] = row.score
+        affected_positions = model.positions(sorted(affected))
+        for row, anime_id in enumerate(block_ids):
+            for position in affected_positions:
+                other = int(model.anime_ids[position])
+                score = float(scores[row, position])
+                if score > 0:
+                    lists[other][anime_id] = score
+                else:
+                    lists[other].pop(anime_id, None)
+        db.session.execute(delete(AnimeSimilarity).where(AnimeSimilarity.anime_id.in_(affected)))
+        _write([{'anime_id': other, 'rank': rank, 'similar_id': similar_id, 'score': score}
+                for other, neighbours in lists.items()
+                for rank, (similar_id, score) in enumerate(sorted(neighbours.items(), key=lambda item: (-item[1], item[0]))[:k])])
+        changed.update(affected)
+    db.session.execute(delete(SimilarityDirty).where(SimilarityDirty.anime_id.in_(dirty)))
+    if changed:
+        bump_version()
+    db.session.commit()
+    return changed
+
+# Aşağıdaki fonksiyonlar çağıranın transaction'ına katılır; commit çağıran tarafından yapılır
+def bump_version():
+    state = db.session.get(JobState, VERSION_JOB) or JobState(name=VERSION_JOB)
+    state.value = str(int(state.value or 0) + 1)
+    state.updated_at = datetime.utcnow()
+    db.session.merge(state)
+
+def mark_dirty(*anime_ids):
+    if anime_ids:
+        db.session.execute(dialect_insert(SimilarityDirty).values([{'anime_id': anime_id} for anime_id in anime_ids]).on_conflict_do_nothing())
+
+def remove_anime(anime_id):
+    db.session.execute(delete(AnimeSimilarity).where((AnimeSimilarity.anime_id == anime_id) | (AnimeSimilarity.similar_id == anime_id)))
+    db.session.execute(delete(SimilarityDirty).where(SimilarityDirty.anime_id == anime_id))
+    bump_version()
+
+def similar_animes(query, anime_id, limit=6):
+    return query.join(AnimeSimilarity, AnimeSimilarity.similar_id == Anime.id).filter(
+        AnimeSimilarity.anime_id == anime_id).order_by(AnimeSimilarity.rank).limit(limit).all()
@@ -0,0 +1,98 @@
+import re
+import unicodedata
+from sqlalchemy import text, select, literal_column, table, or_
+from models import db, Anime
+
+SEARCH_TABLE = 'anime_search'
+# bm25 ağırlıkları: isim eşleşmeleri açıklamadan daha değerli
+NAME_WEIGHT = 10.0
+DESCRIPTION_WEIGHT = 1.0
+REBUILD_CHUNK_SIZE = 1000
+
+_TURKISH_UPPER = str.maketrans({'İ': 'i', 'I': 'ı'})
+_DOTLESS_I = str.maketrans({'ı': 'i'})
+_TOKEN_RE = re.compile(r'\w+', re.UNICODE)
+# Engine URL'sine göre FTS tablosunun varlığı; her aramada sqlite_master sorgulanmasın diye
+_availability = {}
+
+def fold(value):
+    # Türkçe büyük/küçük harf dönüşümü (İ→i, I→ı) yapıldıktan sonra aksanlar atılır,
+    # böylece "Şeker", "seker" ve "ŞEKER" aynı terime indirgenir.
+    value = (value or '').translate(_TURKISH_UPPER).lower().translate(_DOTLESS_I)
+    value = unicodedata.normalize('NFKD', value)
+    return ''.join(ch for ch in value if not unicodedata.combining(ch))
+
+def tokenize(value):
+    return _TOKEN_RE.findall(fold(value))
+
+def match_expression(query):
+    # Her terim önek olarak aranır ve tüm terimlerin eşleşmesi gerekir
+    tokens = tokenize(query)
+    return ' '.join(f'"{token}"*' for token in tokens) if tokens else None
+
+def is_available():
+    key = str(db.engine.url)
+    if key not in _availability:
+        if db.engine.dialect.name != 'sqlite':
+            _availability[key] = False
+        else:
+            with db.engine.connect() as conn:
+                _availability[key] = conn.execute(text("SELECT 1 FROM sqlite_master WHERE name = :name"), {'name': SEARCH_TABLE}).first() is not None
+    return _availability[key]
+
+def ensure_search_index():
+    if db.engine.dialect.name != 'sqlite' or is_available():
+        return
+    with db.engine.begin() as conn:
+        conn.execute(text(f"CREATE VIRTUAL TABLE IF NOT EXISTS {SEARCH_TABLE} USING fts5(name, description, tokenize='unicode61')"))
+    _availability[str(db.engine.url)] = True
+    rebuild_search_index()
+
+def rebuild_search_index():
+    db.session.execute(text(f'DELETE FROM {SEARCH_TABLE}'))
+    last_id = 0
+    while True:
+        rows = db.session.query(Anime.id, Anime.name, Anime.description).filter(Anime.id > last_id).order_by(Anime.id).limit(REBUILD_CHUNK_SIZE).all()
+        if not rows:
+            break
+        db.session.execute(text(f'INSERT INTO {SEARCH_TABLE} (rowid, name, description) VALUES (:id, :name, :description)'),
+                           [{'id': r.id, 'name': fold(r.name), 'description': fold(r.description)} for r in rows])
+        last_id = rows[-1].id
+    db.session.commit()
+
+# Aşağıdaki fonksiyonlar çağıranın transaction'ına katılır; commit çağıran tarafından yapılır
+def index_anime(anime):
+    if not is_available():
+        return
+    remove_anime(anime.id)
+    db.session.execute(text(f'INSERT INTO {SEARCH_TABLE} (rowid, name, description) VALUES (:id, :name, :description)'),
+                       {'id': anime.id, 'name': fold(anime.name), 'description': fold(anime.description)})
+
+def remove_anime(anime_id):
+    if is_available():
+        db.session.execute(text(f'DELETE FROM {SEARCH_TABLE} WHERE rowid = :id'), {'id': anime_id})
+
+def search_subquery(query):
+    expression = match_expression(query)
+    if expression is None:
+        return None
+    return select(
+        literal_column('rowid').label('anime_id'),
+        literal_column(f'bm25({SEARCH_TABLE}, {NAME_WEIGHT}, {DESCRIPTION_WEIGHT})').label('rank'),
+    ).select_from(table(SEARCH_TABLE)).where(text(f'{SEARCH_TABLE} MATCH :match').bindparams(match=expression)).subquery()
+
+def apply_search(query, search_query):
+    # (sorgu, sıralama_sütunu) döner; FTS yoksa sıralama sütunu None olur
+    if not is_available():
+        pattern = f'%{search_query}%'
+        return query.filter(or_(Anime.name.ilike(pattern), Anime.description.ilike(pattern))), None
+    matches = search_subquery(search_query)
+    if matches is None:
+        return query, None
+    return query.join(matches, matches.c.anime_id == Anime.id), matches.c.rank
+
+def autocomplete(search_query, limit=8):
+    query, rank = apply_search(db.session.query(Anime.id, Anime.name, Anime.cover_image), search_query)
+    if rank is not None:
+        query = query.order_by(rank, Anime.id)
+    return [{'id': r.id, 'name': r.name, 'cover_image': r.cover_image} for r in query.limit(limit).all()]
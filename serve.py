@@ -0,0 +1,41 @@
+"""Uygulamayı bildirim akışına (SSE) uygun bir sunucuyla çalıştırır.
+
+gevent kuruluysa her bağlantı bir greenlet ile karşılanır; binlerce boşta bekleyen
+/api/notifications/stream bağlantısı birer işletim sistemi thread'i tutmaz:
+
+    pip install gevent
+    python serve.py --port 5400
+
+gevent yoksa Werkzeug'un thread'li sunucusuna düşülür (bağlantı başına bir thread).
+Gunicorn ile eşdeğeri: gunicorn -k gevent --worker-connections 10000 app:app
+"""
+import argparse
+import sys
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Anime platformu sunucusu')
+    parser.add_argument('--host', default='0.0.0.0')
+    parser.add_argument('--port', type=int, default=5400)
+    parser.add_argument('--threaded', action='store_true', help='gevent kurulu olsa bile thread\'li sunucuyu kullanır')
+    args = parser.parse_args(argv)
+
+    if not args.threaded:
+        try:
+            from gevent import monkey
+        except ImportError:
+            print('gevent bulunamadı, thread\'li sunucu kullanılıyor.', file=sys.stderr)
+        else:
+            # Uygulama import edilmeden önce yapılmalı; threading/queue/socket işbirlikçi hale gelir
+            monkey.patch_all()
+            from gevent.pywsgi import WSGIServer
+            from app import app
+            print(f'gevent sunucusu http://{args.host}:{args.port}', file=sys.stderr)
+            WSGIServer((args.host, args.port), app, log=None).serve_forever()
+            return
+
+    from werkzeug.serving import run_simple
+    from app import app
+    run_simple(args.host, args.port, app, threaded=True)
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,61 @@
+import random
+from sqlalchemy import case, func, literal, select, union_all
+from sqlalchemy.orm import load_only, raiseload
+from models import db, Anime, anime_genres
+
+# Raf kartlarının (_anime_shelf.html) kullandığı sütunlar; ilişkiler yüklenmez
+ANIME_CARD_COLUMNS = (Anime.id, Anime.name, Anime.cover_image, Anime.cover_digest, Anime.average_rating, Anime.mal_score)
+
+# Bu sayıdan küçük kataloglarda id listesinin tamamı çekilip örneklenir
+SMALL_CATALOG_SIZE = 200
+# Rastgele shelf için tek sorguda denenecek id sayısı (limit katı); id aralığının ~%25 doluluğuna kadar yeter
+RANDOM_PROBE_FACTOR = 8
+
+def random_anime_ids(limit=6):
+    # MIN ve MAX ayrı alt sorgularda olmalı, aksi halde SQLite indeks yerine tabloyu tarar
+    low, high = db.session.execute(select(
+        select(func.min(Anime.id)).scalar_subquery(),
+        select(func.max(Anime.id)).scalar_subquery(),
+    )).one()
+    if low is None:
+        return []
+    if high - low < SMALL_CATALOG_SIZE:
+        ids = [row[0] for row in db.session.query(Anime.id).all()]
+        return random.sample(ids, min(len(ids), limit))
+    # Rastgele id'ler "id IN (...)" ile birincil anahtar indeksinden aranır; sadece var olan id'ler döndüğünden
+    # her anime eşit olasılıkla seçilir (boşluklardan sonraki id'ler kayırılmaz). Silmelerle seyrekleşmiş id
+    # aralığında yeterli id bulunamazsa id listesinin tamamı okunup örneklenir. İkinci kısım birincil anahtar
+    # aralığıdır; yeterli id bulunduysa alt sınır high + 1 olur ve aralık boş kalır (tarama yapılmaz).
+    probes = random.sample(range(low, high + 1), limit * RANDOM_PROBE_FACTOR)
+    hits = select(func.count()).select_from(Anime).where(Anime.id.in_(probes)).scalar_subquery()
+    found = ([], [])
+    for anime_id, part in db.session.execute(union_all(
+            select(Anime.id, literal(0)).where(Anime.id.in_(probes)),
+            select(Anime.id, literal(1)).where(Anime.id >= case((hits < limit, low), else_=high + 1)))):
+        found[part].append(anime_id)
+    if found[1]:
+        return random.sample(found[1], min(len(found[1]), limit))
+    return random.sample(found[0], min(len(found[0]), limit))
+
+def random_animes(limit=6):
+    ids = random_anime_ids(limit)
+    if not ids:
+        return []
+    animes = Anime.query.options(load_only(*ANIME_CARD_COLUMNS), raiseload('*')).filter(Anime.id.in_(ids)).all()
+    random.shuffle(animes)
+    return animes
+
+def animes_in_order(query, anime_ids):
+    # Önceden hesaplanmış sıralı id listesindeki animeler, aynı sırayla (tek birincil anahtar sorgusu)
+    if not anime_ids:
+        return []
+    by_id = {anime.id: anime for anime in query.filter(Anime.id.in_(anime_ids)).all()}
+    return [by_id[anime_id] for anime_id in anime_ids if anime_id in by_id]
+
+def personalized_animes(query, genre_ids, limit=6):
+    # Tercih sırasına göre ağırlıklı türler (ilk tür en yüksek); eşitlikte puanı yüksek olan önce gelir
+    weight = case(*[(anime_genres.c.genre_id == genre_id, len(genre_ids) - i) for i, genre_id in enumerate(genre_ids)], else_=0)
+    ranked = select(anime_genres.c.anime_id, func.sum(weight).label('weight')).where(
+        anime_genres.c.genre_id.in_(genre_ids)).group_by(anime_genres.c.anime_id).subquery()
+    return query.join(ranked, ranked.c.anime_id == Anime.id).order_by(
+        ranked.c.weight.desc(), Anime.average_rating.desc(), Anime.id).limit(limit).all()
@@ -0,0 +1,224 @@
+import asyncio
+import ssl
+import threading
+import time
+from collections import defaultdict, namedtuple
+from datetime import datetime, timedelta
+from urllib.parse import quote, urlsplit
+
+from sqlalchemy import delete, func, or_, select
+from models import db, Anime, Episode, EpisodeSource, SourceCheck
+
+USER_AGENT = 'AnimeSourceHealth/1.0'
+# Bu durum kodları sunucunun ayakta olduğunu gösterir (HEAD yasak, hotlink koruması, hız sınırı)
+LIVE_STATUSES = {401, 403, 405, 429}
+# Yeni ölçümün gecikme ortalamasındaki ağırlığı
+LATENCY_SMOOTHING = 0.3
+URL_SAFE_CHARACTERS = "/?&=%:@!$'()*+,;~-._#"
+
+ProbeResult = namedtuple('ProbeResult', 'status latency_ms error')
+
+def is_live(result):
+    return result.status is not None and (result.status < 400 or result.status in LIVE_STATUSES)
+
+async def _request(parts, method, ssl_context):
+    https = parts.scheme == 'https'
+    reader, writer = await asyncio.open_connection(parts.hostname, parts.port or (443 if https else 80),
+                                                   ssl=ssl_context if https else None)
+    try:
+        target = quote(parts.path or '/', safe=URL_SAFE_CHARACTERS) + (f'?{quote(parts.query, safe=URL_SAFE_CHARACTERS)}' if parts.query else '')
+        host = parts.hostname.encode('idna').decode('ascii') + (f':{parts.port}' if parts.port else '')
+        writer.write(f'{method} {target} HTTP/1.1\r\nHost: {host}\r\nUser-Agent: {USER_AGENT}\r\n'
+                     f'Accept: */*\r\nConnection: close\r\n\r\n'.encode('ascii'))
+        await writer.drain()
+        # Sadece durum satırı okunur; gövde indirilmez
+        status_line = (await reader.readline()).split()
+        if len(status_line) < 2 or not status_line[0].startswith(b'HTTP/') or not status_line[1].isdigit():
+            raise ValueError('geçersiz HTTP yanıtı')
+        return int(status_line[1])
+    finally:
+        writer.close()
+
+async def probe(url, timeout, ssl_context=None):
+    # İlk bayta kadar geçen süre ölçülür; HEAD desteklemeyen sunuculara GET ile tekrar sorulur
+    parts = urlsplit(url)
+    if parts.scheme not in ('http', 'https') or not parts.hostname:
+        return ProbeResult(None, None, 'geçersiz URL')
+    started = time.perf_counter()
+    try:
+        status = await asyncio.wait_for(_request(parts, 'HEAD', ssl_context), timeout)
+        if status in (405, 501):
+            status = await asyncio.wait_for(_request(parts, 'GET', ssl_context), timeout)
+    except asyncio.TimeoutError:
+        return ProbeResult(None, None, 'zaman aşımı')
+    except (OSError, ValueError) as e:
+        return ProbeResult(None, None, (str(e) or e.__class__.__name__)[:200])
+    return ProbeResult(status, (time.perf_counter() - started) * 1000, None)
+
+async def probe_all(urls, concurrency, per_host, timeout):
+    # Aynı anda en fazla `concurrency` istek, aynı sunucuya (host:port) en fazla `per_host` istek.
+    # Önce sunucu sınırı alınır; yoğun bir sunucuyu bekleyenler genel kontenjanı tutmaz.
+    ssl_context = ssl.create_default_context()
+    limit = asyncio.Semaphore(concurrency)
+    hosts = defaultdict(lambda: asyncio.Semaphore(per_host))
+
+    async def one(url):
+        parts = urlsplit(url)
+        async with hosts[(parts.hostname, parts.port)]:
+            async with limit:
+                return await probe(url, timeout, ssl_context)
+    return await asyncio.gather(*(one(url) for url in urls))
+
+def source_order(source):
+    # Çalışanlar gecikmeye göre önde, ölçülmemişler arkalarında, ölüler en sonda; eşitlikte yönetici sırası.
+    # Sadece sunarken uygulanır; position yöneticinin girdiği sıra olarak kalır (kaynak geri gelince yerine döner)
+    return (source.is_dead, source.latency_ms is None, source.latency_ms or 0.0, source.position, source.id)
+
+def served(sources):
+    return sorted(sources, key=source_order)
+
+class SourceHealthChecker:
+    # Kaynaklar arka planda (cron veya ayrı worker) kontrol edilir; bölüm sayfası sadece sonucu okur
+    def __init__(self, app=None):
+        self.app = None
+        self.on_update = None
+        self._wake = threading.Event()
+        self._stop = threading.Event()
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        app.config.setdefault('SOURCE_CHECK_INTERVAL', 6 * 3600)
+        app.config.setdefault('SOURCE_CHECK_BATCH_SIZE', 500)
+        app.config.setdefault('SOURCE_CHECK_CONCURRENCY', 50)
+        app.config.setdefault('SOURCE_CHECK_PER_HOST', 4)
+        app.config.setdefault('SOURCE_CHECK_TIMEOUT', 10)
+        # Ardışık bu kadar başarısız kontrolden sonra kaynak ölü sayılır
+        app.config.setdefault('SOURCE_DEAD_AFTER', 2)
+        app.config.setdefault('SOURCE_CHECK_RETENTION_DAYS', 14)
+        app.config.setdefault('SOURCE_CHECK_POLL_INTERVAL', 60)
+        self.app = app
+        app.extensions['source_health'] = self
+
+    def due(self, limit, started=None):
+        # started verilirse o andan sonra kontrol edilmiş kaynaklar tekrar seçilmez
+        cutoff = datetime.utcnow() - timedelta(seconds=self.app.config['SOURCE_CHECK_INTERVAL'])
+        if started is not None:
+            cutoff = min(cutoff, started)
+        return db.session.query(EpisodeSource.id, EpisodeSource.url).filter(
+            or_(EpisodeSource.checked_at.is_(None), EpisodeSource.checked_at < cutoff)).order_by(
+            EpisodeSource.checked_at.is_(None).desc(), EpisodeSource.checked_at, EpisodeSource.id).limit(limit).all()
+
+    def check(self, sources):
+        config = self.app.config
+        return asyncio.run(probe_all([source.url for source in sources], config['SOURCE_CHECK_CONCURRENCY'],
+                                     config['SOURCE_CHECK_PER_HOST'], config['SOURCE_CHECK_TIMEOUT']))
+
+    def record(self, sources, results):
+        # Sonuçlar geçmişe eklenir ve kaynak özetleri güncellenir. Sunulan kaynak sırası veya ölü/canlı
+        # durumu değişen bölüm id'lerini döner (sayfaları önbellekten düşürülür).
+        now = datetime.utcnow()
+        dead_after = self.app.config['SOURCE_DEAD_AFTER']
+        current = {row.id: row for row in EpisodeSource.query.filter(EpisodeSource.id.in_([s.id for s in sources]))}
+        if not current:
+            return set()
+        before = self.served_orders({row.episode_id for row in current.values()})
+        db.session.execute(SourceCheck.__table__.insert(), [
+            {'source_id': source.id, 'checked_at': now, 'status': result.status, 'latency_ms': result.latency_ms, 'error': result.error}
+            for source, result in zip(sources, results) if source.id in current])
+        flipped = set()
+        for source, result in zip(sources, results):
+            row = current.get(source.id)
+            if row is None:
+                continue
+            live = is_live(result)
+            row.failures = 0 if live else (row.failures or 0) + 1
+            if live:
+                row.latency_ms = result.latency_ms if row.latency_ms is None else (
+                    (1 - LATENCY_SMOOTHING) * row.latency_ms + LATENCY_SMOOTHING * result.latency_ms)
+            is_dead = row.failures >= dead_after
+            if is_dead != row.is_dead:
+                flipped.add(row.episode_id)
+            row.is_dead = is_dead
+            row.checked_at = now
+            row.last_status = result.status
+            row.last_error = result.error
+        after = self.served_orders(before)
+        changed = {episode_id for episode_id, order in after.items() if before.get(episode_id) != order} | flipped
+        db.session.commit()
+        return changed
+
+    def served_orders(self, episode_ids):
+        # bölüm id -> sunulan sıradaki kaynak id'leri
+        by_episode = defaultdict(list)
+        if episode_ids:
+            for source in EpisodeSource.query.filter(EpisodeSource.episode_id.in_(episode_ids)):
+                by_episode[source.episode_id].append(source)
+        return {episode_id: [source.id for source in served(sources)] for episode_id, sources in by_episode.items()}
+
+    def compact(self):
+        cutoff = datetime.utcnow() - timedelta(days=self.app.config['SOURCE_CHECK_RETENTION_DAYS'])
+        deleted = db.session.execute(delete(SourceCheck).where(SourceCheck.checked_at < cutoff)).rowcount
+        # SQLite yabancı anahtar cascade'i uygulamaz; silinen kaynakların geçmişi burada temizlenir
+        db.session.execute(delete(SourceCheck).where(SourceCheck.source_id.notin_(select(EpisodeSource.id))))
+        db.session.commit()
+        return deleted
+
+    def run_once(self, started=None):
+        # Kontrol zamanı gelmiş bir grup kaynağı yoklar; kontrol edilen kaynak sayısını döner
+        sources = self.due(self.app.config['SOURCE_CHECK_BATCH_SIZE'], started)
+        # Ağ beklenirken veritabanı bağlantısı/transaction açık tutulmaz
+        db.session.commit()
+        if not sources:
+            return 0
+        changed = self.record(sources, self.check(sources))
+        if changed and self.on_update is not None:
+            self.on_update(changed)
+        return len(sources)
+
+    def drain(self):
+        # Her kaynak bir kez kontrol edilir
+        started = datetime.utcnow()
+        total = 0
+        while True:
+            checked = self.run_once(started)
+            if not checked:
+                self.compact()
+                return total
+            total += checked
+
+    def run_forever(self):
+        while not self._stop.is_set():
+            checked = 0
+            try:
+                checked = self.run_once()
+                if not checked:
+                    self.compact()
+            except Exception:
+                self.app.logger.exception('Kaynak sağlık kontrolü hatası')
+                db.session.rollback()
+            finally:
+                db.session.remove()
+            if not checked:
+                self._wake.wait(self.app.config['SOURCE_CHECK_POLL_INTERVAL'])
+                self._wake.clear()
+
+    def stop(self):
+        self._stop.set()
+        self._wake.set()
+
+    def dead_sources(self, limit=50):
+        return db.session.query(EpisodeSource.id, EpisodeSource.url, EpisodeSource.host, EpisodeSource.last_status,
+                                EpisodeSource.last_error, EpisodeSource.checked_at, Episode.id.label('episode_id'),
+                                Episode.number, Anime.name.label('anime_name')).join(
+            Episode, Episode.id == EpisodeSource.episode_id).join(Anime, Anime.id == Episode.anime_id).filter(
+            EpisodeSource.is_dead.is_(True)).order_by(EpisodeSource.checked_at.desc()).limit(limit).all()
+
+    def history(self, source_id, limit=20):
+        return SourceCheck.query.filter_by(source_id=source_id).order_by(SourceCheck.id.desc()).limit(limit).all()
+
+    def stats(self):
+        counts = db.session.query(func.count(EpisodeSource.id), func.count(EpisodeSource.checked_at),
+                                  func.sum(EpisodeSource.is_dead.cast(db.Integer)), func.avg(EpisodeSource.latency_ms)).one()
+        total, checked, dead, latency = counts
+        return {'sources': total, 'checked': checked, 'dead': dead or 0, 'avg_latency_ms': latency}